@@ -0,0 +1,365 @@
+"""
+流水线性能基准 / Benchmark of the netlist -> simulate -> parse pipeline.
+
+Measures wall time and peak RSS of every Python-side stage across array sizes
+and sample counts, and writes machine-readable results (JSON, optionally CSV):
+
+    per array size      config_load, core_build, core_render, table_write, and with
+                        --deck-stages create_testbench, netlist_render (str(simulator))
+    per sample count    simulate (xyce_stub.py), prn_parse, mt_parse, stats, plot
+    once                mc_run: Sram9TCoreMcTestbench.run_mc_simulation() of a sharded
+                        SNM run through xyce_stub.py, a smoke test of the whole run path
+
+The simulate/parse stages do not depend on the array size (the `.PRINT` and
+`.MEASURE` lists are the same for every array), so they run once per sample
+count on a netlist with the directives of `operation`. A failing stage is
+recorded with status 'error' and its message, the remaining stages still run,
+and the script exits with status 1 so that pipeline regressions fail the bench.
+
+create_testbench and netlist_render build the full read/write array deck, whose
+periphery (precharge, sense amp, write driver) is not wired in the 9T testbench
+yet. They are recorded as 'skipped' unless --deck-stages is given, so the default
+suite only runs stages that work on the current tree.
+
+Usage (from the OpenYield directory):
+    python bench_pipeline.py --quick
+    python bench_pipeline.py --sizes 8x4 64x32 512x128 --samples 100 10000 100000 \
+        --points 100 --output sim/bench/bench_results.json --csv
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PySpice.Spice.Netlist import Circuit
+
+from config import SRAM_CONFIG
+from utils import (  # type: ignore
+    parse_mc_measurements, generate_mc_statistics,
+    read_prn_with_preprocess, split_blocks, visualize_results
+)
+from xyce_runner import run_xyce  # type: ignore
+
+DEFAULT_SIZES = ['8x4', '32x16', '64x32', '128x64', '256x128', '512x128']
+DEFAULT_SAMPLES = [100, 1000, 10000, 100000]
+QUICK_SIZES = ['8x4', '32x16']
+QUICK_SAMPLES = [100, 1000]
+SMOKE_OPERATION = 'hold_snm'
+# Stages building the read/write array deck, opt-in until its periphery is wired
+DECK_STAGES = ('create_testbench', 'netlist_render')
+
+CIRCUIT_CONFIGS = {
+    "SRAM_9T_CELL": "sram_compiler/config_yaml/sram_9t_cell.yaml",
+    "WORDLINEDRIVER": "sram_compiler/config_yaml/wordline_driver.yaml",
+    "PRECHARGE": "sram_compiler/config_yaml/precharge.yaml",
+    "COLUMNMUX": "sram_compiler/config_yaml/mux.yaml",
+    "SENSEAMP": "sram_compiler/config_yaml/sa.yaml",
+    "WRITEDRIVER": "sram_compiler/config_yaml/write_driver.yaml",
+    "DECODER": "sram_compiler/config_yaml/decoder.yaml"
+}
+
+# `.PRINT` / `.MEASURE` lists of each operation, see Sram9TCoreMcTestbench.add_meas_and_print()
+OPERATION_DIRECTIVES = {
+    'read': (['V(PRE)', 'V(WL0)', 'V(BL0)', 'V(SAE)', 'V(SA_Q0)', 'V(SA_QB0)'],
+             ['TWL', 'TBL', 'TSWING', 'TSA', 'PAVG', 'PDYN', 'PSTC']),
+    'write': (['V(WE)', 'V(WL0)', 'V(BL0)', 'V(BLB0)', 'V(Q)', 'V(QB)'],
+              ['TDECODER', 'TWLDRV', 'TWDRV', 'TWRITE_Q', 'TWRITE_QB', 'PAVG', 'PDYN', 'PSTC']),
+}
+
+
+class PeakRSS:
+    """Track the peak resident set size of this process while a stage runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        """Current RSS in bytes (Linux /proc), falls back to the process high-water mark"""
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            import resource
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+        return False
+
+
+class Benchmark:
+    """Runs stages and collects one record per (size, samples, stage)"""
+
+    def __init__(self, verbose=False):
+        self.records = []
+        self.verbose = verbose
+
+    def stage(self, name, func, rows=None, cols=None, samples=None, **extra):
+        """Run `func()` as stage `name`, returns its result or None on error"""
+        record = {'stage': name, 'rows': rows, 'cols': cols, 'samples': samples}
+        rss_before = PeakRSS.current()
+        start = time.perf_counter()
+        result = None
+        # Stage functions print a lot of [DEBUG] output, keep the benchmark log readable
+        stdout = sys.stdout
+        if not self.verbose:
+            sys.stdout = open(os.devnull, 'w')
+        try:
+            with PeakRSS() as rss:
+                result = func()
+            record['status'] = 'ok'
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+            rss = None
+        finally:
+            if not self.verbose:
+                sys.stdout.close()
+                sys.stdout = stdout
+        record['wall_s'] = time.perf_counter() - start
+        record['rss_before_bytes'] = rss_before
+        record['peak_rss_bytes'] = rss.peak if rss is not None else None
+        record.update(extra)
+        self.records.append(record)
+
+        size = f"{rows}x{cols}" if rows is not None else '-'
+        status = record['status'] if record['status'] == 'ok' else f"ERROR {record['error'][:80]}"
+        peak = f"{record['peak_rss_bytes'] / 2 ** 20:8.1f} MiB" if rss is not None else ' ' * 12
+        print(f"[BENCH] {size:>8} {str(samples or '-'):>7} {name:<16} "
+              f"{record['wall_s']:9.3f} s {peak}  {status}")
+        return result
+
+
+def load_config(rows, cols):
+    sram_config = SRAM_CONFIG()
+    sram_config.load_all_configs(
+        global_file="sram_compiler/config_yaml/global.yaml",
+        circuit_configs=CIRCUIT_CONFIGS)
+    sram_config.global_config.num_rows = rows
+    sram_config.global_config.num_cols = cols
+    return sram_config
+
+
+def bench_array_size(bench, rows, cols, operation, table_samples, work_dir, deck_stages=False):
+    """Stages whose cost grows with the array size"""
+    from sram_compiler.subcircuits.sram_9t_st_core_for_yield import Sram9TCore
+    from sram_compiler.testbenches.sram_9t_core_MC_testbench import Sram9TCoreMcTestbench
+
+    size_dir = os.path.join(work_dir, f'{rows}x{cols}')
+    os.makedirs(size_dir, exist_ok=True)
+    sram_config = bench.stage('config_load', lambda: load_config(rows, cols), rows, cols)
+    if sram_config is None:
+        return
+
+    cell = sram_config.sram_9t_cell
+    core = bench.stage('core_build', lambda: Sram9TCore(
+        rows, cols,
+        cell.nmos_model.value[0], cell.pmos_model.value[0], cell.nmos_model.value[1],
+        cell.nmos_width.value[0], cell.pmos_width.value[0], cell.nmos_width.value[1],
+        cell.length.value, w_rc=True), rows, cols)
+    if core is not None:
+        text = bench.stage('core_render', lambda: str(core), rows, cols)
+        if text is not None:
+            bench.records[-1].update(netlist_bytes=len(text), netlist_lines=text.count('\n'))
+
+    tb = Sram9TCoreMcTestbench(sram_config, w_rc=True, sweep_senseamp=False, sim_path=size_dir)
+    if deck_stages:
+        bench.stage('create_testbench', lambda: tb.create_testbench(operation), rows, cols)
+        bench.stage('netlist_render', lambda: tb.write_mc_netlist(operation, mc_runs=1), rows, cols)
+        if bench.records[-1]['status'] == 'ok':
+            tb_path = tb.get_tb_path(operation)
+            bench.records[-1].update(netlist_bytes=os.path.getsize(tb_path))
+    else:
+        for name in DECK_STAGES:
+            bench.records.append({'stage': name, 'rows': rows, 'cols': cols, 'samples': None,
+                                  'status': 'skipped', 'error': '--deck-stages not given'})
+
+    for samples in table_samples:
+        # 18 process variables per cell (6 transistors x vth0/u0/voff), see gen_process_params()
+        num_params = rows * cols * 18
+        table_vars = np.random.default_rng(0).normal(size=(samples, num_params))
+        bench.stage('table_write', lambda: tb.gen_process_params(
+            Circuit('bench'), operation, samples, vars=table_vars, sim_path=size_dir),
+            rows, cols, samples, table_cells=samples * num_params)
+        del table_vars
+
+
+def write_directive_netlist(path, operation, samples):
+    """Netlist with only the analysis/output directives of `operation`, enough for xyce_stub.py"""
+    prints, measures = OPERATION_DIRECTIVES[operation]
+    with open(path, 'w') as f:
+        f.write(f".title bench_{operation}\n")
+        f.write(".TRAN 1.0000e-11 6.0000e-08\n")
+        f.write(f".SAMPLING useExpr=true\n.options samples numsamples={samples} seed=1\n")
+        f.write(f".PRINT TRAN FORMAT=NOINDEX {' '.join(prints)}\n")
+        for name in measures:
+            f.write(f".meas TRAN {name} PARAM='0'\n")
+        f.write(".end\n")
+
+
+def bench_samples(bench, samples, operation, points, work_dir, plot_limit):
+    """Stages whose cost grows with the number of MC samples"""
+    run_dir = os.path.join(work_dir, f'samples_{samples}')
+    os.makedirs(run_dir, exist_ok=True)
+    tb_path = os.path.join(run_dir, f'bench_{operation}_tb.sp')
+    write_directive_netlist(tb_path, operation, samples)
+
+    os.environ['XYCE_STUB_POINTS'] = str(points)
+    stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xyce_stub.py')
+    bench.stage('simulate', lambda: run_xyce(tb_path, xyce_cmd=stub), samples=samples,
+                simulator='xyce_stub')
+    if bench.records[-1]['status'] == 'ok':
+        bench.records[-1].update(prn_bytes=os.path.getsize(tb_path + '.prn'))
+
+    parsed = bench.stage('prn_parse', lambda: read_prn_with_preprocess(tb_path + '.prn'),
+                         samples=samples)
+    blocks = None
+    if parsed is not None:
+        df, analysis_type = parsed
+        blocks = bench.stage('prn_split', lambda: split_blocks(df, analysis_type, samples),
+                             samples=samples)
+
+    mc_df = bench.stage('mt_parse', lambda: parse_mc_measurements(
+        netlist_prefix=tb_path, file_suffix='mt', num_runs=samples), samples=samples)
+    if mc_df is not None:
+        bench.stage('stats', lambda: generate_mc_statistics(mc_df), samples=samples)
+
+    if blocks is not None and samples <= plot_limit:
+        bench.stage('plot', lambda: visualize_results(
+            blocks, analysis_type, os.path.join(run_dir, f'bench_{operation}_waveform.png')),
+            samples=samples)
+
+
+def bench_mc_run(bench, samples, work_dir):
+    """Netlist, simulation and parsing through the testbench itself, with xyce_stub.py as simulator"""
+    from sram_compiler.testbenches.sram_9t_core_MC_testbench import Sram9TCoreMcTestbench
+
+    rows, cols = parse_size(QUICK_SIZES[0])
+    sram_config = load_config(rows, cols)
+    stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xyce_stub.py')
+    tb = Sram9TCoreMcTestbench(sram_config, sweep_senseamp=False, sim_path=os.path.join(work_dir, 'mc_run'),
+                               xyce_cmd=stub, print_netlist=False)
+    bench.stage('mc_run', lambda: tb.run_mc_simulation(
+        SMOKE_OPERATION, mc_runs=samples, num_shards=2, seed=1, use_cache=False),
+        rows, cols, samples, simulator='xyce_stub')
+    if bench.records[-1]['status'] == 'ok':
+        bench.records[-1].update(run_status=tb.last_run_report['status'],
+                                 finished=len(tb.last_run_report['finished']))
+        if tb.last_run_report['status'] != 'ok':
+            bench.records[-1].update(status='error', error=f"run status {tb.last_run_report['status']}")
+
+
+def environment_info():
+    def git_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                  text=True, timeout=10).stdout.strip() or None
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': git_commit(),
+    }
+
+
+def parse_size(text):
+    rows, cols = text.lower().split('x')
+    return int(rows), int(cols)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', nargs='+', default=None, help='array sizes, e.g. 8x4 512x128')
+    parser.add_argument('--samples', nargs='+', type=int, default=None, help='MC sample counts')
+    parser.add_argument('--table-samples', nargs='+', type=int, default=None,
+                        help='sample counts of the table_write stage (default: --samples)')
+    parser.add_argument('--max-table-cells', type=float, default=5e7,
+                        help='skip table_write when samples x parameters exceeds this')
+    parser.add_argument('--operation', default='read', choices=sorted(OPERATION_DIRECTIVES))
+    parser.add_argument('--points', type=int, default=100, help='.prn points per sample')
+    parser.add_argument('--deck-stages', action='store_true',
+                        help='also run create_testbench/netlist_render (read/write periphery unfinished)')
+    parser.add_argument('--smoke-samples', type=int, default=20, help='samples of the mc_run stage')
+    parser.add_argument('--plot-limit', type=int, default=10000,
+                        help='skip the plot stage above this many samples')
+    parser.add_argument('--quick', action='store_true', help='small sizes and sample counts')
+    parser.add_argument('--work-dir', default=os.path.join('sim', 'bench'))
+    parser.add_argument('--output', default=None, help='JSON results file')
+    parser.add_argument('--csv', action='store_true', help='also write the records as CSV')
+    parser.add_argument('--verbose', action='store_true', help='show the output of every stage')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in (args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES))]
+    samples_list = args.samples or (QUICK_SAMPLES if args.quick else DEFAULT_SAMPLES)
+    table_samples = args.table_samples or samples_list
+    time_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+    work_dir = os.path.join(args.work_dir, time_str)
+    os.makedirs(work_dir, exist_ok=True)
+    output = args.output or os.path.join(work_dir, 'bench_results.json')
+
+    bench = Benchmark(verbose=args.verbose)
+    print(f"[BENCH] {'size':>8} {'samples':>7} {'stage':<16} {'wall':>11} {'peak RSS':>12}")
+    for rows, cols in sizes:
+        fitting = [n for n in table_samples if n * rows * cols * 18 <= args.max_table_cells]
+        for n in sorted(set(table_samples) - set(fitting)):
+            bench.records.append({'stage': 'table_write', 'rows': rows, 'cols': cols, 'samples': n,
+                                  'status': 'skipped', 'error': '--max-table-cells exceeded'})
+        bench_array_size(bench, rows, cols, args.operation, fitting, work_dir, args.deck_stages)
+    for samples in samples_list:
+        bench_samples(bench, samples, args.operation, args.points, work_dir, args.plot_limit)
+    bench_mc_run(bench, args.smoke_samples, work_dir)
+
+    results = {'environment': environment_info(), 'settings': vars(args), 'records': bench.records}
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    if args.csv:
+        pd.DataFrame(bench.records).to_csv(os.path.splitext(output)[0] + '.csv', index=False)
+    print(f"[BENCH] Results saved to {output}")
+    failed = failed_stages(bench.records)
+    if failed:
+        print(f"[ERROR] {len(failed)} stage(s) failed: " + ', '.join(
+            f"{r['stage']}@{r['rows']}x{r['cols']}" if r['rows'] is not None else r['stage']
+            for r in failed))
+    return results
+
+
+def failed_stages(records):
+    """Records of stages that raised (skipped stages do not count)"""
+    return [r for r in records if r.get('status') == 'error']
+
+
+if __name__ == '__main__':
+    # A failing stage is a regression of the pipeline, not a benchmark result
+    sys.exit(1 if failed_stages(main()['records']) else 0)
@@ -0,0 +1,171 @@
+"""
+.data 数据表写入 / Vectorized, chunked writer for `.STEP data=table` tables.
+
+The MC testbench writes one row per Monte Carlo run and one column per process
+parameter, i.e. `num_mc x (rows * cols * 18)` numbers for a full array. Joining
+per-number f-strings for that is slow and holds the whole text in memory. Here:
+
+- column names, the table head and the `.param` block are built once per
+  geometry and cached (`process_param_layout()`, `table_layout()`);
+- fixed-point columns (`%.4f`) are formatted with NumPy digit arithmetic,
+  other formats with one `%` template per row;
+- rows are written in chunks of about `CHUNK_VALUES` numbers, optionally into
+  several shard-sized files.
+
+    layout = process_param_layout(64, 64, False, 'PMOS_VTG', 'NMOS_VTG', 'NMOS_VTG')
+    write_data_table('sim/mc_read_table.data', layout.head, vars, '%.4f')
+"""
+import os
+import re
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Numbers formatted per chunk, bounds the temporary arrays (~20 bytes per number)
+CHUNK_VALUES = 1 << 20
+
+# Order of transistors in bitcell can not be changed
+MOS_NAMES = ('PGL', 'PGR', 'PDL', 'PUL', 'PDR', 'PUR')
+PARAM_NAMES = ('vth0', 'u0', 'voff')
+
+_FIXED_FMT = re.compile(r'^%\.([1-9])f$')
+
+
+class DataTableLayout:
+    """Columns of one data table, with its head and `.param` block"""
+    __slots__ = ('columns', 'head', 'param_block')
+
+    def __init__(self, columns: Sequence[str], table_name: str = 'table'):
+        self.columns = tuple(columns)
+        # '.data table\n+ name1 name2 ... ' (trailing space kept for existing netlists)
+        self.head = f'.data {table_name}\n+ ' + ''.join(f'{name} ' for name in self.columns)
+        self.param_block = ''.join(f'.param {name}=0.0\n' for name in self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+
+@lru_cache(maxsize=32)
+def table_layout(columns: Tuple[str, ...], table_name: str = 'table') -> DataTableLayout:
+    """Cached layout of an explicit column list"""
+    return DataTableLayout(columns, table_name)
+
+
+@lru_cache(maxsize=32)
+def process_param_layout(num_rows: int, num_cols: int, single_cell: bool,
+                         pmos_model: str, pg_model: str, pd_model: str) -> DataTableLayout:
+    """
+    Layout of the per-transistor process parameter table 工艺参数数据表
+    Columns are `{param}_{model}_{mos}_{row}_{col}` for every cell (only cell 0,0
+    when `single_cell`, e.g. for SNM), transistor in MOS_NAMES and param in PARAM_NAMES.
+    """
+    models = {'PUL': pmos_model, 'PUR': pmos_model, 'PGL': pg_model, 'PGR': pg_model}
+    cells = [(0, 0)] if single_cell else [(row, col) for row in range(num_rows)
+                                          for col in range(num_cols)]
+    columns = [f'{param}_{models.get(mos, pd_model)}_{mos}_{row:d}_{col:d}'
+               for row, col in cells for mos in MOS_NAMES for param in PARAM_NAMES]
+    return DataTableLayout(columns)
+
+
+def _format_fixed(block: np.ndarray, decimals: int) -> bytes:
+    """
+    `+ ` rows of `block` in fixed point, right-aligned in equal-width fields
+    Same numbers as f'{x:.{decimals}f}', built digit by digit on uint8 arrays
+    instead of one string per number.
+    """
+    n, m = block.shape
+    scaled = np.abs(block) * 10.0 ** decimals
+    digits = np.rint(scaled).astype(np.int64)
+    # printf rounds the exact binary value, rint the scaled one: redo near-ties with printf
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        digits[near_tie] = [int(f'{x:.{decimals}f}'.replace('.', ''))
+                            for x in np.abs(block[near_tie]).tolist()]
+    int_width = len(str(int(digits.max()) // 10 ** decimals)) if digits.size else 1
+    width = 2 + int_width + 1 + decimals  # separator, sign, integer part, '.', fraction
+    buf = np.empty((width, n, m), np.uint8)
+    buf[0] = ord(' ')
+    buf[1] = ord(' ')
+    for k in range(decimals):
+        digits, rem = np.divmod(digits, 10)
+        np.add(rem, ord('0'), out=buf[width - 1 - k], casting='unsafe')
+    buf[width - 1 - decimals] = ord('.')
+
+    # Integer part: blank leading zeros, '-' right before the first digit
+    negative = np.signbit(block)
+    done = np.zeros((n, m), bool)
+    ended = done
+    for k in range(int_width):
+        row = buf[width - 2 - decimals - k]
+        digits, rem = np.divmod(digits, 10)
+        np.add(rem, ord('0'), out=row, casting='unsafe')
+        if k:
+            row[done] = ord(' ')
+            row[ended & negative] = ord('-')
+        ended = ~done & (digits == 0)
+        done = done | ended
+    buf[1][ended & negative] = ord('-')
+
+    out = np.empty((n, 1 + m * width + 1), np.uint8)
+    out[:, 0] = ord('+')
+    out[:, 1:-1] = buf.transpose(1, 2, 0).reshape(n, m * width)
+    out[:, -1] = ord('\n')
+    return out.tobytes()
+
+
+def format_rows(block: np.ndarray, fmt: str = '%.4f') -> str:
+    """Data rows `+ v1 v2 ...` of a 2-D block, one line per row, each ending in newline"""
+    block = np.asarray(block, dtype=float)
+    match = _FIXED_FMT.match(fmt)
+    if match and block.size and np.isfinite(block).all() and np.abs(block).max() < 1e12:
+        return _format_fixed(block, int(match.group(1))).decode('ascii')
+    template = '+ ' + ' '.join([fmt] * block.shape[1]) + '\n'
+    return ''.join(template % tuple(row) for row in block.tolist())
+
+
+def _chunk_rows(num_cols: int, chunk_values: int) -> int:
+    return max(1, chunk_values // max(num_cols, 1))
+
+
+def write_data_table(path: str, head: str, vars: np.ndarray, fmt: str = '%.4f',
+                     chunk_values: int = CHUNK_VALUES) -> str:
+    """
+    Write `head` and the rows of `vars` to `path`, `chunk_values` numbers at a time
+    返回写入的文件路径
+    """
+    vars = np.asarray(vars)
+    assert vars.ndim == 2, f'data table must be 2-D, got shape {vars.shape}'
+    step = _chunk_rows(vars.shape[1], chunk_values)
+    with open(path, 'w') as f:
+        f.write(head)
+        if not len(vars):
+            f.write('\n')
+        for start in range(0, vars.shape[0], step):
+            f.write('\n')
+            f.write(format_rows(vars[start:start + step], fmt)[:-1])
+    return path
+
+
+def split_rows(num_rows: int, rows_per_shard: int) -> List[Tuple[int, int]]:
+    """(start, count) of consecutive shards of at most `rows_per_shard` rows"""
+    rows_per_shard = max(1, int(rows_per_shard))
+    return [(start, min(rows_per_shard, num_rows - start))
+            for start in range(0, num_rows, rows_per_shard)]
+
+
+def write_data_table_shards(path: str, head: str, vars: np.ndarray, rows_per_shard: int,
+                            fmt: str = '%.4f', chunk_values: int = CHUNK_VALUES
+                            ) -> List[Tuple[str, int, int]]:
+    """
+    Split `vars` into shard-sized tables `<stem>_shardNNN<ext>` next to `path`
+    Every file carries the full head, so each one can drive its own netlist.
+    Returns [(path, start row, row count), ...].
+    """
+    stem, ext = os.path.splitext(path)
+    shards = []
+    for index, (start, count) in enumerate(split_rows(len(vars), rows_per_shard)):
+        shard_path = f'{stem}_shard{index:03d}{ext}'
+        write_data_table(shard_path, head, vars[start:start + count], fmt, chunk_values)
+        shards.append((shard_path, start, count))
+    return shards
@@ -0,0 +1,322 @@
+"""
+重要性采样良率估计 / Mean-shift importance sampling (MNIS) for rare SRAM failures.
+
+Plain MC needs ~1/pfail samples per observed failure, i.e. about 1e9 runs for a
+6-sigma cell. MNIS works in the standardized process space z (x = means + stds * z,
+z ~ N(0, I) under the nominal distribution f):
+
+1. Exploration: simulate a space-filling design with inflated sigma
+   (`explore_scale`) until some samples fail; the scale grows if none do.
+2. Mean shift: a line search from the origin along the failure direction
+   (least-squares sensitivity of the metric over the exploration set)
+   approximates the most probable failure point; a few rounds may then move it
+   to the weighted mean of the failures, where that estimate is reliable. The
+   sampling distribution becomes g = N(shift, I).
+3. Importance sampling: batches from g are weighted by
+   w(z) = f(z) / g(z) = exp(-shift.z + |shift|^2 / 2), so that
+   pfail = E_g[1_fail * w]. Batches continue until the figure of merit
+   FOM = std_error / pfail reaches `target_fom` or the budget is used.
+
+The simulator is any callable mapping a (n, dim) parameter table to (n,) metric
+values and an (n,) mask of the samples that finished; for the MC testbench
+`mc_orchestration.metric_evaluator()` builds one.
+
+    engine = ImportanceSamplingYield(evaluate, means, stds, fail_threshold=0.1, fail_above=False)
+    result = engine.run(max_runs=5000)
+    result['pfail'], result['pfail_ci'], result['sigma']
+"""
+from statistics import NormalDist
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from qmc_sampling import gaussian_design  # type: ignore
+from xyce_runner import shard_seeds  # type: ignore
+
+
+def failure_indicator(values, fail_threshold: float, fail_above: bool = True,
+                      missing_as_fail: bool = True) -> np.ndarray:
+    """
+    Boolean failure of every sample 失效判断
+    A NaN metric (measurement never triggered, e.g. the cell did not flip on a write)
+    counts as a failure when `missing_as_fail`.
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        fails = values > fail_threshold if fail_above else values < fail_threshold
+    if missing_as_fail:
+        fails |= np.isnan(values)
+    return fails
+
+
+def weighted_pfail(fails, log_weights, confidence: float = 0.95) -> Dict[str, Any]:
+    """
+    Importance sampling estimate of the failure probability
+    Returns 'n', 'num_fail', 'pfail', 'std_error', 'pfail_ci', 'fom' (std_error / pfail),
+    'sigma' (equivalent one-sided sigma level) and 'ess' (effective sample size of the
+    failing weights).
+    """
+    fails = np.asarray(fails, dtype=bool)
+    weights = np.exp(np.asarray(log_weights, dtype=float))
+    n = len(fails)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    result = {'n': n, 'num_fail': int(fails.sum()), 'pfail': np.nan, 'std_error': np.nan,
+              'pfail_ci': (np.nan, np.nan), 'fom': np.inf, 'sigma': np.nan, 'ess': 0.0}
+    if n == 0:
+        return result
+
+    terms = np.where(fails, weights, 0.0)
+    pfail = float(terms.mean())
+    std_error = float(terms.std(ddof=1) / np.sqrt(n)) if n > 1 else np.inf
+    fail_weights = weights[fails]
+    result.update(
+        pfail=pfail, std_error=std_error,
+        pfail_ci=(max(0.0, pfail - z * std_error), min(1.0, pfail + z * std_error)),
+        fom=std_error / pfail if pfail > 0 else np.inf,
+        sigma=-NormalDist().inv_cdf(pfail) if 0 < pfail < 1 else np.nan,
+        ess=float(fail_weights.sum() ** 2 / (fail_weights ** 2).sum()) if fails.any() else 0.0)
+    return result
+
+
+class ImportanceSamplingYield:
+    """
+    Mean-shift importance sampling engine 均值漂移重要性采样
+
+    Args:
+        evaluate: callable (vars, phase, batch) -> (metric values, finished mask), vars in
+                  the original parameter space, `phase` is 'explore' or 'is'
+        means, stds: nominal Gaussian of every parameter (gen_process_params columns)
+        fail_threshold / fail_above: a sample fails if its metric is above / below the threshold
+        missing_as_fail: count NaN metrics of finished samples as failures
+        explore_scale: sigma inflation of the exploration phase
+        explore_method: design of the exploration phase, see qmc_sampling.unit_design()
+        seed: base seed; exploration and IS batches derive their own seeds from it
+    """
+
+    def __init__(self, evaluate: Callable[[np.ndarray, str, int], Tuple[np.ndarray, np.ndarray]],
+                 means: Sequence[float], stds: Sequence[float],
+                 fail_threshold: float, fail_above: bool = True, missing_as_fail: bool = True,
+                 explore_scale: float = 3.0, explore_method: str = 'lhs',
+                 confidence: float = 0.95, seed: Optional[int] = None):
+        self.evaluate = evaluate
+        self.means = np.asarray(means, dtype=float)
+        self.stds = np.asarray(stds, dtype=float)
+        if self.means.shape != self.stds.shape or self.means.ndim != 1:
+            raise ValueError(f"means {self.means.shape} and stds {self.stds.shape} must be equal 1-D shapes")
+        self.dim = len(self.means)
+        self.fail_threshold = fail_threshold
+        self.fail_above = fail_above
+        self.missing_as_fail = missing_as_fail
+        self.explore_scale = explore_scale
+        self.explore_method = explore_method
+        self.confidence = confidence
+        self.seed = seed
+
+        self.shift = None
+        self.explore_z = np.empty((0, self.dim))
+        self.explore_values = np.empty(0)
+        self.explore_fails = np.empty(0, dtype=bool)
+        self.z = np.empty((0, self.dim))
+        self.fails = np.empty(0, dtype=bool)
+        self.search_runs = 0  # refinement and adaptation samples
+        self.history = []
+
+    def to_params(self, z: np.ndarray) -> np.ndarray:
+        """Process parameters of standardized samples"""
+        return self.means + z * self.stds
+
+    def _simulate(self, z, phase, batch, return_values=False):
+        """Failure flags (and metric values) of the finished samples of `z` (unfinished ones are dropped)"""
+        values, finished = self.evaluate(self.to_params(z), phase, batch)
+        values = np.asarray(values, dtype=float)
+        finished = np.asarray(finished, dtype=bool)
+        if values.shape != (len(z),) or finished.shape != (len(z),):
+            raise ValueError(f"evaluate() returned shapes {values.shape} and {finished.shape}, "
+                             f"expected ({len(z)},)")
+        if not finished.all():
+            print(f"[WARNING] {int((~finished).sum())} {phase} samples did not finish, dropped")
+        fails = failure_indicator(values[finished], self.fail_threshold,
+                                  self.fail_above, self.missing_as_fail)
+        if return_values:
+            return z[finished], fails, values[finished]
+        return z[finished], fails
+
+    def explore(self, num_samples: int = None, max_rounds: int = 4, growth: float = 1.5,
+                min_fails: int = 1) -> np.ndarray:
+        """
+        Search the failure region and set `self.shift` 失效区域搜索
+        Rounds of `num_samples` samples with sigma * explore_scale (scale * growth per
+        round) until `min_fails` failures are seen. Returns the shift (standardized).
+        `num_samples` defaults to max(200, 2 * (dim + 1)), enough for the least-squares
+        failure direction of refine().
+        """
+        num_samples = num_samples or max(200, 2 * (self.dim + 1))
+        seeds = shard_seeds(self.seed, max_rounds, stream=3)
+        scale = self.explore_scale
+        for k in range(max_rounds):
+            z = scale * gaussian_design(self.explore_method, num_samples, self.dim, seeds[k])
+            z, fails, values = self._simulate(z, 'explore', k, return_values=True)
+            self.explore_z = np.vstack([self.explore_z, z])
+            self.explore_values = np.concatenate([self.explore_values, values])
+            self.explore_fails = np.concatenate([self.explore_fails, fails])
+            print(f"[DEBUG] IS exploration round {k}: scale={scale:.2f}, "
+                  f"{int(fails.sum())}/{len(fails)} failed")
+            if self.explore_fails.sum() >= min_fails:
+                break
+            scale *= growth
+        else:
+            raise RuntimeError(f"No failure found in {max_rounds} exploration rounds "
+                               f"(scale up to {scale / growth:.2f} sigma); raise explore_scale or "
+                               f"check fail_threshold={self.fail_threshold}")
+
+        # Minimum-norm failure = most probable failure point of the explored set
+        self.shift = self._min_norm(self.explore_z[self.explore_fails])
+        print(f"[DEBUG] IS mean shift at {np.linalg.norm(self.shift):.3f} sigma")
+        return self.shift
+
+    @staticmethod
+    def _min_norm(z: np.ndarray) -> np.ndarray:
+        return z[np.argmin(np.einsum('ij,ij->i', z, z))]
+
+    def failure_direction(self) -> np.ndarray:
+        """
+        Unit vector from the origin towards the failure region 失效方向
+        Least-squares linear fit of the metric over the exploration set (finished, non-NaN
+        samples), signed towards failure. With fewer samples than dim + 2 it falls back to
+        mean of failures - mean of passes, which is noisy in every irrelevant dimension.
+        """
+        valid = np.isfinite(self.explore_values)
+        if valid.sum() >= self.dim + 2:
+            design = np.hstack([np.ones((int(valid.sum()), 1)), self.explore_z[valid]])
+            slope = np.linalg.lstsq(design, self.explore_values[valid], rcond=None)[0][1:]
+            direction = slope if self.fail_above else -slope
+        else:
+            print(f"[WARNING] {int(valid.sum())} exploration samples for {self.dim} parameters, "
+                  f"failure direction from the failure/pass means (raise explore_samples)")
+            failing = self.explore_z[self.explore_fails]
+            passing = self.explore_z[~self.explore_fails]
+            direction = failing.mean(axis=0) - (passing.mean(axis=0) if len(passing) else 0.0)
+        return direction / np.linalg.norm(direction)
+
+    def refine(self, steps: int = 12) -> np.ndarray:
+        """
+        Line search along failure_direction() for the failure boundary 范数最小化
+        Exploration failures lie far outside the failure boundary in high dimension, and
+        rays through single samples carry their noise in every dimension; only the failure
+        direction is searched. A coarse pass of `steps` radii up to the current shift norm
+        is followed by a fine pass of `steps` radii below its first failure; the first
+        failing point becomes the shift.
+        """
+        direction = self.failure_direction()
+        low, high = 0.0, np.linalg.norm(self.shift)
+        found = False
+        for k in range(2):
+            radii = np.linspace(low, high, steps + 1)[1:]
+            z, fails = self._simulate(radii[:, None] * direction[None, :], 'refine', k)
+            self.search_runs += len(z)
+            radii = np.linalg.norm(z, axis=1)
+            if not fails.any():
+                break
+            found = True
+            high = radii[fails].min()
+            passed = radii[~fails & (radii < high)]
+            low = passed.max() if len(passed) else low
+        if found:
+            self.shift = high * direction
+        else:
+            print(f"[WARNING] No failure along the failure direction up to "
+                  f"{np.linalg.norm(self.shift):.3f} sigma, shift kept")
+        print(f"[DEBUG] IS refined shift at {np.linalg.norm(self.shift):.3f} sigma")
+        return self.shift
+
+    def adapt(self, rounds: int = 3, num_samples: int = 200, min_ess: float = 20.0) -> np.ndarray:
+        """
+        Move the shift to the weighted mean of the failures 自适应均值漂移
+        Each round samples N(shift, I) and proposes sum(w z 1_fail) / sum(w 1_fail), an
+        estimate of E_f[z | fail]. With degenerate weights (effective sample size of the
+        failing weights below `min_ess`) that mean is noise in every irrelevant dimension,
+        so the proposal is only taken when its ESS is large enough and it does not move the
+        shift further from the origin. These samples are not used by estimate().
+        """
+        seeds = shard_seeds(self.seed, rounds, stream=5)
+        for k in range(rounds):
+            z = self.shift + np.random.default_rng(seeds[k]).standard_normal((num_samples, self.dim))
+            z, fails = self._simulate(z, 'adapt', k)
+            self.search_runs += len(z)
+            if not fails.any():
+                print(f"[WARNING] IS adaptation round {k} saw no failure, shift kept")
+                continue
+            log_w = self.log_weights(z[fails])
+            w = np.exp(log_w - log_w.max())
+            ess = float(w.sum() ** 2 / (w ** 2).sum())
+            proposal = w @ z[fails] / w.sum()
+            norm, new_norm = np.linalg.norm(self.shift), np.linalg.norm(proposal)
+            if ess < min_ess or new_norm > norm:
+                print(f"[DEBUG] IS adaptation round {k}: ess={ess:.1f}, proposal at "
+                      f"{new_norm:.3f} sigma rejected, shift kept at {norm:.3f} sigma")
+                continue
+            self.shift = proposal
+            print(f"[DEBUG] IS adaptation round {k}: {int(fails.sum())}/{len(fails)} failed, "
+                  f"ess={ess:.1f}, shift at {new_norm:.3f} sigma")
+        return self.shift
+
+    def log_weights(self, z: np.ndarray) -> np.ndarray:
+        """log f(z) / g(z) of samples drawn from g = N(shift, I)"""
+        return -z @ self.shift + 0.5 * float(self.shift @ self.shift)
+
+    def estimate(self) -> Dict[str, Any]:
+        """Current weighted failure probability of all IS samples, see weighted_pfail()"""
+        return weighted_pfail(self.fails, self.log_weights(self.z), self.confidence)
+
+    def sample(self, batch_size: int = 200, max_runs: int = 5000, target_fom: float = 0.1,
+               min_fails: int = 10):
+        """
+        Generator of importance sampling batches 重要性采样
+        Yields the estimate of all samples so far after every batch, with 'batch',
+        'converged' and 'stop_reason' (None, 'converged' or 'budget'). Convergence
+        needs `fom <= target_fom` and at least `min_fails` failing samples.
+        """
+        if self.shift is None:
+            raise RuntimeError("Call explore() before sampling")
+        num_batches = -(-max_runs // batch_size)
+        seeds = shard_seeds(self.seed, num_batches, stream=4)
+        for k in range(num_batches):
+            count = min(batch_size, max_runs - k * batch_size)
+            z = self.shift + np.random.default_rng(seeds[k]).standard_normal((count, self.dim))
+            z, fails = self._simulate(z, 'is', k)
+            self.z = np.vstack([self.z, z])
+            self.fails = np.concatenate([self.fails, fails])
+
+            progress = self.estimate()
+            converged = progress['fom'] <= target_fom and progress['num_fail'] >= min_fails
+            stop_reason = 'converged' if converged else ('budget' if k == num_batches - 1 else None)
+            progress.update(batch=k, converged=converged, stop_reason=stop_reason)
+            self.history.append(progress)
+            print(f"[DEBUG] IS batch {k}: n={progress['n']} fails={progress['num_fail']} "
+                  f"pfail={progress['pfail']:.3e} fom={progress['fom']:.3g} sigma={progress['sigma']:.2f}")
+            yield progress
+            if stop_reason is not None:
+                return
+
+    def run(self, explore_samples: int = None, batch_size: int = 200, max_runs: int = 5000,
+            target_fom: float = 0.1, min_fails: int = 10, adapt_rounds: int = 3,
+            **explore_kwargs) -> Dict[str, Any]:
+        """
+        Exploration, shift refinement and adaptation, then importance sampling until
+        convergence or budget (`max_runs` counts the IS samples only)
+        Returns the final estimate plus 'shift', 'shift_norm', 'explore_runs', 'search_runs',
+        'total_runs' and 'history' (estimate after every batch).
+        """
+        if self.shift is None:
+            self.explore(explore_samples, **explore_kwargs)
+            self.refine()
+            self.adapt(adapt_rounds, batch_size)
+        progress = None
+        for progress in self.sample(batch_size, max_runs, target_fom, min_fails):
+            pass
+        result = dict(progress)
+        result.update(shift=self.shift.copy(), shift_norm=float(np.linalg.norm(self.shift)),
+                      explore_runs=len(self.explore_z), search_runs=self.search_runs,
+                      total_runs=len(self.explore_z) + self.search_runs + len(self.z),
+                      history=list(self.history))
+        return result
@@ -0,0 +1,475 @@
+"""
+蒙特卡洛编排层 / Multi-run orchestration on top of the MC testbench.
+
+The testbench generates netlists and runs one Monte Carlo simulation at a time
+(`run_mc_simulation`, `simulate_batch`, `simulate_mc_async`); everything that
+plans and combines many runs lives here and takes the testbench as its first
+argument:
+
+- concurrent jobs and multi-operation campaigns (`run_mc_campaign`);
+- the PVT batch scheduler over corners x temperatures x VDDs (`run_pvt_sweep`);
+- sequential MC with confidence-based early stopping (`iter_adaptive_mc`);
+- the rare-failure yield drivers (`run_importance_sampling`, `run_surrogate_yield`).
+
+    tb = Sram9TCoreMcTestbench(SRAM_CONFIG, custom_mc=True)
+    campaign_df = run_mc_campaign(tb, ['hold_snm', 'read_snm'], mc_runs=200, seed=1)
+    result = run_importance_sampling(tb, 'read_snm', fail_threshold=0.12)
+
+Reports of the runs are kept in `tb.last_run_report` / `tb.last_run_reports`
+as for the single-run API.
+"""
+import asyncio
+import os
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from utils import (  # type: ignore
+    generate_mc_statistics, save_mc_results, merge_mc_measurements,
+    mc_convergence_stats, worst_case_table
+)
+from xyce_runner import run_mc_shards, shard_seeds  # type: ignore
+from qmc_sampling import process_param_moments  # type: ignore
+from importance_sampling import ImportanceSamplingYield  # type: ignore
+from surrogate_yield import SurrogateYieldEstimator  # type: ignore
+
+# Default yield metric of every operation
+OPERATION_METRICS = {
+    'read': 'TSWING',
+    'write': 'TWRITE_Q',
+    'hold_snm': 'HOLD_SNM',
+    'read_snm': 'READ_SNM',
+    'write_snm': 'WRITE_SNM',
+}
+
+# Operations run by default: the SNM decks hold the cell alone, while the read/write
+# periphery of the 9T array testbench (precharge, sense amp, write driver) is not wired yet
+DEFAULT_OPERATIONS = ('hold_snm', 'read_snm', 'write_snm')
+
+
+async def run_mc_simulations_async(tb, jobs, max_concurrency=None):
+    """
+    Run several independent MC simulations concurrently 并发运行多个仿真任务
+    Args:
+        jobs: list of keyword-argument dicts for tb.run_mc_simulation_async(),
+              e.g. [{'operation': 'read', 'temperature': -40}, {'operation': 'write'}]
+        max_concurrency: maximum number of Xyce processes at once, defaults to the number of CPUs
+    Returns:
+        Results of every job, in the order of `jobs`; the per-job reports are
+        stored in `tb.last_run_reports`
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or os.cpu_count() or 1)
+    reports = [None] * len(jobs)
+
+    async def run_job(i, job):
+        job = dict(job)
+        job.setdefault('sim_path', os.path.join(tb.sim_path, f'job_{i}'))
+        result = await tb.run_mc_simulation_async(semaphore=semaphore, **job)
+        reports[i] = tb.last_run_report
+        return result
+
+    results = await asyncio.gather(*(run_job(i, job) for i, job in enumerate(jobs)))
+    tb.last_run_reports = reports
+    return list(results)
+
+
+async def run_mc_campaign_async(tb, operations=DEFAULT_OPERATIONS,
+                                target_row=0, target_col=0, mc_runs=100, temperature=27,
+                                vars=None, seed=None, max_concurrency=None, timeout=None,
+                                use_cache=True):
+    """
+    Characterize several operations of one design in a single call 多操作联合仿真
+    The MC model lib, array core, decoder and wordline driver are built once and shared,
+    each operation runs in `<sim_path>/<operation>` and at most `max_concurrency`
+    Xyce processes run at the same time.
+    Args:
+        operations: defaults to the SNM operations (DEFAULT_OPERATIONS); 'read' and 'write'
+                    need the array periphery, which create_testbench() cannot build yet
+        vars: custom MC data tables as {operation: numpy.ndarray}
+    Returns:
+        Tidy pandas.DataFrame indexed by (operation, metric) with the columns of
+        generate_mc_statistics() plus 'status' and 'finished', also saved to
+        `<sim_path>/mc_campaign_results.csv`; per-operation reports are in `tb.last_run_reports`
+    """
+    vars = vars or {}
+    semaphore = asyncio.Semaphore(max_concurrency or os.cpu_count() or 1)
+    results = await asyncio.gather(*(
+        tb.simulate_mc_async(
+            operation, target_row, target_col, mc_runs, temperature, vars.get(operation),
+            seed=seed, use_cache=use_cache, timeout=timeout,
+            sim_path=os.path.join(tb.sim_path, operation), semaphore=semaphore)
+        for operation in operations))
+
+    tables = []
+    tb.last_run_reports = []
+    for operation, (mc_df, stats, report) in zip(operations, results):
+        tb.last_run_reports.append(report)
+        if stats is None:
+            print(f"[WARNING] No finished samples for {operation}")
+            continue
+        save_mc_results(
+            mc_df, stats,
+            data_file=report['tb_path'].replace('.sp', '.data.csv'),
+            stats_file=report['tb_path'].replace('.sp', '.stats.csv'))
+        table = stats.rename_axis('metric').reset_index()
+        table.insert(0, 'operation', operation)
+        table['status'] = report['status']
+        table['finished'] = len(report['finished'])
+        tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=['operation', 'metric']).set_index(['operation', 'metric'])
+    campaign_df = pd.concat(tables, ignore_index=True).set_index(['operation', 'metric'])
+    campaign_df.to_csv(os.path.join(tb.sim_path, 'mc_campaign_results.csv'))
+    print(f"[DEBUG] Campaign results saved to {tb.sim_path}/mc_campaign_results.csv")
+    return campaign_df
+
+
+def run_mc_campaign(tb, operations=DEFAULT_OPERATIONS, **kwargs):
+    """Blocking wrapper of run_mc_campaign_async(), see there for the arguments"""
+    return asyncio.run(run_mc_campaign_async(tb, operations, **kwargs))
+
+
+def estimate_mc_cost(tb_path, operation, mc_runs):
+    """Relative cost of a MC run: samples x netlist size, transient analyses weigh more than DC"""
+    return mc_runs * os.path.getsize(tb_path) * (1 if 'snm' in operation else 10)
+
+
+def run_pvt_sweep(tb, operations=DEFAULT_OPERATIONS, corners=('TT', 'FF', 'SS', 'FS', 'SF'),
+                  temperatures=None, vdds=None, target_row=0, target_col=0, mc_runs=100,
+                  vars=None, seed=None, max_workers=None, timeout=None, use_cache=True,
+                  worst=None):
+    """
+    PVT batch scheduler: operations x corners x temperatures x VDDs 工艺角/温度/电压批量仿真
+
+    Netlists are generated serially (subcircuits are shared between points through
+    shared_subcircuit()), then all points run on a process pool, longest estimated
+    job first. Every point uses the same `seed`, so corners are compared on common
+    random numbers.
+    Args:
+        operations: defaults to the SNM operations, see run_mc_campaign_async()
+        temperatures: defaults to `GlobalConfig.temperature`
+        vdds: defaults to `GlobalConfig.vdd`
+        vars: custom MC data tables as {operation: numpy.ndarray}
+        worst: per-metric worst direction, see utils.worst_case_table()
+    Returns:
+        (pvt_df, worst_df): statistics of every point and metric, and the worst point of
+        every (operation, metric); both are saved as csv in `<sim_path>/pvt`
+    """
+    g_cfg = tb.sram_config.global_config
+    temperatures = temperatures if temperatures is not None else [g_cfg.temperature]
+    vdds = vdds if vdds is not None else [g_cfg.vdd]
+    vars = vars or {}
+    timeout = tb.get_timeout(timeout)
+    pvt_path = os.path.join(tb.sim_path, 'pvt')
+    orig_corner, orig_vdd = tb.corner, tb.vdd
+
+    points = []
+    try:
+        for operation, corner, temperature, vdd in product(operations, corners, temperatures, vdds):
+            tb.set_corner(corner)
+            tb.set_vdd(vdd)
+            point_path = os.path.join(pvt_path, f'{operation}_{corner}_{temperature}C_{float(vdd):g}V')
+            os.makedirs(point_path, exist_ok=True)
+            tb_path = tb.write_mc_netlist(
+                operation, target_row, target_col, mc_runs, temperature, vars.get(operation),
+                sim_path=point_path, seed=seed)
+            cache_key, cached = tb.lookup_cached_results(tb_path, use_cache, seed)
+            points.append({
+                'operation': operation, 'corner': corner, 'temperature': temperature,
+                'vdd': float(vdd), 'tb_path': tb_path, 'cache_key': cache_key,
+                'result': cached,
+                'cost': estimate_mc_cost(tb_path, operation, mc_runs),
+            })
+    finally:
+        tb.set_corner(orig_corner)
+        tb.set_vdd(orig_vdd)
+
+    jobs = sorted((p for p in points if p['result'] is None), key=lambda p: p['cost'], reverse=True)
+    if jobs:
+        print(f"[DEBUG] PVT sweep: running {len(jobs)}/{len(points)} points ...")
+        results = run_mc_shards(
+            [(p['tb_path'], mc_runs, 'ms' if 'snm' in p['operation'] else 'mt') for p in jobs],
+            max_workers=max_workers,
+            timeout=timeout,
+            xyce_cmd=tb.xyce_cmd,
+            on_done=lambda i, df, report: print(
+                f"[DEBUG] PVT point {os.path.basename(os.path.dirname(jobs[i]['tb_path']))} "
+                f"{report['status']} in {report['elapsed']:.1f}s"))
+        for point, (mc_df, report) in zip(jobs, results):
+            stats = generate_mc_statistics(mc_df) if not mc_df.empty else None
+            point['result'] = (mc_df, stats)
+            point['report'] = report
+            if point['cache_key'] is not None and report['status'] == 'ok' and not report['unfinished']:
+                tb.result_cache.put(point['cache_key'], mc_df, stats,
+                                    meta={'operation': point['operation'], 'mc_runs': mc_runs})
+
+    tables = []
+    for point in points:
+        mc_df, stats = point['result']
+        report = point.get('report', {'status': 'cached', 'finished': list(range(mc_runs))})
+        if stats is None:
+            print(f"[WARNING] No finished samples for PVT point {point['tb_path']}")
+            continue
+        save_mc_results(
+            mc_df, stats,
+            data_file=point['tb_path'].replace('.sp', '.data.csv'),
+            stats_file=point['tb_path'].replace('.sp', '.stats.csv'))
+        table = stats.rename_axis('metric').reset_index()
+        for col, key in enumerate(['operation', 'corner', 'temperature', 'vdd']):
+            table.insert(col, key, point[key])
+        table['status'] = report['status']
+        table['finished'] = len(report['finished'])
+        tables.append(table)
+
+    pvt_df = pd.concat(tables, ignore_index=True) if tables else \
+        pd.DataFrame(columns=['operation', 'corner', 'temperature', 'vdd', 'metric'])
+    worst_df = worst_case_table(pvt_df, worst)
+    os.makedirs(pvt_path, exist_ok=True)
+    pvt_df.to_csv(os.path.join(pvt_path, 'pvt_results.csv'), index=False)
+    worst_df.to_csv(os.path.join(pvt_path, 'pvt_worst_case.csv'))
+    print(f"[DEBUG] PVT results saved to {pvt_path}")
+    tb.last_run_reports = [point.get('report') for point in points]
+    return pvt_df, worst_df
+
+
+def iter_adaptive_mc(tb, operation='read', target_row=0, target_col=0, temperature=27,
+                     metric=None, batch_size=100, max_runs=1000, rel_ci=0.05, confidence=0.95,
+                     fail_threshold=None, fail_above=True, vars=None, seed=None,
+                     timeout=None, use_cache=True, missing_as_fail=True):
+    """
+    Sequential MC with confidence-based early stopping 序贯蒙特卡洛 (自适应样本数)
+
+    Simulates batches of `batch_size` samples and yields a progress dict after each batch:
+        'batch', 'n', 'num_missing', 'mean', 'std', 'mean_ci', 'rel_ci_width' of `metric`,
+        'pfail', 'pfail_ci', 'pfail_rel_ci_width' (with `fail_threshold`),
+        'converged', 'stop_reason' (None, 'converged' or 'budget'), 'mc_df' (all samples so far),
+        'batch_status' and 'batch_unfinished' (status and unfinished global sample indices of
+        this batch, see run_supervised_mc())
+    The run stops once the relative CI width of the failure probability (with
+    `fail_threshold`) or of the metric mean is <= `rel_ci`, or after `max_runs` samples.
+    Args:
+        metric: measurement to monitor, defaults to `OPERATION_METRICS[operation]`
+        vars: custom MC data table with at least `max_runs` rows, consumed batch by batch
+        missing_as_fail: count samples without a `metric` value (NaN) as failures
+    """
+    if tb.uses_param_sweep():
+        raise ValueError("Adaptive MC is not supported for parameter sweeps")
+    metric = metric or OPERATION_METRICS[operation]
+    if vars is not None:
+        max_runs = min(max_runs, vars.shape[0])
+    timeout = tb.get_timeout(timeout)
+    num_batches = -(-max_runs // batch_size)
+    seeds = shard_seeds(seed, num_batches, stream=2)
+
+    batch_dfs, offsets = [], []
+    for k in range(num_batches):
+        start = k * batch_size
+        count = min(batch_size, max_runs - start)
+        batch_vars = vars[start:start + count] if vars is not None else None
+        batch_df, batch_report = tb.simulate_batch(
+            operation, target_row, target_col, count, temperature, batch_vars,
+            sim_path=os.path.join(tb.sim_path, f'batch_{k}'), seed=seeds[k],
+            timeout=timeout, use_cache=use_cache, return_report=True)
+        batch_dfs.append(batch_df)
+        offsets.append(start)
+
+        mc_df = merge_mc_measurements(batch_dfs, offsets)
+        values = mc_df[metric] if metric in mc_df else []
+        progress = mc_convergence_stats(values, confidence, fail_threshold, fail_above,
+                                        missing_as_fail)
+        rel_width = progress['pfail_rel_ci_width'] if fail_threshold is not None \
+            else progress['rel_ci_width']
+        converged = rel_width <= rel_ci
+        stop_reason = 'converged' if converged else ('budget' if k == num_batches - 1 else None)
+        progress.update(batch=k, metric=metric, converged=converged,
+                        stop_reason=stop_reason, mc_df=mc_df, batch_status=batch_report['status'],
+                        batch_unfinished=[start + i for i in batch_report['unfinished']])
+        print(f"[DEBUG] Adaptive MC batch {k}: n={progress['n']} mean={progress['mean']:.4g} "
+              f"rel_ci_width={progress['rel_ci_width']:.3g}"
+              + (f" pfail={progress['pfail']:.3g}" if fail_threshold is not None else "")
+              + (f" missing={progress['num_missing']}" if progress['num_missing'] else ""))
+        yield progress
+        if stop_reason is not None:
+            return
+
+
+def run_adaptive_mc_simulation(tb, operation='read', target_row=0, target_col=0, temperature=27,
+                               on_batch=None, **kwargs):
+    """
+    Run iter_adaptive_mc() to completion and return the metrics like tb.run_mc_simulation()
+    Args:
+        on_batch: optional callback receiving the progress dict of every batch
+        kwargs: see iter_adaptive_mc()
+    The progress of all batches (without 'mc_df') is kept in `tb.last_run_report['batches']`.
+    Its 'status' is 'error' / 'timeout' when a batch failed or lost samples, else
+    'not_converged' when the budget ran out before `rel_ci`, else 'ok'.
+    """
+    batches = []
+    progress = None
+    for progress in iter_adaptive_mc(tb, operation, target_row, target_col, temperature, **kwargs):
+        if on_batch is not None:
+            on_batch(progress)
+        batches.append({key: val for key, val in progress.items() if key != 'mc_df'})
+
+    mc_df = progress['mc_df']
+    statuses = [batch['batch_status'] for batch in batches]
+    unfinished = [run for batch in batches for run in batch['batch_unfinished']]
+    status = next((st for st in ('error', 'timeout') if st in statuses), 'error' if unfinished else 'ok')
+    if status != 'ok':
+        print(f"[WARNING] Adaptive MC lost {len(unfinished)} samples ({status}), see the batch reports")
+    elif progress['stop_reason'] == 'budget':
+        status = 'not_converged'
+        print(f"[WARNING] Adaptive MC did not converge: relative CI width above rel_ci after "
+              f"{progress['n']} samples, the estimate is less precise than requested")
+    tb.last_run_report = {
+        'tb_path': tb.get_tb_path(operation),
+        'status': status,
+        'stop_reason': progress['stop_reason'],
+        'finished': [int(run) for run in mc_df.index],
+        'unfinished': unfinished,
+        'batches': batches,
+    }
+    return tb.summarize_mc_results(mc_df, tb.get_tb_path(operation), operation)
+
+
+def process_distribution(tb, operation, means=None, stds=None):
+    """
+    (means, stds) of the data table columns for yield engines
+    Defaults to the nominal values with `vth_std` relative sigma; param_cell_model
+    tables hold deltas (mean 0) and need explicit `stds`.
+    """
+    if means is not None:
+        return means, stds
+    if tb.param_cell_model and 'snm' not in operation:
+        if stds is None:
+            raise ValueError("param_cell_model tables hold deltas, pass their sigmas as `stds`")
+        return np.zeros(len(stds)), stds
+    means, default_stds = process_param_moments(tb.num_rows, tb.num_cols, operation, tb.vth_std)
+    return means, default_stds if stds is None else stds
+
+
+def metric_evaluator(tb, operation, target_row, target_col, temperature, metric, base_path,
+                     seed=None, timeout=None, use_cache=True):
+    """
+    Simulator callable of the yield engines: (vars, phase, batch) -> (values, finished)
+    Each call is one simulate_batch() under `<base_path>/<phase>_<batch>`.
+    """
+    timeout = tb.get_timeout(timeout)
+
+    def evaluate(vars, phase, batch):
+        batch_df = tb.simulate_batch(
+            operation, target_row, target_col, len(vars), temperature, vars,
+            sim_path=os.path.join(base_path, f'{phase}_{batch}'), seed=seed,
+            timeout=timeout, use_cache=use_cache)
+        runs = np.arange(len(vars))
+        finished = np.isin(runs, batch_df.index)
+        if metric not in batch_df:
+            return np.full(len(vars), np.nan), finished
+        return batch_df[metric].reindex(runs).to_numpy(dtype=float), finished
+    return evaluate
+
+
+def run_importance_sampling(tb, operation='read_snm', target_row=0, target_col=0, temperature=27,
+                            fail_threshold=None, fail_above=False, metric=None,
+                            means=None, stds=None, explore_samples=None, explore_scale=3.0,
+                            batch_size=200, max_runs=5000, target_fom=0.1, min_fails=10,
+                            missing_as_fail=True, seed=None, timeout=None, use_cache=True):
+    """
+    Rare-failure yield with mean-shift importance sampling 重要性采样良率估计
+    Every batch is a custom_mc data table (gen_process_params) simulated by
+    simulate_batch() under `<sim_path>/importance_sampling/<phase>_<batch>`,
+    see importance_sampling.ImportanceSamplingYield for the method.
+    Args:
+        fail_threshold: failure limit of `metric`, e.g. a minimum READ_SNM in V
+        fail_above: True if values above the threshold fail (delays), False for margins
+        metric: measurement to judge, defaults to `OPERATION_METRICS[operation]`
+        means / stds: parameter distribution, defaults to the nominal values with
+                      `vth_std` relative sigma (see qmc_sampling.process_param_moments)
+        explore_samples: samples per exploration round, defaults to max(200, 2 * (params + 1))
+    Returns:
+        Dict with 'pfail', 'pfail_ci', 'std_error', 'fom', 'sigma', 'num_fail', 'n',
+        'total_runs' and the per-batch 'history' (also saved as is_history.csv).
+        `tb.last_run_report['status']` is 'not_converged' when the budget ran out
+        before `target_fom`; the estimate is then unreliable.
+    """
+    if not tb.custom_mc:
+        raise ValueError("Importance sampling feeds the data table, it needs custom_mc=True")
+    if fail_threshold is None:
+        raise ValueError("fail_threshold is required")
+    metric = metric or OPERATION_METRICS[operation]
+    means, stds = process_distribution(tb, operation, means, stds)
+    is_path = os.path.join(tb.sim_path, 'importance_sampling')
+    evaluate = metric_evaluator(tb, operation, target_row, target_col, temperature, metric,
+                                is_path, seed=seed, timeout=timeout, use_cache=use_cache)
+
+    engine = ImportanceSamplingYield(
+        evaluate, means, stds, fail_threshold, fail_above, missing_as_fail,
+        explore_scale=explore_scale, seed=seed)
+    result = engine.run(explore_samples, batch_size, max_runs, target_fom, min_fails)
+
+    history = pd.DataFrame(result['history'])
+    history.to_csv(os.path.join(is_path, 'is_history.csv'), index=False)
+    print(f"[DEBUG] {operation} {metric}: pfail={result['pfail']:.3e} "
+          f"CI=({result['pfail_ci'][0]:.3e}, {result['pfail_ci'][1]:.3e}) "
+          f"sigma={result['sigma']:.2f} after {result['total_runs']} runs ({result['stop_reason']})")
+    status = 'ok' if result['converged'] else 'not_converged'
+    if not result['converged']:
+        print(f"[WARNING] Importance sampling did not converge: fom={result['fom']:.3g} > "
+              f"target_fom={target_fom} or fewer than {min_fails} failures after "
+              f"{result['n']} IS samples, the estimate is unreliable")
+    tb.last_run_report = {'tb_path': tb.get_tb_path(operation), 'status': status,
+                          'stop_reason': result['stop_reason'], 'importance_sampling': result}
+    return result
+
+
+def run_surrogate_yield(tb, operation='read_snm', target_row=0, target_col=0, temperature=27,
+                        fail_threshold=None, fail_above=False, metric=None, means=None, stds=None,
+                        shift=None, pool_size=100000, initial_samples=50, batch_size=20, max_sim=500,
+                        max_uncertain=0.01, max_error=0.02, missing_as_fail=True, seed=None,
+                        timeout=None, use_cache=True):
+    """
+    Yield from a GP surrogate with active learning 代理模型辅助良率估计
+    Pairs stored in `tb.surrogate_data` for this operation/metric seed the model;
+    new simulations run under `<sim_path>/surrogate/<phase>_<batch>`, see
+    surrogate_yield.SurrogateYieldEstimator for the method.
+    Args:
+        shift: standardized mean shift of the pool for rare failures, e.g.
+               `result['shift']` of run_importance_sampling()
+        max_sim: simulation budget; when it runs out first, `result['fallback']` is set
+        others: see run_importance_sampling()
+    Returns:
+        Dict with 'pfail', 'pfail_bounds', 'pfail_ci', 'num_uncertain', 'rel_error',
+        'sim_runs', 'fallback' and the per-batch 'history' (saved as surrogate_history.csv).
+        `tb.last_run_report['status']` is 'fallback' when the budget ran out with samples
+        still uncertain; the estimate is then unreliable, simulate those samples instead.
+    """
+    if not tb.custom_mc:
+        raise ValueError("The surrogate is trained on data tables, it needs custom_mc=True")
+    if fail_threshold is None:
+        raise ValueError("fail_threshold is required")
+    metric = metric or OPERATION_METRICS[operation]
+    means, stds = process_distribution(tb, operation, means, stds)
+    surrogate_path = os.path.join(tb.sim_path, 'surrogate')
+    evaluate = metric_evaluator(tb, operation, target_row, target_col, temperature, metric,
+                                surrogate_path, seed=seed, timeout=timeout, use_cache=use_cache)
+
+    estimator = SurrogateYieldEstimator(
+        evaluate, means, stds, fail_threshold, fail_above, missing_as_fail, pool_size=pool_size,
+        shift=shift, max_uncertain=max_uncertain, max_error=max_error, seed=seed)
+    if tb.surrogate_data is not None:
+        vars, values = tb.surrogate_data.load(operation, metric, len(means))
+        if len(values):
+            print(f"[DEBUG] Surrogate starts from {len(values)} stored {operation} samples")
+            estimator.add_training_data(vars, values)
+    result = estimator.run(initial_samples, batch_size, max_sim)
+
+    pd.DataFrame(result['history']).to_csv(os.path.join(surrogate_path, 'surrogate_history.csv'), index=False)
+    print(f"[DEBUG] {operation} {metric}: pfail={result['pfail']:.3e} "
+          f"bounds=({result['pfail_bounds'][0]:.3e}, {result['pfail_bounds'][1]:.3e}) "
+          f"after {result['sim_runs']} simulations ({result['stop_reason']})")
+    status = 'fallback' if result['fallback'] or result['stop_reason'] == 'budget' else 'ok'
+    tb.last_run_report = {'tb_path': tb.get_tb_path(operation), 'status': status,
+                          'stop_reason': result['stop_reason'], 'surrogate': result}
+    return result
@@ -0,0 +1,222 @@
+"""
+PDK 模型库服务 / Process-wide cache of parsed SPICE model libraries.
+
+`parse_spice_models()` re-reads and regex-splits the whole PDK file on every
+call. Testbenches and subcircuits get their model cards from here instead:
+every file is parsed once per process and reused until its mtime or size
+changes.
+
+    models = get_models(pdk_path)    # shared read-only view
+    models = load_models(pdk_path)   # private mutable copy, e.g. to inject AGAUSS
+
+Parsed libraries can also be kept on disk (pickle) so that new processes, such
+as optimizer workers, skip parsing too:
+
+    MODEL_LIBRARY.cache_dir = os.path.join('sim', 'model_cache')
+
+Monte Carlo libraries (model cards with AGAUSS on the varied parameters) are
+content-addressed files, written once per (PDK file, sigma, varied parameters)
+and included by every testbench that needs them:
+
+    path = mc_model_file(pdk_path, 0.05, ('vth0', 'u0', 'voff'), 'sim/mc_models')
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from utils import parse_spice_models, write_spice_models  # type: ignore
+
+# Bump when the layout returned by parse_spice_models() or the MC cards change
+CACHE_FORMAT = 1
+
+# 默认的蒙特卡洛变化参数
+MC_VARIED_PARAMS = ('vth0', 'u0', 'voff')
+
+# 默认的 MC 模型库目录: 文件名按内容寻址, 所有运行和 sim_path 共享
+MC_MODEL_DIR = os.path.join('sim', 'mc_models')
+
+
+def file_key(path: str) -> Tuple[str, int, int]:
+    """(absolute path, mtime in ns, size) identifying one version of a file"""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+def freeze_models(models: Dict[str, Dict[str, Any]]) -> Mapping[str, Mapping[str, Any]]:
+    """Read-only view of a model dictionary (model -> {'name', 'type', 'parameters'})"""
+    return MappingProxyType({
+        name: MappingProxyType(dict(model, parameters=MappingProxyType(model['parameters'])))
+        for name, model in models.items()
+    })
+
+
+def thaw_models(models: Mapping[str, Mapping[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Mutable copy of a (possibly read-only) model dictionary"""
+    return {
+        name: dict(model, parameters=dict(model['parameters']))
+        for name, model in models.items()
+    }
+
+
+class ModelLibrary:
+    """
+    Memoized model libraries 模型库缓存
+
+    Entries are keyed by `file_key()`, so an edited PDK file is parsed again.
+    With `cache_dir` set, parsed libraries are also stored as
+    `<cache_dir>/<sha1 of key>.pkl` and shared between processes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self._models = {}       # abspath -> (file key, read-only models)
+        self._param_rows = {}   # abspath -> (file key, lines)
+        self._lock = threading.Lock()
+        self.stats = {'parsed': 0, 'disk_hits': 0, 'memory_hits': 0}
+
+    def _disk_path(self, key: Tuple[str, int, int]) -> str:
+        digest = hashlib.sha1(repr((CACHE_FORMAT, key)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.pkl')
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable model cache {path}: {e}")
+            return None
+
+    def _write_disk(self, key, models):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._disk_path(key)
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.pkl', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(models, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def models(self, path: str) -> Mapping[str, Mapping[str, Any]]:
+        """Parsed model cards of `path`, as a shared read-only view"""
+        key = file_key(path)
+        with self._lock:
+            entry = self._models.get(key[0])
+            if entry is not None and entry[0] == key:
+                self.stats['memory_hits'] += 1
+                return entry[1]
+
+            models = self._read_disk(key)
+            if models is not None:
+                self.stats['disk_hits'] += 1
+            else:
+                models = parse_spice_models(path)
+                self.stats['parsed'] += 1
+                self._write_disk(key, models)
+                print(f"[DEBUG] Parsed model library {path} ({len(models)} models)")
+
+            view = freeze_models(models)
+            self._models[key[0]] = (key, view)
+            return view
+
+    def load(self, path: str) -> Dict[str, Dict[str, Any]]:
+        """Parsed model cards of `path`, as a private mutable copy"""
+        return thaw_models(self.models(path))
+
+    def param_file_rows(self, path: str) -> List[str]:
+        """
+        Lines of a parameter table such as param_sweep_model_name.txt
+        (header line first), read once per file version
+        """
+        key = file_key(path)
+        with self._lock:
+            entry = self._param_rows.get(key[0])
+            if entry is None or entry[0] != key:
+                with open(path, 'r') as f:
+                    entry = (key, tuple(f.readlines()))
+                self._param_rows[key[0]] = entry
+            return list(entry[1])
+
+    def mc_model_file(self, path: str, sigma: float,
+                      varied_params=MC_VARIED_PARAMS,
+                      cache_dir: str = MC_MODEL_DIR) -> str:
+        """
+        Monte Carlo model library of `path` 蒙特卡洛模型库
+        Every parameter in `varied_params` becomes `{AGAUSS(nominal, |nominal|*sigma, 1)}`.
+        The file name hashes the PDK file version, sigma and the parameter set, so
+        the file is written once and then shared; later calls only stat the PDK.
+        """
+        key = file_key(path)
+        varied = tuple(sorted(set(varied_params)))
+        digest = hashlib.sha1(repr((CACHE_FORMAT, key, float(sigma), varied)).encode()).hexdigest()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(cache_dir, f'mc_{stem}_{digest[:16]}.spice')
+
+        if not os.path.exists(out_path):
+            models = self.load(path)
+            for model in models.values():
+                params = model['parameters']
+                for param in varied:
+                    val = params.get(param)
+                    if val is None:
+                        continue
+                    if not isinstance(val, (int, float)):
+                        print(f"[WARNING] {model['name']}.{param}={val} is not numeric, not varied")
+                        continue
+                    params[param] = f"{{AGAUSS({val}, {abs(val) * sigma:.5f}, 1)}}"
+
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.spice', dir=cache_dir)
+            os.close(fd)
+            try:
+                write_spice_models(models, tmp_path)
+                os.replace(tmp_path, out_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            print(f"[DEBUG] Wrote MC model library {out_path} (sigma={sigma}, params={list(varied)})")
+        return out_path
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Forget the in-memory entries of `path` (all files when None)"""
+        with self._lock:
+            if path is None:
+                self._models.clear()
+                self._param_rows.clear()
+            else:
+                self._models.pop(os.path.abspath(path), None)
+                self._param_rows.pop(os.path.abspath(path), None)
+
+
+# 进程内共享的模型库
+MODEL_LIBRARY = ModelLibrary()
+
+
+def get_models(path: str) -> Mapping[str, Mapping[str, Any]]:
+    """Shared read-only model cards of `path` (see ModelLibrary.models)"""
+    return MODEL_LIBRARY.models(path)
+
+
+def load_models(path: str) -> Dict[str, Dict[str, Any]]:
+    """Mutable copy of the model cards of `path` (see ModelLibrary.load)"""
+    return MODEL_LIBRARY.load(path)
+
+
+def mc_model_file(path: str, sigma: float, varied_params=MC_VARIED_PARAMS,
+                  cache_dir: str = MC_MODEL_DIR) -> str:
+    """Shared Monte Carlo model library of `path` (see ModelLibrary.mc_model_file)"""
+    return MODEL_LIBRARY.mc_model_file(path, sigma, varied_params, cache_dir)
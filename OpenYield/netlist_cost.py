@@ -0,0 +1,373 @@
+"""
+网表复杂度与仿真开销预测 / Netlist complexity report and simulation-cost predictor.
+
+`netlist_complexity()` reads a written Xyce deck (following `.include`/`.lib`)
+and counts what drives the simulation cost: MOSFETs, nodes and RC segments of
+the flattened circuit, `.model` cards, `.MEASURE`/`.PRINT` statements, time or
+sweep points and the number of samples (`.STEP data=` rows or
+`.options samples numsamples=`).
+
+`SimulationCostModel` keeps a history of past runs (report + measured runtime
+and output size, one JSON line per run) and predicts both for a new deck:
+
+    model = SimulationCostModel(os.path.join('sim', 'cost_history.jsonl'))
+    report = netlist_complexity(tb_path)
+    model.predict(report)   # {'elapsed': s, 'output_bytes': n, 'method': ...}
+    ...run Xyce...
+    model.record(report, elapsed, output_bytes(tb_path))
+
+With a few runs the prediction scales the median cost per unit of work; once
+`min_runs` runs are recorded a log-linear (ridge) regression on the report
+features is used.
+"""
+import glob
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_INCLUDE_RE = re.compile(r'^\s*\.(include|inc|lib)\s+["\']?([^"\'\s]+)["\']?', re.IGNORECASE)
+_SAMPLES_RE = re.compile(r'numsamples\s*=\s*(\d+)', re.IGNORECASE)
+_STEP_DATA_RE = re.compile(r'^\.step\s+data\s*=\s*(\S+)', re.IGNORECASE)
+
+# Element types of the report, by SPICE prefix letter
+_ELEMENT_KEYS = {'M': 'mosfets', 'X': 'instances', 'R': 'resistors', 'C': 'capacitors',
+                 'B': 'sources', 'V': 'sources', 'I': 'sources',
+                 'E': 'sources', 'F': 'sources', 'G': 'sources', 'H': 'sources'}
+# add_rc_networks_to_node() names its resistors R_<node>_<i>, i.e. `RR_...` in the deck
+_RC_SEGMENT_PREFIX = 'RR_'
+
+# Features of the regression, all taken from the complexity report
+COST_FEATURES = ('mosfets', 'nodes', 'time_points', 'samples', 'measures')
+
+
+def spice_value(token: str) -> float:
+    """Value of a SPICE number such as `1.0000e-11`, `10n` or `5ns`"""
+    match = re.match(r'^([-+]?[\d.]+(?:e[-+]?\d+)?)(meg|[fpnumkgt])?', token.strip().lower())
+    if not match:
+        raise ValueError(f"Not a SPICE number: {token}")
+    scale = {'f': 1e-15, 'p': 1e-12, 'n': 1e-9, 'u': 1e-6, 'm': 1e-3,
+             'k': 1e3, 'meg': 1e6, 'g': 1e9, 't': 1e12}
+    return float(match.group(1)) * scale.get(match.group(2), 1.0)
+
+
+class _Block:
+    """Elements and nodes of one `.subckt` (or of the top level)"""
+    __slots__ = ('ports', 'counts', 'nodes', 'children')
+
+    def __init__(self, ports=()):
+        self.ports = set(ports)
+        self.counts = Counter()
+        self.nodes = set()
+        self.children = []  # subcircuit names of the X instances
+
+    def add_element(self, tokens):
+        name = tokens[0]
+        prefix = name[0].upper()
+        key = _ELEMENT_KEYS.get(prefix, 'other')
+        self.counts[key] += 1
+        if prefix == 'R' and name.upper().startswith(_RC_SEGMENT_PREFIX):
+            self.counts['rc_segments'] += 1
+        if prefix == 'X':
+            positional = []
+            for token in tokens[1:]:
+                if '=' in token or token.upper() == 'PARAMS:':
+                    break
+                positional.append(token)
+            if positional:
+                self.children.append(positional[-1].upper())
+                nodes = positional[:-1]
+            else:
+                nodes = []
+        elif prefix == 'M':
+            nodes = tokens[1:5]
+        else:
+            nodes = tokens[1:3]
+        self.nodes.update(node for node in nodes if node != '0')
+
+
+class _DeckScanner:
+    """Single streaming pass over a deck and its include files"""
+
+    def __init__(self):
+        self.top = _Block()
+        self.blocks = {}            # SUBCKT NAME -> _Block
+        self.stack = [self.top]
+        self.stats = Counter()
+        self.data_rows = {}         # .data table name -> number of rows
+        self.step_tables = []
+        self.numsamples = None
+        self.analysis = None
+        self.points = 1
+        self.files = []
+        self._pending = None        # tokens of the element line being continued
+        self._data = None           # [name, continuation lines] of the open .data block
+
+    def scan(self, path, seen=None):
+        seen = seen if seen is not None else set()
+        path = os.path.abspath(path)
+        if path in seen:
+            return
+        seen.add(path)
+        self.files.append(path)
+        self.stats['netlist_bytes'] += os.path.getsize(path)
+        base_dir = os.path.dirname(path)
+        with open(path, 'r') as f:
+            for line in f:
+                stripped = line.strip()
+                if not stripped or stripped[0] == '*':
+                    continue
+                if stripped[0] == '+':
+                    if self._data is not None:
+                        self._data[1] += 1
+                    elif self._pending is not None:
+                        self._pending.extend(stripped[1:].split())
+                    continue
+                self._flush()
+                match = _INCLUDE_RE.match(line)
+                if match:
+                    for candidate in (match.group(2), os.path.join(base_dir, match.group(2))):
+                        if os.path.isfile(candidate):
+                            self.scan(candidate, seen)
+                            break
+                    continue
+                if stripped[0] == '.':
+                    self._directive(stripped)
+                else:
+                    self._pending = stripped.split()
+        self._flush()
+
+    def _flush(self):
+        if self._pending is not None:
+            self.stack[-1].add_element(self._pending)
+            self._pending = None
+        if self._data is not None:
+            name, lines = self._data
+            # first continuation line holds the column names
+            self.data_rows[name] = max(lines - 1, 0)
+            self._data = None
+
+    def _directive(self, line):
+        tokens = line.split()
+        keyword = tokens[0].lower()
+        if keyword == '.subckt' and len(tokens) > 1:
+            block = _Block(t for t in tokens[2:] if '=' not in t and t.upper() != 'PARAMS:')
+            self.blocks[tokens[1].upper()] = block
+            self.stack.append(block)
+            self.stats['subckt_definitions'] += 1
+        elif keyword == '.ends':
+            if len(self.stack) > 1:
+                self.stack.pop()
+        elif keyword == '.model':
+            self.stats['models'] += 1
+        elif keyword in ('.measure', '.meas'):
+            self.stats['measures'] += 1
+        elif keyword == '.print':
+            self.stats['prints'] += 1
+            self.stats['print_signals'] += sum(1 for t in tokens[2:] if '(' in t)
+        elif keyword == '.data' and len(tokens) > 1:
+            self._data = [tokens[1].upper(), 0]
+        elif keyword == '.tran' and len(tokens) >= 3:
+            self.analysis = 'tran'
+            step, stop = spice_value(tokens[1]), spice_value(tokens[2])
+            self.points = int(math.ceil(stop / step)) + 1 if step > 0 else 1
+        elif keyword == '.dc' and len(tokens) >= 5:
+            self.analysis = 'dc'
+            start, stop, step = (spice_value(t) for t in tokens[2:5])
+            self.points = int(math.floor(abs(stop - start) / abs(step) + 1e-9)) + 1 if step else 1
+        elif keyword == '.step':
+            match = _STEP_DATA_RE.match(line)
+            if match:
+                self.step_tables.append(match.group(1).upper())
+        elif keyword in ('.options', '.option'):
+            match = _SAMPLES_RE.search(line)
+            if match:
+                self.numsamples = int(match.group(1))
+
+    def flat_counts(self, name, memo, active=()):
+        """Counts of a subcircuit with every X instance expanded (internal nodes only)"""
+        if name in memo:
+            return memo[name]
+        block = self.blocks.get(name)
+        if block is None or name in active:
+            return Counter()
+        counts = self._expand(block, memo, active + (name,))
+        counts['nodes'] = len(block.nodes - block.ports) + counts['nodes']
+        memo[name] = counts
+        return counts
+
+    def _expand(self, block, memo, active):
+        counts = Counter(block.counts)
+        for child in block.children:
+            counts.update(self.flat_counts(child, memo, active))
+        return counts
+
+    def report(self, tb_path):
+        memo = {}
+        flat = self._expand(self.top, memo, ())
+        flat['nodes'] += len(self.top.nodes)
+        samples = 1
+        for table in self.step_tables:
+            samples *= max(self.data_rows.get(table, 1), 1)
+        if self.numsamples is not None:
+            samples *= self.numsamples
+
+        report = {
+            'tb_path': tb_path,
+            'files': len(self.files),
+            'netlist_bytes': self.stats['netlist_bytes'],
+            'subckt_definitions': self.stats['subckt_definitions'],
+            'models': self.stats['models'],
+            'measures': self.stats['measures'],
+            'prints': self.stats['prints'],
+            'print_signals': self.stats['print_signals'],
+            'analysis': self.analysis,
+            'time_points': self.points,
+            'step_tables': {table: self.data_rows.get(table, 0) for table in self.step_tables},
+            'samples': samples,
+        }
+        for key in ('mosfets', 'instances', 'resistors', 'capacitors', 'sources', 'other',
+                    'rc_segments', 'nodes'):
+            report[key] = int(flat[key])
+        # 粗略工作量：器件数 x 时间点 x 样本数
+        report['work'] = float(max(report['mosfets'], 1)) * report['time_points'] * samples
+        return report
+
+
+def netlist_complexity(tb_path: str) -> dict:
+    """
+    Complexity report of a written netlist 网表复杂度报告
+
+    Returns a dict with, among others:
+        mosfets / instances / resistors / capacitors / sources / nodes:
+            counts of the flattened circuit
+        rc_segments: resistors added by `add_rc_networks_to_node()` (w_rc)
+        models / measures / prints / subckt_definitions: statement counts
+        analysis, time_points: 'tran' or 'dc' and its number of points
+        samples: `.STEP data=` rows times `numsamples`
+        work: mosfets * time_points * samples
+    """
+    scanner = _DeckScanner()
+    scanner.scan(tb_path)
+    return scanner.report(tb_path)
+
+
+def output_bytes(tb_path: str) -> int:
+    """Total size of the simulator outputs of `tb_path` (`.prn`, `.mtX`, `.msX`, ...)"""
+    return sum(os.path.getsize(p) for p in glob.glob(glob.escape(tb_path) + '.*')
+               if os.path.isfile(p))
+
+
+def _output_work(report: dict) -> float:
+    """Proxy of the output volume: printed points plus measured values per sample"""
+    return float(report['samples']) * (report['time_points'] * max(report.get('print_signals', 0), 1)
+                                       + report['measures'] + 1)
+
+
+class SimulationCostModel:
+    """
+    Runtime / output-size predictor fitted on past runs 仿真开销预测
+
+    Every `record()` appends one JSON line `{report, elapsed, output_bytes}` to
+    `history_path`. `predict()` refits lazily when the history has grown.
+    """
+
+    def __init__(self, history_path: str = os.path.join('sim', 'cost_history.jsonl'),
+                 min_runs: int = 8, ridge: float = 1e-3):
+        self.history_path = history_path
+        self.min_runs = min_runs
+        self.ridge = ridge
+        self._runs = None
+        self._fit = None
+
+    def history(self) -> List[dict]:
+        """Recorded runs, oldest first"""
+        if self._runs is None:
+            self._runs = []
+            if os.path.exists(self.history_path):
+                with open(self.history_path, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._runs.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            print(f"[WARNING] Skipping corrupt line in {self.history_path}")
+        return self._runs
+
+    def record(self, report: dict, elapsed: float, output_size: int) -> None:
+        """Add one finished run to the history"""
+        run = {'report': {k: v for k, v in report.items() if k != 'step_tables'},
+               'elapsed': float(elapsed), 'output_bytes': int(output_size)}
+        os.makedirs(os.path.dirname(self.history_path) or '.', exist_ok=True)
+        with open(self.history_path, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+        self.history().append(run)
+        self._fit = None
+
+    @staticmethod
+    def _features(report: dict) -> np.ndarray:
+        return np.array([1.0] + [math.log1p(float(report.get(k, 0))) for k in COST_FEATURES])
+
+    def fit(self) -> Optional[Dict[str, dict]]:
+        """Fit log(target) ~ log(1 + features) for 'elapsed' and 'output_bytes'"""
+        runs = [run for run in self.history() if run['elapsed'] > 0]
+        if len(runs) < self.min_runs:
+            self._fit = None
+            return None
+        X = np.stack([self._features(run['report']) for run in runs])
+        penalty = self.ridge * np.eye(X.shape[1])
+        penalty[0, 0] = 0.0  # the intercept is not penalized
+        fit = {}
+        for target in ('elapsed', 'output_bytes'):
+            y = np.log(np.array([max(run[target], 1e-9) for run in runs]))
+            coef = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+            residual = y - X @ coef
+            dof = max(len(runs) - X.shape[1], 1)
+            fit[target] = {'coef': coef, 'sigma': float(np.sqrt(residual @ residual / dof))}
+        self._fit = fit
+        return fit
+
+    def predict(self, report: dict) -> dict:
+        """
+        Predicted 'elapsed' (s) and 'output_bytes' of a deck, with a ~95% range
+        'method' is 'regression', 'ratio' (fewer than `min_runs` runs) or None (no history)
+        """
+        runs = [run for run in self.history() if run['elapsed'] > 0]
+        prediction = {'method': None, 'runs': len(runs), 'elapsed': None, 'output_bytes': None,
+                      'elapsed_range': None, 'output_bytes_range': None}
+        if not runs:
+            return prediction
+
+        if len(runs) >= self.min_runs:
+            fit = self._fit or self.fit()
+            x = self._features(report)
+            prediction['method'] = 'regression'
+            for target in ('elapsed', 'output_bytes'):
+                mean = float(x @ fit[target]['coef'])
+                spread = 2.0 * fit[target]['sigma']
+                prediction[target] = math.exp(mean)
+                prediction[f'{target}_range'] = (math.exp(mean - spread), math.exp(mean + spread))
+        else:
+            # 历史太少时按单位工作量的中位开销缩放
+            prediction['method'] = 'ratio'
+            for target, work in (('elapsed', lambda r: r['work']), ('output_bytes', _output_work)):
+                ratios = np.array([run[target] / max(work(run['report']), 1e-12) for run in runs])
+                prediction[target] = float(np.median(ratios) * work(report))
+                prediction[f'{target}_range'] = (float(ratios.min() * work(report)),
+                                                 float(ratios.max() * work(report)))
+        prediction['output_bytes'] = int(prediction['output_bytes'])
+        return prediction
+
+
+def netlist_cost_report(tb_path: str, cost_model: Optional[SimulationCostModel] = None) -> dict:
+    """`netlist_complexity()` plus, given a cost model, its prediction under 'predicted'"""
+    report = netlist_complexity(tb_path)
+    if cost_model is not None:
+        report['predicted'] = cost_model.predict(report)
+    return report
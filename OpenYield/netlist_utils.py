@@ -0,0 +1,763 @@
+"""
+网表后处理工具 / Post-processing passes over rendered SPICE netlists.
+
+PySpice renders every `.subckt` nested inside the subcircuit that registered
+it, so a decoder carries its own copy of PINV / PNAND / AND definitions, each
+AND gate carries another, and so on. `dedup_subcircuits()` hoists all
+definitions to the top level, hashes their bodies and emits every unique
+definition once, rewriting the `X` instance references to match.
+
+`write_netlist()` streams a PySpice simulator (circuit, options, measures,
+analyses) straight to the `.sp` file section by section, applying the same
+deduplication on the PySpice objects, so the netlist is never held in memory
+as one string.
+
+`reduce_rc_networks()` shrinks the parasitic RC of `w_rc` netlists: long
+series chains are merged and the per-instance RC stubs on a bitline or
+wordline are replaced by a few shared stubs.
+
+`NetlistTemplateCache` keeps the static body of a testbench (subcircuits,
+instances, stimuli) as a pre-rendered file, so later runs only write a thin
+top-level deck that `.include`s it.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+from PySpice.Tools.StringTools import join_dict
+
+from xyce_runner import config_fingerprint, atomic_write_json  # type: ignore
+from netlist_cost import spice_value  # type: ignore
+
+_SUBCKT_RE = re.compile(r'^\s*\.subckt\s', re.IGNORECASE)
+_ENDS_RE = re.compile(r'^\s*\.ends\b', re.IGNORECASE)
+
+
+def _logical_lines(text):
+    """Group physical lines into logical lines (a line plus its `+` continuations)"""
+    logical = []
+    for line in text.splitlines():
+        if line.lstrip().startswith('+') and logical:
+            logical[-1].append(line)
+        else:
+            logical.append([line])
+    return logical
+
+
+def _joined(physical):
+    """One logical line as a single string, continuations folded in"""
+    return ' '.join([physical[0]] + [p.lstrip()[1:] for p in physical[1:]])
+
+
+class _Definition:
+    """One `.subckt ... .ends` block and the definitions nested inside it"""
+    __slots__ = ('name', 'header', 'items', 'defs', 'parent', 'canonical')
+
+    def __init__(self, name, header, parent):
+        self.name = name            # name as written
+        self.header = header        # tokens after the name: ports and parameters
+        self.items = []             # logical lines, or _Definition at their position
+        self.defs = OrderedDict()   # NAME (upper case) -> _Definition declared here
+        self.parent = parent
+        self.canonical = None       # name in the output netlist, set once resolved
+
+
+def _parse(text):
+    """Parse a netlist into a tree of definitions rooted at the top level"""
+    root = _Definition(None, (), None)
+    scope = root
+    for physical in _logical_lines(text):
+        line = _joined(physical)
+        if _SUBCKT_RE.match(line):
+            tokens = line.split()
+            if len(tokens) < 2:
+                raise ValueError(f"Malformed .subckt line: {line}")
+            definition = _Definition(tokens[1], tuple(tokens[2:]), scope)
+            scope.defs[tokens[1].upper()] = definition
+            scope.items.append(definition)
+            scope = definition
+        elif _ENDS_RE.match(line):
+            if scope.parent is None:
+                raise ValueError(f"Unmatched .ends: {line}")
+            scope = scope.parent
+        else:
+            scope.items.append(physical)
+    if scope is not root:
+        raise ValueError(f"Missing .ends for subcircuit {scope.name}")
+    return root
+
+
+def _subckt_name_index(tokens):
+    """Index of the subcircuit name in the tokens of an `X` line"""
+    for i, token in enumerate(tokens[1:], start=1):
+        if '=' in token or token.upper() == 'PARAMS:':
+            return i - 1
+    return len(tokens) - 1
+
+
+def _rewrite_x_line(line, resolve):
+    """
+    Rewrite the subcircuit name of an `X` line through `resolve(name)`, which
+    returns the new name or None to keep it; other lines are returned as is
+    """
+    stripped = line.lstrip()
+    if stripped[:1] not in ('X', 'x'):
+        return line
+    tokens = stripped.split()
+    index = _subckt_name_index(tokens)
+    if index < 1:
+        return line
+    name = resolve(tokens[index])
+    if name is None or name == tokens[index]:
+        return line
+    tokens[index] = name
+    return ' '.join(tokens)
+
+
+def _lookup(scope, name):
+    """Resolve a subcircuit name the way SPICE scoping does: innermost scope first"""
+    key = name.upper()
+    while scope is not None:
+        if key in scope.defs:
+            return scope.defs[key]
+        scope = scope.parent
+    return None
+
+
+class _Canonicalizer:
+    def __init__(self):
+        self.by_body = {}           # body hash -> canonical name
+        self.taken = set()          # canonical names already in use (upper case)
+        self.ordered = []           # (name, header, body lines) in dependency order
+        self.renamed = {}           # original name -> set of canonical names
+
+    def rewrite(self, scope, physical):
+        """Rewrite the subcircuit reference of an `X` line, other lines pass through"""
+        def resolve(name):
+            target = _lookup(scope, name)
+            # None: defined in an included library
+            return self.resolve(target) if target is not None else None
+
+        line = _joined(physical)
+        rewritten = _rewrite_x_line(line, resolve)
+        return physical if rewritten is line else [rewritten]
+
+    def body(self, scope):
+        lines = []
+        for item in scope.items:
+            if isinstance(item, _Definition):
+                self.resolve(item)
+            elif item[0].strip():
+                lines.extend(self.rewrite(scope, item))
+        return lines
+
+    def resolve(self, definition):
+        """Canonical name of a definition, emitting it on first sight of its body"""
+        if definition.canonical is not None:
+            return definition.canonical
+        lines = self.body(definition)
+        digest = hashlib.sha256(
+            '\n'.join((' '.join(definition.header),) + tuple(lines)).encode()
+        ).hexdigest()
+        if digest not in self.by_body:
+            name, index = definition.name, 1
+            while name.upper() in self.taken:
+                name = f"{definition.name}_{index}"
+                index += 1
+            self.taken.add(name.upper())
+            self.by_body[digest] = name
+            self.ordered.append((name, definition.header, lines))
+        definition.canonical = self.by_body[digest]
+        if definition.canonical != definition.name:
+            self.renamed.setdefault(definition.name, set()).add(definition.canonical)
+        return definition.canonical
+
+
+def _count_definitions(scope):
+    return sum(1 + _count_definitions(d) for d in scope.items if isinstance(d, _Definition))
+
+
+def dedup_subcircuits(netlist):
+    """
+    去除重复子电路定义 / Emit every structurally identical `.subckt` once.
+
+    All definitions are hoisted to the top level, at the position of the first
+    top-level `.subckt`, children before parents. Two definitions are the same
+    when their ports, parameters and bodies (after rewriting the references of
+    their own instances) are byte-identical. A definition keeps its name unless
+    another body already uses it, in which case it becomes `<name>_<n>`; every
+    `X` line is rewritten to the definition it resolved to in the original
+    scoping, so the flattened circuit is unchanged.
+
+    Args:
+        netlist: rendered netlist text, e.g. `str(simulator)`
+    Returns:
+        (deduplicated netlist text, stats dict with definitions_in /
+         definitions_out / bytes_in / bytes_out / renamed)
+    """
+    root = _parse(netlist)
+    canon = _Canonicalizer()
+    top_lines, insert_at = [], None
+    for item in root.items:
+        if isinstance(item, _Definition):
+            if insert_at is None:
+                insert_at = len(top_lines)
+            canon.resolve(item)
+        else:
+            top_lines.extend(canon.rewrite(root, item))
+
+    definitions = []
+    for name, header, lines in canon.ordered:
+        definitions.append(' '.join(('.subckt', name) + header))
+        definitions.extend(lines)
+        definitions.append(f'.ends {name}')
+    if insert_at is None:
+        insert_at = len(top_lines)
+    out_lines = top_lines[:insert_at] + definitions + top_lines[insert_at:]
+    text = os.linesep.join(out_lines) + os.linesep
+
+    stats = {
+        'definitions_in': _count_definitions(root),
+        'definitions_out': len(canon.ordered),
+        'bytes_in': len(netlist),
+        'bytes_out': len(text),
+        'renamed': {name: sorted(names) for name, names in canon.renamed.items()},
+    }
+    return text, stats
+
+
+# add_rc_networks_to_node() names its segments R_<pin>_<i> / Cg_<pin>_<i>
+_RC_RES_RE = re.compile(r'^RR_(.+)_(\d+)$')
+_RC_CAP_RE = re.compile(r'^CCg_(.+)_(\d+)$')
+
+
+def _element_tokens(item):
+    """Tokens of an element line, None for directives, comments and definitions"""
+    if isinstance(item, _Definition):
+        return None
+    tokens = _joined(item).split()
+    if not tokens or tokens[0][0] in '.*':
+        return None
+    return tokens
+
+
+def _port_names(header):
+    return [t for t in header if '=' not in t and t.upper() != 'PARAMS:']
+
+
+class _RCChain:
+    """One RC network of add_rc_networks_to_node(): `start -R- ... -R- end`, C to ground per segment"""
+    __slots__ = ('pin', 'start', 'end', 'inner', 'ground', 'res', 'cap', 'segments', 'indices')
+
+    def __init__(self, pin, start, end, inner, ground, res, cap, indices):
+        self.pin = pin
+        self.start = start
+        self.end = end
+        self.inner = inner          # nodes between the segments
+        self.ground = ground
+        self.res = res              # total resistance
+        self.cap = cap              # total capacitance
+        self.segments = len(indices) // 2
+        self.indices = indices      # item indices of the R and C lines
+
+    def lines(self, segments):
+        """The chain as `segments` equal segments, total R and C unchanged"""
+        lines, node = [], self.start
+        for i in range(segments):
+            end = self.end if i == segments - 1 else f'{self.start}_seg{i}'
+            lines.append(f'RR_{self.pin}_{i} {node} {end} {self.res / segments:.6e}')
+            lines.append(f'CCg_{self.pin}_{i} {end} {self.ground} {self.cap / segments:.6e}')
+            node = end
+        return lines
+
+
+def _find_rc_chains(definition):
+    """RC networks of a definition whose inner nodes are used by nothing else, by pin"""
+    res, caps, usage = {}, {}, {}
+    for index, item in enumerate(definition.items):
+        tokens = _element_tokens(item)
+        if tokens is None:
+            continue
+        for regex, table in ((_RC_RES_RE, res), (_RC_CAP_RE, caps)):
+            match = regex.match(tokens[0])
+            if match and len(tokens) >= 4:
+                table.setdefault(match.group(1), {})[int(match.group(2))] = (index, tokens)
+                break
+        else:
+            for token in tokens[1:]:
+                usage[token] = usage.get(token, 0) + 1
+
+    chains = {}
+    for pin, segs in res.items():
+        n = len(segs)
+        pin_caps = caps.get(pin, {})
+        if sorted(segs) != list(range(n)) or sorted(pin_caps) != list(range(n)):
+            continue
+        node, inner, ground, total_r, total_c, indices = segs[0][1][1], [], None, 0.0, 0.0, []
+        try:
+            for i in range(n):
+                (r_index, r), (c_index, c) = segs[i], pin_caps[i]
+                if r[1] != node or c[1] != r[2] or (ground is not None and c[2] != ground):
+                    raise ValueError(pin)
+                ground = c[2]
+                total_r += spice_value(r[3])
+                total_c += spice_value(c[3])
+                indices += [r_index, c_index]
+                if i < n - 1:
+                    inner.append(r[2])
+                node = r[2]
+        except ValueError:
+            continue
+        if any(usage.get(inner_node) for inner_node in inner):
+            continue
+        chains[pin] = _RCChain(pin, segs[0][1][1], node, inner, ground, total_r, total_c, indices)
+    return chains
+
+
+class _RCReducer:
+    def __init__(self, max_segments, keep_instances, drop_nodes):
+        self.max_segments = max(int(max_segments), 1)
+        self.keep = [re.compile(p) for p in keep_instances]
+        self.drop_nodes = set(drop_nodes)
+        self.variants = {}          # id(definition) -> (definition, stripped variant or None, port chains)
+        self.pending = []           # (scope, definition, variant) still to be inserted
+        self.stats = {'chains': 0, 'segments_in': 0, 'segments_out': 0, 'variants': 0,
+                      'instances_reduced': 0, 'stubs_out': 0}
+
+    def merge_series(self, definition):
+        """Merge long RC chains of a definition into at most max_segments segments"""
+        replaced, removed = {}, set()
+        for chain in _find_rc_chains(definition).values():
+            segments = min(chain.segments, self.max_segments)
+            self.stats['chains'] += 1
+            self.stats['segments_in'] += chain.segments
+            self.stats['segments_out'] += segments
+            if segments < chain.segments:
+                removed.update(chain.indices)
+                replaced[min(chain.indices)] = chain.lines(segments)
+        if not removed:
+            return
+        items = []
+        for index, item in enumerate(definition.items):
+            if index in replaced:
+                items.extend([line] for line in replaced[index])
+            elif index not in removed:
+                items.append(item)
+        definition.items = items
+
+    def variant(self, definition):
+        """
+        Copy of `definition` without the RC of its ports and of the internal
+        nodes in drop_nodes, ports connect to their devices directly;
+        None when nothing can be stripped. Returns (variant, stripped port chains).
+        """
+        key = id(definition)
+        if key in self.variants:
+            return self.variants[key][1:]
+        ports = _port_names(definition.header)
+        usage = {}
+        for item in definition.items:
+            tokens = _element_tokens(item)
+            if tokens is not None:
+                for token in tokens[1:]:
+                    usage[token] = usage.get(token, 0) + 1
+        port_chains, strip = {}, []
+        for chain in _find_rc_chains(definition).values():
+            if chain.end in ports:
+                continue
+            if chain.start in ports:
+                # the port must reach the cell through the chain only
+                if usage.get(chain.start, 0) == 1:
+                    port_chains[chain.start] = chain
+                    strip.append(chain)
+            elif chain.start in self.drop_nodes:
+                strip.append(chain)
+        if not port_chains:
+            self.variants[key] = (definition, None, {})
+            return None, {}
+
+        removed = {index for chain in strip for index in chain.indices}
+        rename = {chain.end: chain.start for chain in strip}
+        name, index = f'{definition.name}_RCR', 1
+        scope = definition.parent
+        while name.upper() in scope.defs:
+            name = f'{definition.name}_RCR{index}'
+            index += 1
+        variant = _Definition(name, definition.header, scope)
+        for i, item in enumerate(definition.items):
+            if i in removed:
+                continue
+            tokens = _element_tokens(item)
+            if tokens is not None and any(t in rename for t in tokens[1:]):
+                item = [' '.join([tokens[0]] + [rename.get(t, t) for t in tokens[1:]])]
+            variant.items.append(item)
+        scope.defs[name.upper()] = variant
+        # placed after `definition` once the pass is done, item indices stay valid meanwhile
+        self.pending.append((scope, definition, variant))
+        self.stats['variants'] += 1
+        self.variants[key] = (definition, variant, port_chains)
+        return variant, port_chains
+
+    def merge_stubs(self, parent):
+        """
+        Instances of `parent` hang one RC stub per port on their nets; replace
+        the stubs of all non-kept instances on a net by at most max_segments
+        shared stubs (R / k, C * k for a group of k instances)
+        """
+        groups = OrderedDict()      # (net, port, id(definition)) -> [(item index, node position)]
+        chains = {}
+        rewritten = {}
+        for index, item in enumerate(parent.items):
+            tokens = _element_tokens(item)
+            if tokens is None or tokens[0][0] not in 'Xx':
+                continue
+            if any(regex.search(tokens[0]) for regex in self.keep):
+                continue
+            name_index = _subckt_name_index(tokens)
+            definition = _lookup(parent, tokens[name_index])
+            if definition is None:
+                continue
+            variant, port_chains = self.variant(definition)
+            if variant is None:
+                continue
+            ports = _port_names(definition.header)
+            tokens[name_index] = variant.name
+            for position, port in enumerate(ports, start=1):
+                if port in port_chains and position < name_index:
+                    key = (tokens[position], port, id(definition))
+                    groups.setdefault(key, []).append((index, position))
+                    chains[key] = port_chains[port]
+            rewritten[index] = tokens
+            self.stats['instances_reduced'] += 1
+
+        stubs = []
+        for key, members in groups.items():
+            net, port, _ = key
+            chain = chains[key]
+            count = min(self.max_segments, len(members))
+            size = -(-len(members) // count)
+            tag = re.sub(r'\W', '_', f'{net}_{port}')
+            for g in range(count):
+                group = members[g * size:(g + 1) * size]
+                if not group:
+                    continue
+                tap = f'RCR_{tag}_{g}'
+                stubs.append(f'RRCR_{tag}_{g} {net} {tap} {chain.res / len(group):.6e}')
+                stubs.append(f'CRCR_{tag}_{g} {tap} {chain.ground} {chain.cap * len(group):.6e}')
+                for index, position in group:
+                    rewritten[index][position] = tap
+                self.stats['stubs_out'] += 1
+        for index, tokens in rewritten.items():
+            parent.items[index] = [' '.join(tokens)]
+        if stubs:
+            # right after the last instance, i.e. before `.end` at the top level
+            at = max(rewritten) + 1
+            parent.items[at:at] = [[line] for line in stubs]
+
+    def process(self, scope):
+        """Children first, so a variant is cloned from a fully reduced definition"""
+        for item in list(scope.items):
+            if isinstance(item, _Definition):
+                self.process(item)
+        if scope.parent is not None:
+            self.merge_series(scope)
+        self.merge_stubs(scope)
+
+    def insert_variants(self):
+        for scope, definition, variant in self.pending:
+            scope.items.insert(scope.items.index(definition) + 1, variant)
+        self.pending = []
+
+
+def _render(scope, out):
+    for item in scope.items:
+        if isinstance(item, _Definition):
+            out.append(' '.join(('.subckt', item.name) + item.header))
+            _render(item, out)
+            out.append(f'.ends {item.name}')
+        else:
+            out.extend(item)
+
+
+def reduce_rc_networks(netlist, max_segments=1, keep_instances=(), drop_nodes=('Q', 'QB')):
+    """
+    RC 网络降阶 / Shrink the RC networks of a `w_rc` netlist.
+
+    Works on the chains of `add_rc_networks_to_node()` (R_<pin>_<i> in series,
+    Cg_<pin>_<i> to ground after every segment):
+    - series: a chain longer than `max_segments` is merged into `max_segments`
+      equal segments with the same total R and C (e.g. the 2-segment chains of
+      the decoder gates);
+    - parallel: instances whose port reaches the devices only through such a
+      chain (a cell's BL/WL/WWLA/WWLB) switch to a `<name>_RCR` copy of their
+      definition without that RC, and the stubs of all instances on one net are
+      replaced by at most `max_segments` shared stubs (R/k, k*C for k instances);
+      the copy also loses the RC of the internal nodes in `drop_nodes` (the
+      storage nodes Q/QB of a cell), other internal chains are kept.
+    Instances whose name matches one of the `keep_instances` regexes (the
+    target cell) keep their full RC.
+
+    Args:
+        netlist: rendered netlist text
+    Returns:
+        (reduced netlist text, stats dict with chains / segments_in / segments_out /
+         variants / instances_reduced / stubs_out)
+    """
+    root = _parse(netlist)
+    reducer = _RCReducer(max_segments, keep_instances, drop_nodes)
+    reducer.process(root)
+    reducer.insert_variants()
+    out = []
+    _render(root, out)
+    return os.linesep.join(out) + os.linesep, reducer.stats
+
+
+class NetlistWriter:
+    """
+    流式网表写出 / Write a PySpice netlist section by section to an open file.
+
+    Sections are emitted in PySpice order (title, includes, libs, globals,
+    params, raw SPICE, subcircuits, elements, models); every element is
+    rendered and written on its own, so memory stays bounded by the largest
+    single line rather than the netlist. With `dedup_subckts`, subcircuit
+    definitions are hoisted and deduplicated like `dedup_subcircuits()`: the
+    body of a definition is rendered twice (once to hash it, once to write it
+    if new) instead of being buffered.
+    """
+
+    def __init__(self, f, dedup_subckts=True):
+        self.f = f
+        self.dedup_subckts = dedup_subckts
+        self.bytes_written = 0
+        self.definitions_in = 0
+        self.definitions_out = 0
+        self._by_body = {}          # body hash -> canonical name
+        self._taken = set()         # canonical names in use (upper case)
+        self._canonical = {}        # id(subcircuit) -> canonical name
+        self._scopes = {}           # id(netlist) -> {name: subcircuit}
+
+    def write(self, text):
+        if text:
+            self.f.write(text)
+            self.bytes_written += len(text)
+
+    def write_line(self, line):
+        self.write(line + os.linesep)
+
+    # ------------------------------------------------------------------
+    #  Netlist bodies
+    # ------------------------------------------------------------------
+    def _scope(self, netlist):
+        key = id(netlist)
+        if key not in self._scopes:
+            self._scopes[key] = dict(zip(netlist.subcircuit_names, netlist.subcircuits))
+        return self._scopes[key]
+
+    def _resolver(self, chain):
+        """Resolve X references against a chain of netlists, innermost last"""
+        def resolve(name):
+            for netlist in reversed(chain):
+                subcircuit = self._scope(netlist).get(name)
+                if subcircuit is not None:
+                    return self._resolve(subcircuit, chain[:chain.index(netlist) + 1])
+            return None
+        return resolve
+
+    def _own_lines(self, netlist, chain, raw_spice=True):
+        """Lines of a netlist body, nested subcircuit definitions excluded"""
+        resolve = self._resolver(chain) if self.dedup_subckts else None
+        if raw_spice:
+            for line in netlist.raw_spice.splitlines():
+                if line.strip():
+                    yield _rewrite_x_line(line, resolve) if resolve else line
+        for element in netlist.elements:
+            if element.enabled:
+                line = str(element)
+                yield _rewrite_x_line(line, resolve) if resolve else line
+        for model in netlist.models:
+            yield str(model)
+
+    @staticmethod
+    def _header(subcircuit):
+        params = [f'{key}={value}' for key, value in subcircuit.parameters.items()]
+        return tuple(str(node) for node in subcircuit.external_nodes) + tuple(params)
+
+    def _resolve(self, subcircuit, chain):
+        """Canonical name of a subcircuit, writing its definition on first sight of its body"""
+        key = id(subcircuit)
+        if key in self._canonical:
+            return self._canonical[key]
+        self.definitions_in += 1
+        inner = chain + [subcircuit]
+        for child in subcircuit.subcircuits:
+            self._resolve(child, inner)
+
+        header = self._header(subcircuit)
+        digest = hashlib.sha256(' '.join(header).encode())
+        for line in self._own_lines(subcircuit, inner):
+            digest.update(b'\n' + line.encode())
+        digest = digest.hexdigest()
+
+        if digest not in self._by_body:
+            name, index = subcircuit.name, 1
+            while name.upper() in self._taken:
+                name = f"{subcircuit.name}_{index}"
+                index += 1
+            self._taken.add(name.upper())
+            self._by_body[digest] = name
+            self.definitions_out += 1
+            self.write_line(' '.join(('.subckt', name) + header))
+            for line in self._own_lines(subcircuit, inner):
+                self.write_line(line)
+            self.write_line(f'.ends {name}')
+        self._canonical[key] = self._by_body[digest]
+        return self._canonical[key]
+
+    def _write_nested(self, netlist):
+        """PySpice layout: definitions nested inside the subcircuit that registered them"""
+        for line in netlist.raw_spice.splitlines():
+            if line.strip():
+                self.write_line(line)
+        for subcircuit in netlist.subcircuits:
+            self.definitions_in += 1
+            self.definitions_out += 1
+            self.write_line(' '.join(('.subckt', subcircuit.name) + self._header(subcircuit)))
+            self._write_nested(subcircuit)
+            self.write_line(f'.ends {subcircuit.name}')
+        for element in netlist.elements:
+            if element.enabled:
+                self.write_line(str(element))
+        for model in netlist.models:
+            self.write_line(str(model))
+
+    def write_body(self, netlist):
+        """Raw SPICE, subcircuits, elements and models of a top-level netlist"""
+        if not self.dedup_subckts:
+            self._write_nested(netlist)
+            return
+        for line in netlist.raw_spice.splitlines():
+            if line.strip():
+                self.write_line(line)
+        for subcircuit in netlist.subcircuits:
+            self._resolve(subcircuit, [netlist])
+        for line in self._own_lines(netlist, [netlist], raw_spice=False):
+            self.write_line(line)
+
+    # ------------------------------------------------------------------
+    #  Circuit and simulator sections
+    # ------------------------------------------------------------------
+    def write_circuit(self, circuit, simulator_name=None):
+        """`.title`, includes, libs, globals, params, then the body (Circuit.str())"""
+        self.write(circuit._str_title())
+        self.write(circuit._str_includes(simulator_name))
+        self.write(circuit._str_libs(simulator_name))
+        self.write(circuit._str_globals())
+        self.write(circuit._str_parameters())
+        self.write_body(circuit)
+
+    def write_simulator(self, simulator):
+        """Circuit, options, .ic/.nodeset/.save, measures, analyses and `.end`"""
+        self.write_circuit(simulator.circuit, getattr(simulator, 'SIMULATOR', None))
+        self.write(simulator.str_options())
+        # PySpice keeps these sections in private attributes, see CircuitSimulation.__str__()
+        if simulator._initial_condition:
+            self.write_line('.ic ' + join_dict(simulator._initial_condition))
+        if simulator._node_set:
+            self.write_line('.nodeset ' + join_dict(simulator._node_set))
+        if simulator._saved_nodes:
+            saved_nodes = list(simulator._saved_nodes)
+            if 'all' in saved_nodes:
+                saved_nodes.remove('all')
+                saved_nodes.insert(0, 'all')
+            self.write_line('.save ' + ' '.join(str(node) for node in saved_nodes))
+        for measure in simulator._measures:
+            self.write_line(str(measure))
+        for analysis in simulator._analyses.values():
+            self.write_line(str(analysis))
+        self.write_line('.end')
+
+
+def write_netlist(simulator, path, dedup_subckts=True, buffer_size=1 << 20):
+    """
+    流式写出网表 / Stream a PySpice simulator to a `.sp` file.
+
+    Same content as `str(simulator)` (deduplicated like `dedup_subcircuits()`
+    when `dedup_subckts`), written through a `buffer_size` byte buffer
+    without materializing the whole netlist.
+
+    Returns:
+        stats dict with definitions_in / definitions_out / bytes_out
+    """
+    with open(path, 'w', buffering=buffer_size) as f:
+        writer = NetlistWriter(f, dedup_subckts=dedup_subckts)
+        writer.write_simulator(simulator)
+    return {
+        'definitions_in': writer.definitions_in,
+        'definitions_out': writer.definitions_out,
+        'bytes_out': writer.bytes_written,
+    }
+
+
+class NetlistTemplateCache:
+    """
+    预渲染网表主体缓存 / Cache of pre-rendered testbench bodies.
+
+    An entry `<cache_dir>/<key>.sp` holds everything `create_testbench()` puts
+    into a circuit except the title and the `.include`/`.lib` lines: globals,
+    params, raw SPICE, subcircuit definitions, instances and stimuli. The key is
+    the fingerprint of the settings that shape that body (geometry, options,
+    device sizes, ...). `<key>.json` stores the settings plus caller metadata.
+    Model libs, data tables, analyses and measures stay in the per-run deck.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join('sim', 'netlist_templates'),
+                 dedup_subckts: bool = True):
+        self.cache_dir = cache_dir
+        self.dedup_subckts = dedup_subckts
+        self._entries = {}  # key -> metadata of entries seen by this process
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, settings: dict) -> str:
+        return config_fingerprint(settings)
+
+    def body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.sp')
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key: str):
+        """Metadata of a cached body, or None on a cache miss"""
+        if key in self._entries:
+            return self._entries[key]
+        if not (os.path.isfile(self.body_path(key)) and os.path.isfile(self._meta_path(key))):
+            return None
+        with open(self._meta_path(key), 'r') as f:
+            meta = json.load(f)
+        self._entries[key] = meta
+        return meta
+
+    def put(self, key: str, circuit, settings: dict, **meta) -> dict:
+        """Render the body of `circuit` into the cache (atomically) and return its metadata"""
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.sp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', buffering=1 << 20) as f:
+                writer = NetlistWriter(f, dedup_subckts=self.dedup_subckts)
+                writer.write(circuit._str_globals())
+                writer.write(circuit._str_parameters())
+                writer.write_body(circuit)
+            os.replace(tmp_path, self.body_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # Stored the way config_fingerprint() sees them (unit values as strings)
+        settings = json.loads(json.dumps(settings, default=str))
+        meta = dict(meta, settings=settings, bytes=writer.bytes_written,
+                    definitions_in=writer.definitions_in, definitions_out=writer.definitions_out)
+        atomic_write_json(self._meta_path(key), meta)
+        self._entries[key] = meta
+        return meta
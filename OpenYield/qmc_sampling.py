@@ -0,0 +1,219 @@
+"""
+准蒙特卡洛采样 / Quasi-Monte Carlo designs for custom_mc process parameter tables.
+
+With `custom_mc=True` every row of the data table written by
+`gen_process_params()` is one Monte Carlo sample: vth0/u0/voff of the six
+transistors (PGL, PGR, PDL, PUL, PDR, PUR) of every cell. Instead of plain
+pseudo-random normals, the samples here come from a low-discrepancy design on
+[0, 1)^d (scrambled Sobol, Halton or Latin hypercube) pushed through the
+Gaussian inverse CDF, which makes means and quantiles converge faster in the
+number of Xyce runs.
+
+    vars = process_param_table(num_rows, num_cols, 'read', 256, method='sobol', seed=0)
+    tb.run_mc_simulation(..., vars=vars)
+
+Randomized QMC error bars come from independent re-randomizations of the design:
+
+    designs = rqmc_designs('sobol', 64, dim, replicates=8, seed=0)
+    ... simulate every design ...
+    stats = rqmc_error(metric_values_per_replicate, fail_threshold=...)
+
+Sobol and Halton use `scipy.stats.qmc`; Latin hypercube and plain MC only need NumPy.
+"""
+import warnings
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from xyce_runner import shard_seeds  # type: ignore
+
+SAMPLING_METHODS = ('sobol', 'halton', 'lhs', 'mc')
+
+# Nominal vth0/u0/voff per transistor, in the column order of gen_process_params()
+CELL_NOMINALS = np.array([
+    0.4106, 0.045, -0.13,    # PGL
+    0.4106, 0.045, -0.13,    # PGR
+    0.4106, 0.045, -0.13,    # PDL
+    -0.3842, 0.02, -0.126,   # PUL
+    0.4106, 0.045, -0.13,    # PDR
+    -0.3842, 0.02, -0.126,   # PUR
+])
+PARAMS_PER_CELL = len(CELL_NOMINALS)
+
+# Dimension limit of scipy's Sobol direction numbers
+SOBOL_MAX_DIM = 21201
+
+
+def _scipy_qmc():
+    try:
+        from scipy.stats import qmc
+    except ImportError as e:
+        raise ImportError("Sobol and Halton sampling need scipy (pip install scipy); "
+                          "use method='lhs' or 'mc' without it") from e
+    return qmc
+
+
+def _latin_hypercube(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """One point per stratum and dimension, strata shuffled independently per column"""
+    strata = rng.permuted(np.tile(np.arange(n), (dim, 1)), axis=1).T
+    return (strata + rng.random((n, dim))) / n
+
+
+def unit_design(method: str, n: int, dim: int, seed: Optional[int] = None,
+                scramble: bool = True) -> np.ndarray:
+    """
+    n points of a design on the unit cube [0, 1)^dim 单位超立方体上的采样点
+    Args:
+        method: 'sobol', 'halton', 'lhs' or 'mc'
+        seed: seed of the scrambling / permutation, same seed -> same design
+        scramble: Owen-scramble Sobol and Halton (needed for unbiased RQMC estimates)
+    """
+    method = method.lower()
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method {method!r}, expected one of {SAMPLING_METHODS}")
+    if n <= 0 or dim <= 0:
+        raise ValueError(f"Design needs n > 0 and dim > 0, got n={n}, dim={dim}")
+
+    rng = np.random.default_rng(seed)
+    if method == 'mc':
+        return rng.random((n, dim))
+    if method == 'lhs':
+        return _latin_hypercube(n, dim, rng)
+
+    qmc = _scipy_qmc()
+    if method == 'sobol':
+        if dim > SOBOL_MAX_DIM:
+            raise ValueError(f"Sobol supports at most {SOBOL_MAX_DIM} dimensions, got {dim}; "
+                             f"use method='lhs' or 'halton' for this array size")
+        if n & (n - 1):
+            print(f"[WARNING] Sobol balance properties need a power of 2 samples, got n={n}")
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # same warning as above
+            return qmc.Sobol(dim, scramble=scramble, seed=rng).random(n)
+    return qmc.Halton(dim, scramble=scramble, seed=rng).random(n)
+
+
+def inverse_normal_cdf(u: np.ndarray) -> np.ndarray:
+    """Standard normal quantiles of `u`, element-wise"""
+    u = np.asarray(u, dtype=float)
+    try:
+        from scipy.special import ndtri
+    except ImportError:
+        return np.vectorize(NormalDist().inv_cdf, otypes=[float])(u)
+    return ndtri(u)
+
+
+def normal_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF of `x`, element-wise"""
+    x = np.asarray(x, dtype=float)
+    try:
+        from scipy.special import ndtr
+    except ImportError:
+        return np.vectorize(NormalDist().cdf, otypes=[float])(x)
+    return ndtr(x)
+
+
+def gaussian_design(method: str, n: int, dim: int, seed: Optional[int] = None,
+                    scramble: bool = True) -> np.ndarray:
+    """Standard normal samples (n, dim) from a design of `unit_design()`"""
+    u = unit_design(method, n, dim, seed, scramble)
+    # Unscrambled designs contain 0, keep the quantiles finite
+    eps = np.finfo(float).eps
+    return inverse_normal_cdf(np.clip(u, eps, 1 - eps))
+
+
+def num_table_cells(num_rows: int, num_cols: int, operation: str) -> int:
+    """Cells with their own columns in the data table (1 for SNM, see gen_process_params)"""
+    return 1 if 'snm' in operation else num_rows * num_cols
+
+
+def process_param_moments(num_rows: int, num_cols: int, operation: str,
+                          rel_sigma: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+    """Nominal means and `rel_sigma * |mean|` sigmas of the gen_process_params() columns"""
+    means = np.tile(CELL_NOMINALS, num_table_cells(num_rows, num_cols, operation))
+    return means, rel_sigma * np.abs(means)
+
+
+def process_param_table(num_rows: int, num_cols: int, operation: str, num_mc: int,
+                        method: str = 'sobol', seed: Optional[int] = None,
+                        rel_sigma: float = 0.05, means: Sequence[float] = None,
+                        stds: Sequence[float] = None, scramble: bool = True) -> np.ndarray:
+    """
+    `vars` for gen_process_params(): (num_mc, 18 * cells) Gaussian process parameters
+    工艺参数数据表
+    Args:
+        means: per-column means, defaults to CELL_NOMINALS of every cell
+        stds: per-column standard deviations, defaults to `rel_sigma * |means|`
+              (the same relative sigma as the AGAUSS cards of the MC model library)
+    """
+    dim = num_table_cells(num_rows, num_cols, operation) * PARAMS_PER_CELL
+    if means is None:
+        means = process_param_moments(num_rows, num_cols, operation)[0]
+    means = np.asarray(means, float)
+    stds = rel_sigma * np.abs(means) if stds is None else np.asarray(stds, float)
+    if means.shape != (dim,) or stds.shape != (dim,):
+        raise ValueError(f"means/stds must have {dim} entries for {operation} on a "
+                         f"{num_rows}x{num_cols} array, got {means.shape} and {stds.shape}")
+    z = gaussian_design(method, num_mc, dim, seed, scramble)
+    print(f"[DEBUG] {method} design: {num_mc} samples x {dim} params (seed={seed})")
+    return means + z * stds
+
+
+def rqmc_designs(method: str, n: int, dim: int, replicates: int = 8,
+                 seed: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Independently randomized copies of one design, for randomized-QMC error estimates
+    Seeds are derived from `seed` like the MC shard seeds, so the set is reproducible.
+    """
+    if replicates < 2:
+        raise ValueError("RQMC error estimates need at least 2 replicates")
+    return [gaussian_design(method, n, dim, replicate_seed)
+            for replicate_seed in shard_seeds(seed, replicates)]
+
+
+def rqmc_error(values, confidence: float = 0.95, fail_threshold: float = None,
+               fail_above: bool = True) -> Dict[str, Any]:
+    """
+    Estimate and error of a metric over RQMC replicates
+    随机化准蒙特卡洛的误差估计
+
+    Args:
+        values: (replicates, n) metric values, one row per randomized design
+                (NaN samples, i.e. failed measurements, are dropped per replicate)
+        confidence: two-sided confidence level of the intervals
+        fail_threshold / fail_above: failure criterion, as in mc_convergence_stats()
+
+    Returns:
+        Dict with 'replicates', 'n', 'mean', 'std_error', 'mean_ci', 'rel_ci_width'
+        and, with `fail_threshold`, 'pfail', 'pfail_std_error', 'pfail_ci'.
+        The errors are the spread of the per-replicate estimates, which stays
+        valid where the i.i.d. formula of plain MC overstates the QMC error.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[0] < 2:
+        raise ValueError(f"values must be (replicates >= 2, n), got shape {values.shape}")
+    r = values.shape[0]
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    valid = ~np.isnan(values)
+
+    def _summary(estimates):
+        mean = float(np.mean(estimates))
+        std_error = float(np.std(estimates, ddof=1) / np.sqrt(r))
+        return mean, std_error, (mean - z * std_error, mean + z * std_error)
+
+    with np.errstate(invalid='ignore'):
+        replicate_means = np.nanmean(values, axis=1)
+    result = {'replicates': r, 'n': int(valid.sum())}
+    result['mean'], result['std_error'], result['mean_ci'] = _summary(replicate_means)
+    result['rel_ci_width'] = (2 * z * result['std_error'] / abs(result['mean'])
+                              if result['mean'] != 0 else np.inf)
+
+    if fail_threshold is not None:
+        with np.errstate(invalid='ignore'):
+            fails = values > fail_threshold if fail_above else values < fail_threshold
+        pfails = (fails & valid).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+        pfail, std_error, (low, high) = _summary(pfails)
+        result.update(pfail=pfail, pfail_std_error=std_error,
+                      pfail_ci=(max(0.0, low), min(1.0, high)))
+    return result
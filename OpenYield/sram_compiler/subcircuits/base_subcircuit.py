@@ -1,6 +1,8 @@
 from PySpice.Spice.Netlist import SubCircuitFactory, SubCircuit, Circuit
 from PySpice.Unit import u_Ohm, u_pF
 
+from model_library import MODEL_LIBRARY  # type: ignore
+
 class BaseSubcircuit(SubCircuit):
     ###6T SRAM Cell SubCircuitFactory with debug capabilities###
     NAME = 'BASE_SUBCKT'
@@ -55,19 +57,19 @@ class BaseSubcircuit(SubCircuit):
     sim/param_sweep_model_name.txt"
         """
         try:
-            with open(self.param_file, 'r') as f:
-                lines = f.readlines()
-                # 假设第一行为标题行，第二行为数据行
-                if len(lines) >= 2:
-                    header = lines[0].strip().split()
-                    values = lines[1].strip().split()
-                    models = {}
-                    for key in names:
-                        if key not in header:
-                            raise ValueError(f"Missing required column: {key}")
-                        index = header.index(key)
-                        models[key.split('_')[0]] = values[index]  # 保留 pmos/nmos作为键
-                    return models
+            # 文件内容在进程内缓存 (按 mtime 失效)，每个子电路实例不再重新打开
+            lines = MODEL_LIBRARY.param_file_rows(self.param_file)
+            # 假设第一行为标题行，第二行为数据行
+            if len(lines) >= 2:
+                header = lines[0].strip().split()
+                values = lines[1].strip().split()
+                models = {}
+                for key in names:
+                    if key not in header:
+                        raise ValueError(f"Missing required column: {key}")
+                    index = header.index(key)
+                    models[key.split('_')[0]] = values[index]  # 保留 pmos/nmos作为键
+                return models
         except FileNotFoundError:
             raise FileNotFoundError(f"Parameter file '{self.param_file}' not found.")
         except Exception as e:
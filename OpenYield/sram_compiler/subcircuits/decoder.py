@@ -121,18 +121,17 @@ class DECODER3_8(BaseSubcircuit):
         self.nmos_model_choices = nmos_model_choices
 
         # Inverters for A0-A2
-        self.inv_A0 = PINV(nmos_model_name, pmos_model_name, sweep=self.sweep)
-        self.inv_A1 = PINV(nmos_model_name, pmos_model_name, sweep=self.sweep)
-        self.inv_A2 = PINV(nmos_model_name, pmos_model_name, sweep=self.sweep)
+        # 三个反相器 / 八个与门结构相同，各只建一个定义，实例共用
+        self.inv_A0 = self.inv_A1 = self.inv_A2 = PINV(nmos_model_name, pmos_model_name, sweep=self.sweep)
         self.subcircuit(self.inv_A0)
-        self.subcircuit(self.inv_A1)
-        self.subcircuit(self.inv_A2)
 
-        # 8 AND3 gates and 8 AND2 gates
-        self.and_gates = [AND3(nmos_model_name, pmos_model_name, sweep=self.sweep) for _ in range(8)]
-        self.and_en_gates = [AND2(nmos_model_name, pmos_model_name, sweep=self.sweep) for _ in range(8)]
-        for g in self.and_gates + self.and_en_gates:
-            self.subcircuit(g)
+        # 8 AND3 gates and 8 AND2 gates, one definition each
+        and_gate = AND3(nmos_model_name, pmos_model_name, sweep=self.sweep)
+        and_en_gate = AND2(nmos_model_name, pmos_model_name, sweep=self.sweep)
+        self.and_gates = [and_gate] * 8
+        self.and_en_gates = [and_en_gate] * 8
+        self.subcircuit(and_gate)
+        self.subcircuit(and_en_gate)
 
         self.add_decoder_components()
 
@@ -188,20 +187,22 @@ class DECODER_CASCADE(BaseSubcircuit):
         self.decoders_by_level = []
         self.level_output_nodes = [[] for _ in range(self.n_levels)]
 
+        # 所有 3-8 译码器参数相同，只建一个定义，各组实例共用
+        decoder = DECODER3_8(nmos_model_name, pmos_model_name,
+                             sweep=self.sweep,
+                             base_inv_pmos_width=base_inv_pmos_width,
+                             base_inv_nmos_width=base_inv_nmos_width,
+                             base_nand_pmos_width=base_nand_pmos_width,
+                             base_nand_nmos_width=base_nand_nmos_width,
+                             length=length, w_rc=w_rc)
+        self.subcircuit(decoder)
+
         for level in range(self.n_levels):
             level_decoders = []
             for decoder_idx in range(self.level_groups[level]):
                 start_bit = 3 * (self.n_levels - level - 1)
                 address_nodes = [f'A{start_bit+bit}' if 0 <= start_bit+bit < self.n_bits else 'VSS' for bit in range(3)]
 
-                decoder = DECODER3_8(nmos_model_name, pmos_model_name,
-                                     sweep=self.sweep,
-                                     base_inv_pmos_width=base_inv_pmos_width,
-                                     base_inv_nmos_width=base_inv_nmos_width,
-                                     base_nand_pmos_width=base_nand_pmos_width,
-                                     base_nand_nmos_width=base_nand_nmos_width,
-                                     length=length, w_rc=w_rc)
-                self.subcircuit(decoder)
                 level_decoders.append(decoder)
 
                 enable_signal = 'VDD' if level == 0 else self.level_output_nodes[level - 1][decoder_idx] if decoder_idx < len(self.level_output_nodes[level - 1]) else 'VSS'
@@ -0,0 +1,117 @@
+"""
+轻量网表 IR / Compact netlist representation for large arrays.
+
+PySpice creates an Element object per `M()`/`X()` call, with its own pin, node
+and parameter objects, so building a 256x256 core is dominated by Python object
+creation. Here every device or instance is a `__slots__` record holding its
+name, a tuple of interned node names and its pre-formatted parameter text.
+
+`IRNetlistMixin` gives a PySpice subcircuit the same `M/X/R/C/I/V/B` API on top
+of these records, so existing builder classes target the IR unchanged:
+
+    Sram9TCoreIR = ir_variant(Sram9TCore)
+    core = Sram9TCoreIR(256, 256, 'NMOS_VTG', 'PMOS_VTG', 'NMOS_VTG')
+
+The result is still a PySpice subcircuit: it renders through `str()`, can be
+registered with `circuit.subcircuit()` and is streamed by
+`netlist_utils.write_netlist()` like any other definition.
+"""
+import sys
+
+from PySpice.Tools.StringTools import str_spice
+
+
+def _node(node):
+    """Interned name of a node (str, int or PySpice Node, ground is `0`)"""
+    return sys.intern(str(node))
+
+
+def _params(parameters):
+    """`key=value` text of element parameters, sorted like PySpice renders them"""
+    return ' '.join(f'{key}={str_spice(value)}' for key, value in sorted(parameters.items())
+                    if value is not None)
+
+
+class IRElement:
+    """One device or subcircuit instance: `<name> <nodes...> <tail>`"""
+    __slots__ = ('name', 'nodes', 'tail')
+    enabled = True  # PySpice renders only enabled elements
+
+    def __init__(self, name, nodes, tail):
+        self.name = name    # full SPICE name, prefix letter included
+        self.nodes = nodes  # tuple of interned node names
+        self.tail = tail    # model / subcircuit name, value and parameters
+
+    def __str__(self):
+        if self.tail:
+            return f"{self.name} {' '.join(self.nodes)} {self.tail}"
+        return f"{self.name} {' '.join(self.nodes)}"
+
+
+class IRNetlistMixin:
+    """
+    Record elements as IRElement instead of PySpice element objects
+    Put before the PySpice class in the bases, see `ir_variant()`.
+    """
+
+    @property
+    def elements(self):
+        return self.__dict__.setdefault('_ir_elements', [])
+
+    @property
+    def element_names(self):
+        return [element.name for element in self.elements]
+
+    def _add_ir_element(self, prefix, name, nodes, tail):
+        names = self.__dict__.setdefault('_ir_names', set())
+        full_name = f'{prefix}{name}'
+        if full_name in names:
+            raise NameError(f"Element name {full_name} is already defined")
+        names.add(full_name)
+        element = IRElement(full_name, tuple(_node(node) for node in nodes), tail)
+        self.elements.append(element)
+        return element
+
+    def M(self, name, drain, gate, source, bulk, model, **parameters):
+        return self._add_ir_element('M', name, (drain, gate, source, bulk),
+                                    ' '.join(filter(None, (str(model), _params(parameters)))))
+
+    def X(self, name, subcircuit_name, *nodes, **parameters):
+        return self._add_ir_element('X', name, nodes,
+                                    ' '.join(filter(None, (str(subcircuit_name), _params(parameters)))))
+
+    def _two_terminal(self, prefix, name, n1, n2, value):
+        return self._add_ir_element(prefix, name, (n1, n2), str_spice(value))
+
+    def R(self, name, n1, n2, value):
+        return self._two_terminal('R', name, n1, n2, value)
+
+    def C(self, name, n1, n2, value):
+        return self._two_terminal('C', name, n1, n2, value)
+
+    def I(self, name, n1, n2, value):
+        return self._two_terminal('I', name, n1, n2, value)
+
+    def V(self, name, n1, n2, value):
+        return self._two_terminal('V', name, n1, n2, value)
+
+    def B(self, name, n1, n2, i=None, v=None, **parameters):
+        expressions = {key: value for key, value in (('i', i), ('v', v)) if value is not None}
+        return self._add_ir_element('B', name, (n1, n2),
+                                    _params(dict(parameters, **expressions)))
+
+
+_ir_classes = {}
+
+
+def ir_variant(cls):
+    """
+    同一子电路类的 IR 版本 / Subclass of `cls` whose elements are IR records.
+    Constructors and builder methods are inherited as is, e.g.
+    `ir_variant(Sram9TCore)(num_rows, num_cols, ...)`.
+    """
+    if issubclass(cls, IRNetlistMixin):
+        return cls
+    if cls not in _ir_classes:
+        _ir_classes[cls] = type(f'{cls.__name__}IR', (IRNetlistMixin, cls), {})
+    return _ir_classes[cls]
@@ -224,8 +224,8 @@ class Sram9TCellForYield(Sram9TCell):#支持良率分析的9t sram单元
         model_data = self.model_dict[pdk_model_name]
         # 2. 获取器件类型（nmos 或 pmos），用于 SPICE .model 语句的语法
         mos_type = model_data['type']
-        # 3. 开始构建 SPICE 语法字符串：.model <模型名> <类型>
-        self.raw_spice += f'.model {udf_model_name} {mos_type} '
+        # 3. 开始构建 SPICE 语法字符串：.model <模型名> <类型>，各段收集后一次拼接
+        card = [f'.model {udf_model_name} {mos_type} ']
         # 4. 获取该模型所有的物理参数列表（如 vth0, u0, cgdo 等）
         params = model_data['parameters']
         # 5. 遍历每一个物理参数，准备写入网表
@@ -245,10 +245,10 @@ class Sram9TCellForYield(Sram9TCell):#支持良率分析的9t sram单元
             # 这样 SPICE 仿真器在运行时可以从外部统计块中读取该变量的随机值。
             if param_name in ['vth0', 'u0', 'voff']:
                 param_str = f"'{param_name}_{udf_model_name}'"
-            # 6. 将处理好的 参数=值 键值对拼接进 raw_spice 字符串
-            self.raw_spice += f"{param_name}={param_str} "
-        # 7. 该模型定义结束，换行
-        self.raw_spice += "\n"
+            # 6. 将处理好的 参数=值 键值对加入模型卡
+            card.append(f"{param_name}={param_str} ")
+        # 7. 该模型定义结束，换行后写入 raw_spice
+        self.raw_spice += ''.join(card) + "\n"
 
 
 
@@ -263,7 +263,20 @@ class Sram9TCore(SubCircuitFactory):
     """
     9T SRAM 存储阵列子电路工厂类。
     支持配置行数、列数，并自动生成对应的读写控制网络。
+
+    降阶阵列模式 (reduced_target=(row, col))：只有目标行和目标列的单元保留晶体管级，
+    其余单元由 add_lumped_loads() 换成等效的 BL/WL 负载（电容 + 漏电流源），
+    器件数从 O(R*C) 降到 O(R+C)。
     """
+    # 集总负载的默认工艺常数 (PTM / FreePDK45 量级)，可通过 lumped_load 参数覆盖
+    LUMPED_LOAD_DEFAULTS = {
+        'cox': 3.9 * 8.854e-12 / 1.14e-9,  # 栅氧电容 F/m^2 (toxe=1.14nm)
+        'cgo': 1.1e-10,                    # 栅源/栅漏交叠电容 F/m (cgso=cgdo)
+        'cj': 6e-10,                       # 漏/源结电容 F/m (每单位管宽)
+        'ioff_n': 0.1,                     # NMOS 关态漏电流 A/m (100 nA/um)
+        'ioff_p': 0.05,                    # PMOS 关态漏电流 A/m (50 nA/um)
+        'vt_leak': 0.1,                    # BL 漏电流随 V(BL) 饱和的电压尺度 V
+    }
 
     def __init__(self, num_rows: int, num_cols: int,
                  pd_nmos_model_name: str, pu_pmos_model_name: str, pg_nmos_model_name: str,
@@ -272,7 +285,8 @@ class Sram9TCore(SubCircuitFactory):
                  w_rc=False, pi_res=100 @ u_Ohm, pi_cap=0.001 @ u_pF,
                  param_sweep=False,
                  pmos_model_choices='PMOS_VTG',
-                 nmos_model_choices='NMOS_VTG'
+                 nmos_model_choices='NMOS_VTG',
+                 reduced_target=None, lumped_load=None
                  ):
 
         self.NAME = f"SRAM_9T_CORE_{num_rows}x{num_cols}"
@@ -307,6 +321,9 @@ class Sram9TCore(SubCircuitFactory):
         self.param_sweep = param_sweep
         self.pmos_model_choices = pmos_model_choices
         self.nmos_model_choices = nmos_model_choices
+        # 降阶模式：(target_row, target_col)，None 表示全部单元为晶体管级
+        self.reduced_target = tuple(reduced_target) if reduced_target is not None else None
+        self.lumped_load = {**self.LUMPED_LOAD_DEFAULTS, **(lumped_load or {})}
 
         # 2. 构建阵列拓扑
         self.build_array(num_rows, num_cols)
@@ -332,23 +349,85 @@ class Sram9TCore(SubCircuitFactory):
         # B. 将 9T 单元定义添加到当前的阵列子电路中
         self.subcircuit(subckt_9t_cell)
 
-        # C. 遍历所有行列，按照 9T 的节点顺序进行实例化
-        for row in range(num_rows):
-            for col in range(num_cols):
-                self.X(
-                    f"{subckt_9t_cell.name}_{row}_{col}", # 实例名 (e.g. SRAM_9T_CELL_0_0)
-                    subckt_9t_cell.name,                  # 子电路类型名
-                    self.NODES[0],   # VDD
-                    self.NODES[1],   # VSS
-                    f'BL{col}',      # 连接到对应列的位线
-                    f'WWLA{row}',    # 连接到对应行的写字线 A
-                    f'WWLB{row}',    # 连接到对应行的写字线 B
-                    f'WL{row}'       # 连接到对应行的读字线
-                )
+        # C. 遍历所有 (降阶模式下仅目标行列) 单元，按照 9T 的节点顺序进行实例化
+        for row, col in self.detailed_cells():
+            self.X(
+                f"{subckt_9t_cell.name}_{row}_{col}", # 实例名 (e.g. SRAM_9T_CELL_0_0)
+                subckt_9t_cell.name,                  # 子电路类型名
+                self.NODES[0],   # VDD
+                self.NODES[1],   # VSS
+                f'BL{col}',      # 连接到对应列的位线
+                f'WWLA{row}',    # 连接到对应行的写字线 A
+                f'WWLB{row}',    # 连接到对应行的写字线 B
+                f'WL{row}'       # 连接到对应行的读字线
+            )
+        self.add_lumped_loads()
 
         if not self.param_sweep:
             print(f"[DEBUG] 9T Core '{self.NAME}' initialized with {num_rows}x{num_cols} cells.")
 
+    def detailed_cells(self):
+        """晶体管级单元的 (row, col) 列表：全部单元，或降阶模式下目标行与目标列上的单元"""
+        if self.reduced_target is None:
+            return [(row, col) for row in range(self.num_rows) for col in range(self.num_cols)]
+        target_row, target_col = self.reduced_target
+        if not (0 <= target_row < self.num_rows and 0 <= target_col < self.num_cols):
+            raise ValueError(f"reduced_target={self.reduced_target} is outside the "
+                             f"{self.num_rows}x{self.num_cols} array")
+        return ([(target_row, col) for col in range(self.num_cols)] +
+                [(row, target_col) for row in range(self.num_rows) if row != target_row])
+
+    def cell_loads(self):
+        """
+        由单元尺寸估算一个非目标单元对各条线的等效负载
+        Returns:
+            dict: BL/WL/WWLA/WWLB 电容 (F)，BL 漏电流与 VDD->VSS 待机漏电流 (A)
+        """
+        k = self.lumped_load
+        gate = lambda w: k['cox'] * w * self.length + 2 * k['cgo'] * w
+        junction = lambda w: k['cj'] * w + k['cgo'] * w
+        return {
+            'BL': junction(self.pg_width),                           # PG 漏端
+            'WL': gate(self.pg_width),                               # PG 栅
+            'WWLA': gate(self.pu_width),                             # PUL2 栅
+            'WWLB': gate(self.pd_width) + junction(self.pd_width),   # PDL1 栅 + NF 源端
+            'I_BL': k['ioff_n'] * self.pg_width,                     # 经关断 PG 的位线漏电
+            'I_CELL': k['ioff_n'] * self.pd_width + k['ioff_p'] * self.pu_width,
+        }
+
+    def add_lumped_loads(self):
+        """
+        降阶模式下，把非目标单元换成集总负载：
+        - 非目标列 BL: (R-1) 个单元的漏端电容 + 漏电流 (随 V(BL) 以 tanh 饱和, 位线放电时不会反向)
+        - 非目标行 WL/WWLA/WWLB: (C-1) 个单元的栅/结电容
+        - VDD->VSS: 所有被替换单元的待机漏电流 (保持功耗测量的量级)
+        w_rc 的逐单元 RC 不进入集总模型。
+        """
+        if self.reduced_target is None:
+            return
+        target_row, target_col = self.reduced_target
+        loads = self.cell_loads()
+        vdd, vss = self.NODES[0], self.NODES[1]
+        lumped_rows = self.num_rows - 1
+        lumped_cols = self.num_cols - 1
+
+        if lumped_rows:
+            for col in range(self.num_cols):
+                if col == target_col:
+                    continue
+                self.C(f'LOAD_BL{col}', f'BL{col}', vss, f"{lumped_rows * loads['BL']:.4e}")
+                self.B(f'LEAK_BL{col}', f'BL{col}', vss,
+                       i=f"{lumped_rows * loads['I_BL']:.4e}*tanh(V(BL{col},{vss})/{self.lumped_load['vt_leak']})")
+        if lumped_cols:
+            for row in range(self.num_rows):
+                if row == target_row:
+                    continue
+                for line in ('WL', 'WWLA', 'WWLB'):
+                    self.C(f'LOAD_{line}{row}', f'{line}{row}', vss, f"{lumped_cols * loads[line]:.4e}")
+        num_lumped = self.num_rows * self.num_cols - len(self.detailed_cells())
+        if num_lumped:
+            self.I('LEAK_ARRAY', vdd, vss, f"{num_lumped * loads['I_CELL']:.4e}")
+
 
 
 
@@ -429,6 +508,175 @@ class Sram9TCellForYield(Sram9TCell):
         if not self.param_sweep:
             print(f"[DEBUG] 9T Yield Array {num_rows}x{num_cols} initialized.")
 
+##############################################################
+#      参数化良率阵列：单一单元定义 + 实例参数传入失配
+##############################################################
+# 9T 单元中的晶体管角色及其器件类型 (pd / pu / pg)，顺序即数据表列顺序
+SRAM_9T_DEVICE_ROLES = (
+    ('PG', 'pg'), ('PUL1', 'pu'), ('PUL2', 'pu'), ('PDL1', 'pd'), ('PDL2', 'pd'),
+    ('PUR', 'pu'), ('PDR1', 'pd'), ('PDR2', 'pd'), ('NF', 'pd'),
+)
+
+
+def process_param_name(param, model_name, role, row, col):
+    """Global `.param` holding the `param` delta of transistor `role` in cell (row, col)"""
+    return f'{param}_{model_name}_{role}_{row:d}_{col:d}'
+
+
+class Sram9TCellParamForYield(Sram9TCell):
+    """
+    参数化的 9T 良率单元：整个阵列只需一个定义。
+    每个晶体管角色引用一个参数化模型，vth0/u0/voff 写成
+    `'<PDK 标称值>+d<param>_<role>'`，偏差 d<param>_<role> 作为子电路参数
+    (默认 0) 由每个实例传入。
+    """
+    NAME = 'SRAM_9T_CELL_PARAM'
+    VARIED_PARAMS = ('vth0', 'u0', 'voff')
+
+    def __init__(self, pd_nmos_model_name, pu_pmos_model_name, pg_nmos_model_name,
+                 model_dict, pd_width, pu_width, pg_width, length,
+                 w_rc=False, pi_res=100 @ u_Ohm, pi_cap=0.001 @ u_pF,
+                 disconnect=False, param_sweep=False, varied_params=VARIED_PARAMS):
+        # add_9T_cell() runs inside the parent constructor and needs these
+        self.model_dict = model_dict
+        self.varied_params = tuple(varied_params)
+        super().__init__(
+            pd_nmos_model_name, pu_pmos_model_name, pg_nmos_model_name,
+            pd_width, pu_width, pg_width, length,
+            w_rc, pi_res, pi_cap, disconnect, param_sweep
+        )
+        # Subcircuit parameters: one delta per (role, varied param), nominal by default
+        self.parameters.update({
+            f'd{param}_{role}': 0 for role, _ in SRAM_9T_DEVICE_ROLES for param in self.varied_params
+        })
+
+    def role_models(self):
+        """PDK model of every transistor role"""
+        device_models = {'pd': self.nmos_pdk_model, 'pu': self.pmos_pdk_model,
+                         'pg': self.pg_nmos_model_name}
+        return {role: device_models[device] for role, device in SRAM_9T_DEVICE_ROLES}
+
+    def add_9T_cell(self, bl_node, wwla_node, wwlb_node, wl_node, q_node, qb_node, param_sweep):
+        """与 Sram9TCell 拓扑相同，每个晶体管使用其角色的参数化模型"""
+        data_q = 'QD' if self.disconnect else q_node
+        data_qb = 'QBD' if self.disconnect else qb_node
+        l_val = 'length' if param_sweep else self.length
+        pg_w = 'nmos_width_pg' if param_sweep else self.pg_width
+        pu_w = 'pmos_width_pu' if param_sweep else self.pu_width
+        pd_w = 'nmos_width_pd' if param_sweep else self.pd_width
+        vdd, vss = self.NODES[0], self.NODES[1]
+
+        # role: (drain, gate, source, bulk, width)
+        connections = {
+            'PG':   (bl_node, wl_node, data_q, vss, pg_w),
+            'PUL1': ('N_PUL_INT', qb_node, vdd, vdd, pu_w),
+            'PUL2': (data_q, wwla_node, 'N_PUL_INT', vdd, pu_w),
+            'PDL1': (data_q, wwlb_node, 'N_PDL_INT', vss, pd_w),
+            'PDL2': ('N_PDL_INT', qb_node, vss, vss, pd_w),
+            'PUR':  (qb_node, q_node, vdd, vdd, pu_w),
+            'PDR1': (data_qb, q_node, 'VX', vss, pd_w),
+            'PDR2': ('VX', q_node, vss, vss, pd_w),
+            'NF':   ('VX', qb_node, wwlb_node, vss, pd_w),
+        }
+        for role, pdk_model in self.role_models().items():
+            drain, gate, source, bulk, width = connections[role]
+            udf_model = f'{pdk_model}_{role}'
+            self.M(role, drain, gate, source, bulk, model=udf_model, w=width, l=l_val)
+            self.add_param_mos_model(pdk_model, udf_model, role)
+
+        if not param_sweep:
+            print(f"[DEBUG] 9T Cell '{self.NAME}' initialized with 9 parameterized models.")
+
+    def add_param_mos_model(self, pdk_model_name, udf_model_name, role):
+        """
+        写出角色 `role` 的参数化模型：PDK 模型的完整副本，只把 varied_params
+        替换为 '标称值+d<param>_<role>'
+        """
+        model_data = self.model_dict[pdk_model_name]
+        cards = [f'.model {udf_model_name} {model_data["type"]}']
+        for param_name, param_value in model_data['parameters'].items():
+            if param_name in self.varied_params:
+                param_str = f"'{param_value}+d{param_name}_{role}'"
+            elif isinstance(param_value, float) and (abs(param_value) < 1e-3 or abs(param_value) > 1e6):
+                param_str = f"{param_value:.3e}"
+            else:
+                param_str = str(param_value)
+            cards.append(f'{param_name}={param_str}')
+        self.raw_spice += ' '.join(cards) + '\n'
+
+
+class Sram9TCoreParamForYield(Sram9TCore):
+    """
+    良率阵列的参数化模式：阵列中只有一个 Sram9TCellParamForYield 定义和
+    每个晶体管角色一张模型卡，每个 (row, col) 实例把自己的 vth0/u0/voff 偏差
+    以实例参数传入，引用全局参数 `process_param_name(...)`（由数据表 .STEP 赋值）。
+    网表大小随单元实例数线性增长，而不是随 rows x cols x 9 张完整模型卡增长。
+    """
+
+    def __init__(self, num_rows: int, num_cols: int,
+                 pd_nmos_model_name: str, pu_pmos_model_name: str, pg_nmos_model_name: str,
+                 model_dict: Dict[str, Any],
+                 pd_width=0.205e-6, pu_width=0.09e-6,
+                 pg_width=0.135e-6, length=50e-9,
+                 w_rc=False, pi_res=100 @ u_Ohm, pi_cap=0.001 @ u_pF,
+                 param_sweep=False,
+                 varied_params=Sram9TCellParamForYield.VARIED_PARAMS,
+                 reduced_target=None, lumped_load=None):
+        # build_array() runs inside the parent constructor and needs these
+        self.model_dict = model_dict
+        self.varied_params = tuple(varied_params)
+        super().__init__(
+            num_rows, num_cols,
+            pd_nmos_model_name, pu_pmos_model_name, pg_nmos_model_name,
+            pd_width=pd_width, pu_width=pu_width, pg_width=pg_width, length=length,
+            w_rc=w_rc, pi_res=pi_res, pi_cap=pi_cap, param_sweep=param_sweep,
+            reduced_target=reduced_target, lumped_load=lumped_load
+        )
+
+    def build_array(self, num_rows, num_cols):
+        """一个参数化单元定义，逐个实例传入偏差参数"""
+        cell = Sram9TCellParamForYield(
+            self.pd_nmos_pdk_model, self.pu_pmos_pdk_model, self.pg_nmos_pdk_model,
+            self.model_dict,
+            self.pd_width, self.pu_width, self.pg_width, self.length,
+            w_rc=self.w_rc, pi_res=self.pi_res, pi_cap=self.pi_cap,
+            param_sweep=self.param_sweep, varied_params=self.varied_params
+        )
+        self.subcircuit(cell)
+        self.cell = cell
+        role_models = cell.role_models()
+
+        for row, col in self.detailed_cells():
+            deltas = {
+                f'd{param}_{role}': f"'{process_param_name(param, model, role, row, col)}'"
+                for role, model in role_models.items() for param in self.varied_params
+            }
+            self.X(
+                f"{cell.name}_{row}_{col}", cell.name,
+                self.NODES[0], self.NODES[1],
+                f'BL{col}', f'WWLA{row}', f'WWLB{row}', f'WL{row}',
+                **deltas
+            )
+        self.add_lumped_loads()
+
+        if not self.param_sweep:
+            print(f"[DEBUG] 9T Parameterized Yield Array {num_rows}x{num_cols} initialized.")
+
+    def process_param_names(self, cells=None):
+        """
+        全局偏差参数名，按 (row, col, role, param) 排列，即数据表的列顺序
+        Args:
+            cells: iterable of (row, col), defaults to every transistor-level cell
+        """
+        if cells is None:
+            cells = self.detailed_cells()
+        role_models = self.cell.role_models()
+        return [process_param_name(param, model, role, row, col)
+                for row, col in cells
+                for role, model in role_models.items()
+                for param in self.varied_params]
+
+
 # if __name__ == '__main__':
 #     pdk_path = 'model_lib/models.spice'
 #     nmos_model_name = 'NMOS_VTG'
@@ -152,7 +152,7 @@ class PNAND3(PNAND2):
         self.M('mp2', 'Z', 'B', 'VDD', 'VDD', model=self.pmos_pdk_model, w=wp, l=self.length)
         self.M('mp3', 'Z', 'C', 'VDD', 'VDD', model=self.pmos_pdk_model, w=wp, l=self.length)
         # NMOS 串联 3 个
-        self.M('mn1', 'n1', 'A', 'VSS', model=self.nmos_pdk_model, w=wn, l=self.length)
+        self.M('mn1', 'n1', 'A', 'VSS', 'VSS', model=self.nmos_pdk_model, w=wn, l=self.length)
         self.M('mn2', 'n2', 'B', 'n1', 'VSS', model=self.nmos_pdk_model, w=wn, l=self.length)
         self.M('mn3', 'Z', 'C', 'n2', 'VSS', model=self.nmos_pdk_model, w=wn, l=self.length)
 
@@ -4,12 +4,25 @@ from PySpice.Unit import u_V, u_ns, u_Ohm, u_pF, u_A, u_mA
 from utils import (  # type: ignore
     parse_mc_measurements, generate_mc_statistics,
     save_mc_results, process_simulation_data,
-    parse_spice_models, write_spice_models
+    merge_mc_measurements, process_sharded_simulation_data, renumber_mc_runs
 )
+from xyce_runner import (  # type: ignore
+    run_supervised_mc, run_mc_shards, split_mc_runs, shard_seeds,
+    CampaignManifest, config_fingerprint, run_supervised_mc_async
+)
+from netlist_utils import write_netlist, reduce_rc_networks  # type: ignore
+from model_library import mc_model_file, MC_VARIED_PARAMS, MC_MODEL_DIR  # type: ignore
+from netlist_cost import netlist_complexity, netlist_cost_report, output_bytes  # type: ignore
+from data_table import process_param_layout, table_layout, write_data_table  # type: ignore
+from qmc_sampling import process_param_table  # type: ignore
+from variation_model import VariationModel  # type: ignore
+import shutil
+import sys
+import hashlib
 from sram_compiler.testbenches.sram_9t_core_testbench import Sram9TCoreTestbench  # type: ignore
 import numpy as np
 import csv
-from PySpice.Spice.Netlist import SubCircuitFactory
+from PySpice.Spice.Netlist import SubCircuitFactory, Circuit
 
 
 class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
@@ -18,7 +31,10 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
                 vth_std=0.05, custom_mc=False, param_sweep=False, 
                 sweep_precharge=False, sweep_senseamp=True, sweep_wordlinedriver=False,
                 sweep_columnmux=False, sweep_writedriver=False, sweep_decoder=False, 
-                corner='TT', q_init_val=0, sim_path='sim'):
+                corner='TT', q_init_val=0, sim_path='sim', result_cache=None, xyce_cmd='Xyce',
+                param_cell_model=False, print_netlist=True, reduced_array=False, template_cache=None,
+                compact_ir=False, mc_varied_params=MC_VARIED_PARAMS, cost_model=None,
+                rc_reduction=None, surrogate_data=None):
         """
                蒙特卡洛测试平台初始化
                参数:
@@ -30,6 +46,20 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
                    custom_mc: 是否使用自定义MC参数
                    q_init_val: 初始Q值
                    sim_path: 仿真结果保存路径
+                   result_cache: XyceResultCache 实例，相同网表直接复用已有结果 (None 表示不缓存)
+                   xyce_cmd: 仿真器可执行文件, 例如用 xyce_stub.py 代替 Xyce 做测试
+                   param_cell_model: custom_mc 阵列使用一个参数化单元定义, 数据表给出 vth0/u0/voff 偏差
+                   print_netlist: write_mc_netlist() 是否把生成的网表打印到 stdout
+                   reduced_array: 降阶阵列, 只有目标行/列为晶体管级, 其余单元换成集总 BL/WL 负载
+                   template_cache: NetlistTemplateCache 实例，复用预渲染的网表主体, 每次只写顶层 deck (None 表示不缓存)
+                   compact_ir: 大阵列用轻量网表 IR (netlist_ir.ir_variant) 构建子电路, 网表内容不变
+                   mc_varied_params: 非 custom_mc 时 MC 模型库中加 AGAUSS 的模型参数 (如再加 'tox', 'lint')
+                   cost_model: SimulationCostModel 实例，写网表时生成复杂度报告并预测运行时间/输出大小，
+                               run_mc_simulation() 完成后记录实际开销 (None 表示不分析)
+                   rc_reduction: w_rc 网表的 RC 降阶, 每条 BL/WL 最多保留的 RC 段数 (None 表示不降阶),
+                                 见 netlist_utils.reduce_rc_networks()
+                   surrogate_data: SurrogateDataset 实例，custom_mc 仿真的 (vars, 指标) 样本对保存于此,
+                                   供 mc_orchestration.run_surrogate_yield() 训练代理模型 (None 表示不记录)
                """
         super().__init__(
         sram_config=sram_config,
@@ -37,7 +67,10 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
         w_rc=w_rc,
         custom_mc=custom_mc,
         param_sweep=param_sweep,
-        q_init_val=q_init_val
+        q_init_val=q_init_val,
+        param_cell_model=param_cell_model,
+        reduced_array=reduced_array,
+        compact_ir=compact_ir
     )
             # 其余子类特有的参数，手动赋值给 self
         self.pi_res = pi_res
@@ -58,31 +91,87 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
         num_cols = sram_config.global_config.num_cols
         self.name = f'SRAM_9T_CORE_{num_rows}x{num_cols}_MC_TB' #根据行列数设置测试平台名称
         self.sim_path = sim_path
+        self.result_cache = result_cache
+        self.xyce_cmd = xyce_cmd
+        self.print_netlist = print_netlist
+        self.template_cache = template_cache
+        self.template_meta = None
+        self.last_run_report = None
+        self.last_run_reports = None
+        self.cost_model = cost_model
+        self.last_netlist_report = None
+        self.rc_reduction = rc_reduction
+        self.last_rc_reduction = None
+        self.surrogate_data = surrogate_data
+        self.mc_varied_params = tuple(mc_varied_params)
+        # 所有运行共享内容寻址的 MC 模型库 (不随带时间戳的 sim_path 变化), 可在生成网表前改写
+        self.mc_model_dir = MC_MODEL_DIR
         os.makedirs(self.sim_path, exist_ok=True)
 
     def create_mc_model_file(self):
-        """Create temporary model file with Monte Carlo variations创建蒙特卡洛模型文件"""
-        #pdk_path = self.sram_config.global_config.pdk_path
+        """
+        Monte Carlo model lib of the current corner 蒙特卡洛模型文件
+        Shared, content-addressed file under `mc_model_dir` (default model_library.MC_MODEL_DIR,
+        the same for every sim_path), keyed by the PDK file, vth_std and `mc_varied_params`;
+        it is only written on the first use.
+        """
         pdk_path = getattr(self.sram_config.global_config, f"pdk_path_{self.corner}")
-        model_dict = parse_spice_models(pdk_path)
-
-        for m in model_dict.keys():
-
-            # Get parameters for the model_name
-            param_dict = model_dict[m]['parameters']
+        return mc_model_file(pdk_path, self.vth_std, self.mc_varied_params, self.mc_model_dir)
+
+    def template_settings(self, operation, target_row=0, target_col=0):
+        """Settings that shape the static netlist body built by `create_testbench()`"""
+        settings = {
+            'testbench': type(self).__name__,
+            'operation': operation, 'target_row': target_row, 'target_col': target_col,
+            'num_rows': self.num_rows, 'num_cols': self.num_cols, 'vdd': float(self.vdd),
+            'corner': self.corner, 'w_rc': self.w_rc, 'pi_res': self.pi_res, 'pi_cap': self.pi_cap,
+            'q_init_val': self.q_init_val, 'custom_mc': self.custom_mc,
+            'param_sweep': self.param_sweep, 'param_cell_model': self.param_cell_model,
+            'reduced_array': self.reduced_array,
+            'rc_reduction': self.rc_reduction if self.uses_rc_reduction(operation) else None,
+            'timing': [float(t) for t in (self.t_rise, self.t_fall, self.t_pulse,
+                                          self.t_period, self.t_delay)],
+            'circuits': self.circuit_settings(),
+        }
+        if self.custom_mc:
+            # Yield cells embed copies of the PDK model cards
+            pdk_path = getattr(self.sram_config.global_config, f"pdk_path_{self.corner}")
+            settings['pdk'] = [pdk_path, os.path.getmtime(pdk_path)]
+        return settings
 
-            for param in param_dict.keys():
-                # substitute the default values with user-defined parameters
-                if param in ['vth0', 'u0', 'voff']:
-                    val = param_dict[param]
-                    param_dict[param] = f"{{AGAUSS({val}, {abs(val) * self.vth_std:.5f}, 1)}}"
-                    #为关键参数(vth0, u0, voff)添加高斯分布随机变量
-        # Generate a modified model lib 生成一个修改过的模型库
-        temp_model_path = os.path.join(self.sim_path, 'tmp_mc.spice')
-        # Write the model cards back to temporary file
-        write_spice_models(model_dict, temp_model_path)
+    def create_testbench_from_template(self, operation, target_row=0, target_col=0):
+        """
+        Thin testbench deck around a cached netlist body 基于缓存网表主体的顶层 deck
+        The body is rendered by `create_testbench()` on the first request of its
+        settings; every later call only builds a Circuit with the model lib and
+        the `.include` of the body. Analyses, measures and tables are added to it
+        as usual.
+        """
+        self.set_target_cell(operation, target_row, target_col)
+        settings = self.template_settings(operation, target_row, target_col)
+        key = self.template_cache.key(settings)
+        meta = self.template_cache.get(key)
+        if meta is None:
+            circuit = self.create_testbench(operation, target_row, target_col)
+            param_names = None
+            if self.param_cell_model and 'snm' not in operation:
+                param_names = self.core.process_param_names()
+            meta = self.template_cache.put(key, circuit, settings, param_names=param_names)
+            if self.uses_rc_reduction(operation):
+                # the cached body is stored reduced, later decks include it as is
+                self.reduce_rc_netlist(self.template_cache.body_path(key), target_row, target_col)
+            print(f"[DEBUG] Netlist template stored: {self.template_cache.body_path(key)}")
+        else:
+            print(f"[DEBUG] Netlist template reused: {self.template_cache.body_path(key)}")
+        self.template_meta = meta
 
-        return temp_model_path
+        deck = Circuit(self.name)
+        if self.custom_mc:
+            deck.include(getattr(self.sram_config.global_config, f"pdk_path_{self.corner}"))
+        else:
+            deck.include(self.create_mc_model_file())
+        deck.include(self.template_cache.body_path(key))
+        return deck
 
     def create_testbench(self, operation, target_row=0, target_col=0):#定义子类里的create_testbench函数
         """Create testbench with Monte Carlo models"""
@@ -250,8 +339,10 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
         """ Add options for Xyce """
         pass
 
-    def add_analysis(self, circuit, operation, num_mc):
-        """ Add .DC / .TRAN analysis DC 扫描/瞬态分析"""
+    def add_analysis(self, circuit, operation, num_mc, seed=None):
+        """ Add .DC / .TRAN analysis DC 扫描/瞬态分析
+            `seed` fixes the Xyce sampling seed, each MC shard uses its own one.
+        """
         if 'snm' in operation:
             u_tmp = self.vdd / np.sqrt(2)
             circuit.raw_spice += \
@@ -290,19 +381,63 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
             if self.sweep_decoder:
                 circuit.raw_spice += \
                     f'.STEP data=DECODER\n'
-            if not self.param_sweep and not self.sweep_precharge and not self.sweep_senseamp and not self.sweep_wordlinedriver and not self.sweep_columnmux and not self.sweep_writedriver and not self.sweep_decoder:
+            if not self.uses_param_sweep():
                 # Use build-in sampling method in Xyce
+                seed_opt = f' seed={seed}' if seed is not None else ''
                 circuit.raw_spice += \
-                    f'.SAMPLING useExpr=true\n.options samples numsamples={num_mc}\n'
+                    f'.SAMPLING useExpr=true\n.options samples numsamples={num_mc}{seed_opt}\n'
 
         print(f"[DEBUG] Custom_MC={self.custom_mc}, numsamples={num_mc}")
 
+    def uses_param_sweep(self):
+        """Whether any `.STEP data=<SUBCKT>` parameter sweep replaces the built-in MC sampling"""
+        return any([self.param_sweep, self.sweep_precharge, self.sweep_senseamp,
+                    self.sweep_wordlinedriver, self.sweep_columnmux,
+                    self.sweep_writedriver, self.sweep_decoder])
+
     def get_table_head(self):
         return self.table_head
 
+    def sample_process_params(self, operation: str, num_mc: int, method: str = 'sobol',
+                              seed: int = None, rel_sigma: float = None, stds=None):
+        """ `vars` for gen_process_params() from a (quasi-)Monte Carlo design
+            用 Sobol/Halton/LHS 设计生成工艺参数数据表
+        Args:
+        ---
+            method (str): 'sobol', 'halton', 'lhs' or 'mc', see qmc_sampling.unit_design()
+            seed (int): scrambling seed, the same seed gives the same table
+            rel_sigma (float): sigma relative to the nominal value, defaults to `self.vth_std`
+            stds: per-column sigmas; required for the delta table of param_cell_model
+                  (its columns are deltas around 0, not absolute values)
+        """
+        rel_sigma = self.vth_std if rel_sigma is None else rel_sigma
+        if self.param_cell_model and 'snm' not in operation:
+            if stds is None:
+                raise ValueError("param_cell_model tables hold deltas, pass their sigmas as `stds`")
+            return process_param_table(self.num_rows, self.num_cols, operation, num_mc, method, seed,
+                                       means=np.zeros(len(stds)), stds=stds)
+        return process_param_table(self.num_rows, self.num_cols, operation, num_mc, method, seed,
+                                   rel_sigma=rel_sigma, stds=stds)
+
+    def variation_model(self, operation: str, rel_sigma: float = None, **kwargs):
+        """ Global + spatial + local variation model of the data table of `operation`
+            全局/空间/局部工艺偏差模型, `model.sample(num_mc, seed)` gives `vars`
+        Args:
+        ---
+            rel_sigma (float): total sigma relative to the nominal value, defaults to `self.vth_std`
+            kwargs: global_fraction, spatial_fraction, corr_length, device_corr, param_corr,
+                    dtype of variation_model.VariationModel
+        """
+        if self.param_cell_model and 'snm' not in operation:
+            raise ValueError("param_cell_model tables hold deltas, use sample_process_params() with `stds`")
+        rel_sigma = self.vth_std if rel_sigma is None else rel_sigma
+        # SNM tables have a single cell (see gen_process_params)
+        num_rows, num_cols = (1, 1) if 'snm' in operation else (self.num_rows, self.num_cols)
+        return VariationModel(num_rows, num_cols, rel_sigma=rel_sigma, **kwargs)
+
     def gen_process_params(self, circuit: SubCircuitFactory,
                            operation: str, num_mc: int,
-                           vars: np.array = None):
+                           vars: np.array = None, sim_path: str = None):
         """ Add process parameters' data table for STEP
             生成工艺参数数据表
         Args:
@@ -311,43 +446,20 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
             operation (string): can be `read`, `write`, `hold_snm`, `read_snm`, `write_snm`
             num_mc (int): number of MC runs
             vars (numpy.ndarray): parameters in data table
+            sim_path (str): directory of the data table, defaults to `self.sim_path`
         """
-        # Order of transistors in bitcell can not be changed
-        mos_names = ['PGL', 'PGR', 'PDL', 'PUL', 'PDR', 'PUR']
-        # This version only takes 3 params into consideration
-        param_names = ['vth0', 'u0', 'voff']
-        self.table_head = '.data table\n+ '
-        table_content = '\n'
-        num_params = 0
-
-        # Define params
-        for row in range(self.num_rows):
-            for col in range(self.num_cols):
-                # Only 1 cell's params are generated
-                if ('snm' in operation) and (row > 0 or col > 0):
-                    continue
-                # Each transistor has 6 process variables
-                for mos in mos_names:
-                    for param in param_names:
-                        if mos in ['PUL', 'PUR']:
-                            # Parameter definitions for PMOS
-                            circuit.raw_spice += \
-                                f'.param {param}_{self.sram_config.sram_9T_cell.pmos_model.value}_{mos}_{row:d}_{col:d}=0.0\n'
-                            # Data table head
-                            self.table_head += f'{param}_{self.sram_config.sram_9T_cell.pmos_model.value}_{mos}_{row:d}_{col:d} '
-                        elif mos in ['PGL','PGR']:
-                            circuit.raw_spice += \
-                                f'.param {param}_{self.sram_config.sram_9T_cell.nmos_model.value[1]}_{mos}_{row:d}_{col:d}=0.0\n'
-                            # Data table head
-                            self.table_head += f'{param}_{self.sram_config.sram_9T_cell.nmos_model.value[1]}_{mos}_{row:d}_{col:d} '
-                        else:
-                            # Parameter definitions for NMOS
-                            circuit.raw_spice += \
-                                f'.param {param}_{self.sram_config.sram_9T_cell.nmos_model.value[0]}_{mos}_{row:d}_{col:d}=0.0\n'
-                            # Data table head
-                            self.table_head += f'{param}_{self.sram_config.sram_9T_cell.nmos_model.value[0]}_{mos}_{row:d}_{col:d} '
-
-                        num_params += 1
+        if self.param_cell_model and 'snm' not in operation:
+            return self.gen_process_deltas(circuit, operation, num_mc, vars=vars, sim_path=sim_path)
+
+        cell_cfg = self.sram_config.sram_9t_cell
+        # Column names, head and .param block are cached per geometry
+        # (same model entries as the cells of create_testbench: PU, PG, PD)
+        layout = process_param_layout(self.num_rows, self.num_cols, 'snm' in operation,
+                                      cell_cfg.pmos_model.value[0], cell_cfg.nmos_model.value[1],
+                                      cell_cfg.nmos_model.value[0])
+        circuit.raw_spice += layout.param_block
+        self.table_head = layout.head
+        num_params = len(layout)
         # Just for debugging
         if vars is None:
             vars = [0.4106, 0.045, -0.13,  # PGL
@@ -373,15 +485,37 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
         assert num_params == vars.shape[
             1], f'num_params={num_params} mismatches {vars.shape[1]} column number in the data table'
 
-        table_content += "\n".join([
-            "+ " + " ".join([f"{x:.4f}" for x in row])
-            for row in vars
-        ])
-
         # Generate and run Xyce netlist
-        table_path = os.path.join(self.sim_path, f'mc_{operation}_table.data')
-        with open(table_path, 'w') as f:
-            f.write(self.table_head + table_content)
+        table_path = os.path.join(sim_path or self.sim_path, f'mc_{operation}_table.data')
+        write_data_table(table_path, self.table_head, vars, '%.4f')
+        circuit.include(table_path)
+        print(f'[DEBUG] Data table has been saved to {table_path}')
+
+    def gen_process_deltas(self, circuit: SubCircuitFactory,
+                           operation: str, num_mc: int,
+                           vars: np.array = None, sim_path: str = None):
+        """ Data table of the parameterized array (param_cell_model=True)
+            参数化阵列的工艺偏差数据表
+        Columns are the vth0/u0/voff deltas of `self.core.process_param_names()`,
+        one per (row, col, transistor role, param); zeros (nominal) by default.
+        """
+        names = (self.template_meta or {}).get('param_names') or self.core.process_param_names()
+        layout = table_layout(tuple(names))
+        circuit.raw_spice += layout.param_block
+        self.table_head = layout.head
+
+        if vars is None:
+            vars = np.zeros((num_mc, len(names)))
+            print(f"[DEBUG] Generated vars.shape={vars.shape}")
+        else:
+            assert num_mc == vars.shape[0], f"num_mc={num_mc} mismatches {vars.shape[0]} row number in the data table"
+            print(f"[DEBUG] Input vars.shape={vars.shape}")
+        assert len(vars.shape) == 2
+        assert len(names) == vars.shape[1], \
+            f'num_params={len(names)} mismatches {vars.shape[1]} column number in the data table'
+
+        table_path = os.path.join(sim_path or self.sim_path, f'mc_{operation}_table.data')
+        write_data_table(table_path, self.table_head, vars, '%.4e')
         circuit.include(table_path)
         print(f'[DEBUG] Data table has been saved to {table_path}')
 
@@ -730,18 +864,44 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
 
         def initial_condition(self,**conditions):
             """添加初始条件到circuit"""
-            for node,value in conditions.items():
-                self.circuit.raw_spice += f'.IC V({node})={float(value)}\n'
+            self.circuit.raw_spice += ''.join(
+                f'.IC V({node})={float(value)}\n' for node, value in conditions.items())
 
         def measure(self,analysis_type, name, expression):
             """添加测量语句到circuit"""
             self.circuit.raw_spice += f'.MEASURE {analysis_type} {name} {expression}\n'
 
 
-    def run_mc_simulation(self, operation='read', target_row=0, target_col=0, mc_runs=100, temperature=27,vars=None):
-        """Run Xyce Monte Carlo simulation"""
-        circuit = self.create_testbench(operation, target_row, target_col)
+    def get_tb_path(self, operation, sim_path=None):
+        """Path of the generated testbench netlist for `operation`"""
+        init = '_q1' if self.q_init_val > 0 else ''
+        return os.path.join(
+            sim_path or self.sim_path,
+            f'mc_{operation}_{self.num_rows}x{self.num_cols}_rc{self.w_rc:d}{init}_tb.sp')
+
+    def write_mc_netlist(self, operation='read', target_row=0, target_col=0, mc_runs=100,
+                         temperature=27, vars=None, sim_path=None, seed=None, dedup_subckts=True,
+                         print_netlist=None):
+        """
+        Build the MC testbench and write the Xyce netlist 生成并保存 Xyce 网表
+        Args:
+            sim_path: output directory of the netlist and data table, defaults to `self.sim_path`
+            seed: Xyce sampling seed (built-in MC only)
+            dedup_subckts: emit structurally identical `.subckt` definitions once,
+                see `netlist_utils.dedup_subcircuits()`
+            print_netlist: echo the written netlist to stdout, defaults to `self.print_netlist`;
+                turn off for large arrays
+        Returns:
+            Path of the written `.sp` netlist
+        """
+        if self.template_cache is not None:
+            circuit = self.create_testbench_from_template(operation, target_row, target_col)
+        else:
+            self.template_meta = None
+            circuit = self.create_testbench(operation, target_row, target_col)
+        # Only the Xyce netlist is rendered, no ngspice shared library is needed
         simulator = circuit.simulator(
+        simulator='xyce-serial',
         temperature=temperature,           # 通过 **kwargs 传递
         nominal_temperature=27    # 通过 **kwargs 传递
         )
@@ -750,14 +910,15 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
         # if self.param_sweep:
         #     mc_runs=num_sweep
         # Add some Xyce related commands
-        self.add_analysis(simulator.circuit, operation, mc_runs)
+        self.add_analysis(simulator.circuit, operation, mc_runs, seed=seed)
 
         # Add measurements according to the operation
-        self.add_meas_and_print(simulator, self.data_init(), operation)
+        self.add_meas_and_print(simulator, self.data_init() if 'snm' not in operation else {}, operation)
 
         # Add process parameters
         if self.custom_mc:
-            self.gen_process_params(simulator.circuit, operation, vars=vars, num_mc=mc_runs)
+            self.gen_process_params(simulator.circuit, operation, vars=vars, num_mc=mc_runs,
+                                    sim_path=sim_path)
         else:
             if self.param_sweep:
                 self.gen_param_sweep_9T_CELL(simulator.circuit, operation, vars=vars)
@@ -774,72 +935,557 @@ class Sram9TCoreMcTestbench(Sram9TCoreTestbench):
             if self.sweep_decoder:
                 self.gen_param_sweep_decoder(simulator.circuit, operation, vars=vars)
 
-        print("[DEBUG] Printing generated netlists...")
-        print(simulator)
-        init = '_q1' if self.q_init_val > 0 else ''
-
-        # Generate and run Xyce netlist
-        tb_path = os.path.join(
-            self.sim_path,
-            f'mc_{operation}_{self.num_rows}x{self.num_cols}_rc{self.w_rc:d}{init}_tb.sp')
+        # Generate Xyce netlist, streamed section by section
+        tb_path = self.get_tb_path(operation, sim_path)
+        write_stats = write_netlist(simulator, tb_path, dedup_subckts=dedup_subckts)
+        print(f"[DEBUG] Subcircuit definitions: {write_stats['definitions_in']} -> "
+              f"{write_stats['definitions_out']}, netlist size: {write_stats['bytes_out']} bytes")
+        if self.uses_rc_reduction(operation) and self.template_cache is None:
+            self.reduce_rc_netlist(tb_path, target_row, target_col)
+        if self.cost_model is not None:
+            self.last_netlist_report = self.report_netlist_cost(tb_path)
+
+        if self.print_netlist if print_netlist is None else print_netlist:
+            print("[DEBUG] Printing generated netlists...")
+            with open(tb_path, 'r') as f:
+                shutil.copyfileobj(f, sys.stdout)
+        return tb_path
+
+    def uses_rc_reduction(self, operation):
+        """
+        Whether netlists of `operation` go through the RC reduction pass:
+        w_rc and rc_reduction set, array operations only (SNM decks hold the target cell alone)
+        """
+        return bool(self.w_rc and self.rc_reduction) and 'snm' not in operation
 
-        with open(tb_path, 'w') as f:
-            f.write(str(simulator))
+    def reduce_rc_netlist(self, path, target_row, target_col):
+        """
+        RC 网络降阶 / Reduce the RC networks of a written netlist in place
+        The target cell keeps its full RC. The reduction ratio (RC elements and
+        nodes of the flattened circuit, before / after) is kept in `self.last_rc_reduction`.
+        """
+        before = netlist_complexity(path)
+        with open(path, 'r') as f:
+            text = f.read()
+        text, stats = reduce_rc_networks(text, max_segments=self.rc_reduction,
+                                         keep_instances=[rf'_{target_row}_{target_col}$'])
+        with open(path, 'w') as f:
+            f.write(text)
+        after = netlist_complexity(path)
+
+        rc_in = before['resistors'] + before['capacitors']
+        rc_out = after['resistors'] + after['capacitors']
+        stats.update(rc_elements_in=rc_in, rc_elements_out=rc_out,
+                     nodes_in=before['nodes'], nodes_out=after['nodes'],
+                     reduction_ratio=rc_in / max(rc_out, 1))
+        print(f"[DEBUG] RC reduction (max {self.rc_reduction} segments/line): "
+              f"{rc_in} -> {rc_out} RC elements ({stats['reduction_ratio']:.1f}x), "
+              f"{before['nodes']} -> {after['nodes']} nodes")
+        self.last_rc_reduction = stats
+        return stats
+
+    def report_netlist_cost(self, tb_path):
+        """
+        Complexity report of a written netlist, with the runtime / output size
+        predicted by `self.cost_model` under 'predicted' (see netlist_cost.py)
+        """
+        report = netlist_cost_report(tb_path, self.cost_model)
+        print(f"[DEBUG] Netlist complexity: {report['mosfets']} MOSFETs, {report['nodes']} nodes, "
+              f"{report['rc_segments']} RC segments, {report['models']} models, "
+              f"{report['measures']} measures, {report['time_points']} points x {report['samples']} samples")
+        predicted = report.get('predicted') or {}
+        if predicted.get('elapsed') is not None:
+            print(f"[DEBUG] Predicted runtime {predicted['elapsed']:.1f}s, "
+                  f"output {predicted['output_bytes'] / 1e6:.1f} MB ({predicted['method']}, "
+                  f"{predicted['runs']} past runs)")
+            timeout = self.get_timeout()
+            if timeout is not None and predicted['elapsed'] > timeout:
+                print(f"[WARNING] Predicted runtime {predicted['elapsed']:.0f}s exceeds the "
+                      f"timeout of {timeout:.0f}s, consider more shards or fewer samples")
+        return report
+
+    def estimate_cost(self, operation='read', target_row=0, target_col=0, mc_runs=100,
+                      temperature=27, vars=None, sim_path=None):
+        """
+        Write the netlist of a run without simulating it and return its complexity report
+        仿真前估计开销, 用于准入控制和分片大小的选择
+        """
+        tb_path = self.write_mc_netlist(operation, target_row, target_col, mc_runs, temperature,
+                                        vars, sim_path=sim_path, print_netlist=False)
+        return self.last_netlist_report if self.cost_model is not None \
+            else self.report_netlist_cost(tb_path)
+
+    def summarize_mc_results(self, mc_df, tb_path, operation, stats=None):
+        """Save MC statistics and return the performance metrics of `operation`"""
+        print("[DEBUG] Printing mc_df")
+        print(mc_df)
         # assert 0
-        # Execute Xyce and parse results
-        try:
-            import subprocess
-            # command: Xyce <netlist>
-            print("[DEBUG] Xyce running ...")
-            result = subprocess.run(
-                # ['hspice', '-i', tb_path, '-o', self.sim_path],
-                ['Xyce', tb_path, '-o', tb_path],
-                capture_output=True,
-                text=True, check=True
+        # Generate statistics
+        if stats is None:
+            stats = generate_mc_statistics(mc_df)
+        # Save results
+        save_mc_results(
+            mc_df, stats,
+            data_file=tb_path.replace('.sp', '.data.csv'),
+            stats_file=tb_path.replace('.sp', '.stats.csv')
+        )
+
+        # Reture the performance metrics for yield analysis and sizing optimization
+        if operation == 'write':
+            return mc_df['TWRITE_Q'].to_numpy(), mc_df['PAVG'].to_numpy()
+        elif operation == 'read':
+            return mc_df['TSWING'].to_numpy(), mc_df['PAVG'].to_numpy()
+        elif operation == 'hold_snm':
+            return mc_df['HOLD_SNM'].to_numpy()
+        elif operation == 'read_snm':
+            return mc_df['READ_SNM'].to_numpy()
+        elif operation == 'write_snm':
+            return mc_df['WRITE_SNM'].to_numpy()
+        else:
+            raise KeyError(f"Unkonwn operation {operation}")
+
+    def lookup_cached_results(self, tb_path, use_cache=True, seed=None):
+        """
+        Return (cache_key, cached (mc_df, stats) or None); the key is None when caching is off
+        Built-in Xyce sampling without an explicit `seed` draws new samples on every run,
+        so it is never looked up nor stored. The key includes the version of `self.xyce_cmd`.
+        """
+        if not use_cache or self.result_cache is None:
+            return None, None
+        if seed is None and not self.custom_mc and not self.uses_param_sweep():
+            print(f"[DEBUG] Unseeded built-in MC, result cache skipped for {tb_path}")
+            return None, None
+        cache_key = self.result_cache.key(tb_path, self.xyce_cmd)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            print(f"[DEBUG] Cache hit for {tb_path} ({cache_key[:12]}), Xyce skipped.")
+        return cache_key, cached
+
+    def get_timeout(self, timeout=None):
+        """Wall-clock limit of one Xyce run, `GlobalConfig.timeout` unless given; <= 0 disables it"""
+        if timeout is None:
+            timeout = getattr(self.sram_config.global_config, 'timeout', None)
+        return timeout if timeout and timeout > 0 else None
+
+    def campaign_fingerprint(self, operation, target_row, target_col, mc_runs, temperature,
+                             vars=None, num_shards=1, seed=None):
+        """Fingerprint of everything that determines the samples of a MC campaign"""
+        settings = {
+            'operation': operation, 'target_row': target_row, 'target_col': target_col,
+            'mc_runs': mc_runs, 'temperature': temperature,
+            'num_shards': num_shards, 'seed': seed,
+            'vdd': float(self.vdd), 'num_rows': self.num_rows, 'num_cols': self.num_cols,
+            'corner': self.corner, 'vth_std': self.vth_std, 'w_rc': self.w_rc,
+            'mc_varied_params': sorted(self.mc_varied_params),
+            'pi_res': self.pi_res, 'pi_cap': self.pi_cap, 'q_init_val': self.q_init_val,
+            'custom_mc': self.custom_mc,
+            'sweeps': [self.param_sweep, self.sweep_precharge, self.sweep_senseamp,
+                       self.sweep_wordlinedriver, self.sweep_columnmux,
+                       self.sweep_writedriver, self.sweep_decoder],
+            'vars': hashlib.sha256(np.ascontiguousarray(vars).tobytes()).hexdigest()
+                    if vars is not None else None,
+            'circuits': self.circuit_settings(),
+        }
+        return config_fingerprint(settings)
+
+    def circuit_settings(self):
+        """Design parameter values of every sub-circuit config"""
+        circuits = {}
+        for name in ['sram_9t_cell', 'wordline_driver', 'precharge', 'column_mux',
+                     'senseamp', 'write_driver', 'decoder']:
+            cfg = getattr(self.sram_config, name, None)
+            if cfg is not None:
+                circuits[name] = {p: param.value for p, param in cfg.parameters.items()}
+        return circuits
+
+    def open_campaign(self, fingerprint, ranges, seeds, resume=False, sim_path=None, **meta):
+        """Create the campaign manifest in `sim_path` (default `self.sim_path`), or load it when resuming"""
+        sim_path = sim_path or self.sim_path
+        if not resume:
+            return CampaignManifest.create(sim_path, fingerprint, ranges, seeds, **meta)
+
+        manifest = CampaignManifest.load(sim_path, fingerprint)
+        num_done = sum(manifest.is_done(k) for k in range(len(manifest.shards)))
+        print(f"[DEBUG] Resuming campaign {manifest.path}: {num_done}/{len(manifest.shards)} shards done")
+        return manifest
+
+    def load_finished_shard(self, manifest, index, file_suffix):
+        """Parse the outputs of a shard completed by an earlier (interrupted) process"""
+        shard = manifest.shards[index]
+        tb_path = manifest.abs_path(shard['tb_path'])
+        mc_df = parse_mc_measurements(
+            netlist_prefix=tb_path, file_suffix=file_suffix, num_runs=shard['count'])
+        report = {'tb_path': tb_path, 'status': 'resumed', 'elapsed': 0.0,
+                  'finished': shard['finished'], 'unfinished': []}
+        return mc_df, report
+
+    def load_partial_shard(self, manifest, index, file_suffix):
+        """
+        Samples an interrupted or timed-out run of a shard left behind, as (mc_df, report)
+        Xyce writes the `.mtX`/`.msX` file of every sample as soon as it finishes, so the
+        outputs next to the recorded netlist are the finished samples. None when the shard
+        never started or its netlist was overwritten since.
+        """
+        shard = manifest.shards[index]
+        if shard['status'] not in ('running', 'incomplete') or not manifest.has_netlist(index):
+            return None
+        tb_path = manifest.abs_path(shard['tb_path'])
+        mc_df = parse_mc_measurements(
+            netlist_prefix=tb_path, file_suffix=file_suffix, num_runs=shard['count'])
+        finished = sorted(int(run) for run in mc_df.index)
+        report = {'tb_path': tb_path, 'status': shard.get('xyce_status', 'interrupted'), 'elapsed': 0.0,
+                  'finished': finished,
+                  'unfinished': sorted(set(range(shard['count'])) - set(finished)),
+                  'resumed': len(finished)}
+        print(f"[DEBUG] Resuming {tb_path}: {len(finished)}/{shard['count']} samples already finished")
+        return mc_df, report
+
+    def requeue_unfinished_samples(self, mc_df, report, operation, target_row, target_col,
+                                   temperature, vars=None, timeout=None, seed=None, requeue=1,
+                                   sim_path=None, collect_outputs=False):
+        """
+        Re-simulate the samples listed in `report['unfinished']` for up to `requeue` rounds
+        重新排队超时/失败的样本
+
+        Custom MC samples are re-run with their own rows of `vars`; built-in MC samples are
+        re-drawn with a fresh seed. Each round runs in a `requeue_<i>` sub-directory of
+        `sim_path` (default `self.sim_path`).
+        Once no sample is left unfinished the status becomes 'ok' (the original one is kept
+        in 'requeue_recovered').
+        With `collect_outputs`, the outputs of re-run samples are copied next to
+        `report['tb_path']` under their original index, so that one directory holds every
+        finished sample (single runs, whose campaign manifest lists them there).
+        """
+        file_suffix = 'ms' if 'snm' in operation else 'mt'
+        seeds = shard_seeds(seed, requeue, stream=1)
+        for round_idx in range(requeue):
+            missing = report['unfinished']
+            if not missing:
+                break
+            requeue_path = os.path.join(sim_path or self.sim_path, f'requeue_{round_idx}')
+            os.makedirs(requeue_path, exist_ok=True)
+            sub_vars = vars[missing] if vars is not None else None
+            print(f"[DEBUG] Re-queue round {round_idx}: {len(missing)} unfinished samples")
+
+            tb_path = self.write_mc_netlist(
+                operation, target_row, target_col, len(missing), temperature, sub_vars,
+                sim_path=requeue_path, seed=seeds[round_idx])
+            sub_df, sub_report = run_supervised_mc(tb_path, len(missing), file_suffix, timeout, self.xyce_cmd)
+            if collect_outputs:
+                for i in sub_report['finished']:
+                    shutil.copyfile(f"{tb_path}.{file_suffix}{i}",
+                                    f"{report['tb_path']}.{file_suffix}{missing[i]}")
+
+            mc_df = merge_mc_measurements([mc_df, renumber_mc_runs(sub_df, missing)], [0, 0])
+            report = dict(
+                report,
+                finished=sorted(report['finished'] + [missing[i] for i in sub_report['finished']]),
+                unfinished=[missing[i] for i in sub_report['unfinished']],
+                requeued=report.get('requeued', 0) + len(missing),
             )
+        if not report['unfinished'] and report['status'] in ('timeout', 'error', 'interrupted'):
+            # Every sample finished, so the merged result is complete and may be cached.
+            # Requeued built-in MC samples were re-drawn with a new seed: the set of samples
+            # differs from a single uninterrupted run with the same base seed.
+            report = dict(report, status='ok', requeue_recovered=report['status'])
+        return mc_df, report
+
+    def run_mc_simulation(self, operation='read', target_row=0, target_col=0, mc_runs=100, temperature=27,vars=None,
+                          num_shards=1, max_workers=None, seed=None, use_cache=True,
+                          timeout=None, requeue=0, resume=None):
+        """Run Xyce Monte Carlo simulation
+        Args:
+            num_shards: split `mc_runs` into this many independent Xyce runs executed in parallel
+            max_workers: size of the local process pool for shards, defaults to the number of CPUs
+            seed: base sampling seed, every shard derives its own seed from it
+            use_cache: set to False to bypass `self.result_cache` and always run Xyce
+            timeout: wall-clock limit per run / per shard in seconds, defaults to `GlobalConfig.timeout`
+            requeue: number of rounds re-simulating samples that did not finish
+            resume: directory of an interrupted campaign (its `campaign_<fingerprint>.json`
+                    manifest); completed work is reused and this run writes into that
+                    directory, `self.sim_path` is left unchanged. Without sharding, only the
+                    samples the interrupted run did not finish are simulated (re-queued,
+                    see requeue_unfinished_samples())
+        The finished/unfinished samples of the last call are reported in `self.last_run_report`.
+        """
+        timeout = self.get_timeout(timeout)
+        sim_path = resume if resume is not None else self.sim_path
+        if num_shards > 1:
+            return self.run_sharded_mc_simulation(
+                operation, target_row, target_col, mc_runs, temperature, vars,
+                num_shards=num_shards, max_workers=max_workers, seed=seed, use_cache=use_cache,
+                timeout=timeout, requeue=requeue, resume=resume is not None, sim_path=sim_path)
+
+        file_suffix = 'ms' if 'snm' in operation else 'mt'
+        fingerprint = self.campaign_fingerprint(
+            operation, target_row, target_col, mc_runs, temperature, vars, num_shards=1, seed=seed)
+        manifest = self.open_campaign(fingerprint, [(0, mc_runs)], [seed], resume=resume is not None,
+                                      sim_path=sim_path, operation=operation, mc_runs=mc_runs)
+        if manifest.is_done(0):
+            mc_df, self.last_run_report = self.load_finished_shard(manifest, 0, file_suffix)
+            return self.summarize_mc_results(mc_df, self.last_run_report['tb_path'], operation)
+
+        partial = self.load_partial_shard(manifest, 0, file_suffix) if resume is not None else None
+        if partial is not None:
+            # Only the samples the interrupted run did not finish are simulated again
+            mc_df, report = partial
+            tb_path, cache_key = report['tb_path'], None
+            requeue = max(requeue, 1)
+        else:
+            tb_path = self.write_mc_netlist(
+                operation, target_row, target_col, mc_runs, temperature, vars, sim_path=sim_path, seed=seed)
 
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"Xyce error:\n{result.stderr}, please check the log file {tb_path.replace('.sp', '.lis')}.")
-            else:
+            cache_key, cached = self.lookup_cached_results(tb_path, use_cache, seed)
+            if cached is not None:
+                mc_df, stats = cached
+                self.last_run_report = {'tb_path': tb_path, 'status': 'cached', 'elapsed': 0.0,
+                                        'finished': list(range(mc_runs)), 'unfinished': []}
+                manifest.record_result(0, self.last_run_report, file_suffix)
+                return self.summarize_mc_results(mc_df, tb_path, operation, stats=stats)
+
+            # assert 0
+            # Execute Xyce and parse results
+            print("[DEBUG] Xyce running ...")
+            manifest.set_running(0, tb_path)
+            # Get all `.mtX` or `.msX` files from MC, including those of a killed run
+            mc_df, report = run_supervised_mc(
+                tb_path, mc_runs, file_suffix=file_suffix, timeout=timeout, xyce_cmd=self.xyce_cmd)
+            manifest.record_result(0, report, file_suffix)
+            if self.cost_model is not None and report['status'] == 'ok' and self.last_netlist_report:
+                self.cost_model.record(self.last_netlist_report, report['elapsed'], output_bytes(tb_path))
+
+            if report['status'] == 'ok':
                 print("[DEBUG] Simulation run successfully.")
-        finally:
-            # plot waveforms of signals in `.PRINT`
+                # plot waveforms of signals in `.PRINT`
+                process_simulation_data(
+                    prn_path=tb_path + '.prn',
+                    num_mc=mc_runs,
+                    output=f"{sim_path}/mc_{operation}_waveform.png",
+                )
+
+        if requeue and report['unfinished']:
+            mc_df, report = self.requeue_unfinished_samples(
+                mc_df, report, operation, target_row, target_col, temperature,
+                vars=vars, timeout=timeout, seed=seed, requeue=requeue, sim_path=sim_path,
+                collect_outputs=True)
+            manifest.record_result(0, report, file_suffix)
+        self.last_run_report = report
+        self.record_surrogate_samples(operation, vars, mc_df)
+
+        stats = generate_mc_statistics(mc_df)
+        if cache_key is not None and report['status'] == 'ok' and not report['unfinished']:
+            self.result_cache.put(cache_key, mc_df, stats, meta={'operation': operation, 'mc_runs': mc_runs})
+        return self.summarize_mc_results(mc_df, tb_path, operation, stats=stats)
+
+    async def run_mc_simulation_async(self, operation='read', target_row=0, target_col=0, mc_runs=100,
+                                      temperature=27, vars=None, seed=None, use_cache=True,
+                                      timeout=None, sim_path=None, semaphore=None):
+        """
+        asyncio counterpart of run_mc_simulation() 异步仿真接口
+
+        The netlist is generated in the event loop thread (so `SRAM_CONFIG` and the
+        testbench state are never touched by two threads), Xyce runs through
+        `asyncio.create_subprocess_exec` and the measurement files are parsed in a
+        worker thread, overlapping with the other Xyce runs still in flight.
+        Args:
+            sim_path: output directory of this run, defaults to `self.sim_path`;
+                      concurrent runs of the same operation need different directories
+            semaphore: asyncio.Semaphore bounding the number of concurrent Xyce processes
+        Sharding, resume and re-queueing are only available in run_mc_simulation().
+        """
+        mc_df, stats, report = await self.simulate_mc_async(
+            operation, target_row, target_col, mc_runs, temperature, vars, seed=seed,
+            use_cache=use_cache, timeout=timeout, sim_path=sim_path, semaphore=semaphore)
+        self.last_run_report = report
+        return self.summarize_mc_results(mc_df, report['tb_path'], operation, stats=stats)
+
+    async def simulate_mc_async(self, operation='read', target_row=0, target_col=0, mc_runs=100,
+                                temperature=27, vars=None, seed=None, use_cache=True,
+                                timeout=None, sim_path=None, semaphore=None):
+        """
+        Generate, simulate and parse one MC run, see run_mc_simulation_async()
+        Returns:
+            (mc_df, stats, report); `stats` is None when no sample finished
+        """
+        timeout = self.get_timeout(timeout)
+        sim_path = sim_path or self.sim_path
+        os.makedirs(sim_path, exist_ok=True)
+        file_suffix = 'ms' if 'snm' in operation else 'mt'
+
+        tb_path = self.write_mc_netlist(
+            operation, target_row, target_col, mc_runs, temperature, vars,
+            sim_path=sim_path, seed=seed)
+
+        cache_key, cached = self.lookup_cached_results(tb_path, use_cache, seed)
+        if cached is not None:
+            mc_df, stats = cached
+            report = {'tb_path': tb_path, 'status': 'cached', 'elapsed': 0.0,
+                      'finished': list(range(mc_runs)), 'unfinished': []}
+            return mc_df, stats, report
+
+        print(f"[DEBUG] Xyce running {tb_path} ...")
+        mc_df, report = await run_supervised_mc_async(
+            tb_path, mc_runs, file_suffix=file_suffix, timeout=timeout, xyce_cmd=self.xyce_cmd,
+            semaphore=semaphore)
+
+        if report['status'] == 'ok':
+            print(f"[DEBUG] Simulation {tb_path} run successfully.")
             process_simulation_data(
                 prn_path=tb_path + '.prn',
                 num_mc=mc_runs,
-                output=f"{self.sim_path}/mc_{operation}_waveform.png",
+                output=f"{sim_path}/mc_{operation}_waveform.png",
             )
 
-            # Get all `.mtX` or `.msX` files from MC
-            mc_df = parse_mc_measurements(
-                netlist_prefix=tb_path,
-                file_suffix='ms' if 'snm' in operation else 'mt',
-                num_runs=mc_runs,
-                # value_threshold=1e-9
-            )
-            print("[DEBUG] Printing mc_df")
-            print(mc_df)
-            # assert 0
-            # Generate statistics
-            stats = generate_mc_statistics(mc_df)
-            # Save results
-            save_mc_results(
-                mc_df, stats,
-                data_file=tb_path.replace('.sp', '.data.csv'),
-                stats_file=tb_path.replace('.sp', '.stats.csv')
-            )
+        stats = generate_mc_statistics(mc_df) if not mc_df.empty else None
+        if cache_key is not None and report['status'] == 'ok' and not report['unfinished']:
+            self.result_cache.put(cache_key, mc_df, stats, meta={'operation': operation, 'mc_runs': mc_runs})
+        return mc_df, stats, report
 
-            # Reture the performance metrics for yield analysis and sizing optimization
-            if operation == 'write':
-                return mc_df['TWRITE_Q'].to_numpy(), mc_df['PAVG'].to_numpy()
-            elif operation == 'read':
-                return mc_df['TSWING'].to_numpy(), mc_df['PAVG'].to_numpy()
-            elif operation == 'hold_snm':
-                return mc_df['HOLD_SNM'].to_numpy()
-            elif operation == 'read_snm':
-                return mc_df['READ_SNM'].to_numpy()
-            elif operation == 'write_snm':
-                return mc_df['WRITE_SNM'].to_numpy()
+    def run_sharded_mc_simulation(self, operation='read', target_row=0, target_col=0, mc_runs=100,
+                                  temperature=27, vars=None, num_shards=2, max_workers=None, seed=None,
+                                  use_cache=True, timeout=None, requeue=0, resume=False, sim_path=None):
+        """
+        Split `mc_runs` into shards, run them on a local process pool and merge the results
+        分片并行蒙特卡洛仿真
+
+        Each shard gets its own seed, netlist and `shard_<k>` sub-directory under `sim_path`.
+        Its `.mtX`/`.msX` outputs are renumbered to global sample indices, so the returned
+        metrics are the same as those of `run_mc_simulation` without sharding.
+        Shards found in `self.result_cache` are not simulated again, and `timeout` applies
+        to every shard separately. Progress is recorded in `<sim_path>/campaign_<fingerprint>.json`;
+        with `resume=True` the shards an earlier process completed are loaded instead of re-run.
+        `sim_path` defaults to `self.sim_path`.
+        """
+        sim_path = sim_path or self.sim_path
+        if self.uses_param_sweep():
+            raise ValueError("Sharding is only supported for Monte Carlo runs, disable the parameter sweeps")
+        if vars is not None:
+            assert mc_runs == vars.shape[0], f"mc_runs={mc_runs} mismatches {vars.shape[0]} rows of vars"
+
+        ranges = split_mc_runs(mc_runs, num_shards)
+        seeds = shard_seeds(seed, len(ranges))
+        file_suffix = 'ms' if 'snm' in operation else 'mt'
+        print(f"[DEBUG] Sharded MC: {mc_runs} samples in {len(ranges)} shards")
+
+        fingerprint = self.campaign_fingerprint(
+            operation, target_row, target_col, mc_runs, temperature, vars,
+            num_shards=num_shards, seed=seed)
+        manifest = self.open_campaign(fingerprint, ranges, seeds, resume=resume, sim_path=sim_path,
+                                      operation=operation, mc_runs=mc_runs)
+        # Keep the seeds of the original run when resuming
+        seeds = [shard['seed'] for shard in manifest.shards]
+
+        # Netlists are generated serially, only Xyce runs in parallel
+        shard_jobs = []
+        shard_dfs = [None] * len(ranges)
+        shard_keys = [None] * len(ranges)
+        shard_reports = [None] * len(ranges)
+        for k, ((start, count), shard_seed) in enumerate(zip(ranges, seeds)):
+            if manifest.is_done(k):
+                shard_dfs[k], shard_reports[k] = self.load_finished_shard(manifest, k, file_suffix)
+                continue
+
+            shard_path = os.path.join(sim_path, f'shard_{k}')
+            os.makedirs(shard_path, exist_ok=True)
+            shard_vars = vars[start:start + count] if vars is not None else None
+            tb_path = self.write_mc_netlist(
+                operation, target_row, target_col, count, temperature, shard_vars,
+                sim_path=shard_path, seed=shard_seed)
+
+            shard_keys[k], cached = self.lookup_cached_results(tb_path, use_cache, shard_seed)
+            if cached is not None:
+                shard_dfs[k] = cached[0]
+                shard_reports[k] = {'tb_path': tb_path, 'status': 'cached', 'elapsed': 0.0,
+                                    'finished': list(range(count)), 'unfinished': []}
+                manifest.record_result(k, shard_reports[k], file_suffix)
             else:
-                raise KeyError(f"Unkonwn operation {operation}")
+                shard_jobs.append((k, tb_path, count))
+
+        if shard_jobs:
+            for k, tb_path, _ in shard_jobs:
+                manifest.shards[k].update(status='running', tb_path=os.path.relpath(tb_path, sim_path))
+            manifest.save()
+
+            print(f"[DEBUG] Xyce running {len(shard_jobs)} shards ...")
+            results = run_mc_shards(
+                [(tb_path, count) for _, tb_path, count in shard_jobs],
+                file_suffix=file_suffix,
+                max_workers=max_workers,
+                timeout=timeout,
+                xyce_cmd=self.xyce_cmd,
+                on_done=lambda i, df, shard_report: manifest.record_result(
+                    shard_jobs[i][0], shard_report, file_suffix))
+
+            for (k, _, count), (df, shard_report) in zip(shard_jobs, results):
+                shard_dfs[k] = df
+                shard_reports[k] = shard_report
+                if shard_keys[k] is not None and shard_report['status'] == 'ok' and not shard_report['unfinished']:
+                    self.result_cache.put(shard_keys[k], df, meta={'operation': operation, 'mc_runs': count})
+
+            # plot waveforms of all completed shards together
+            plotted = [(tb_path, count) for k, tb_path, count in shard_jobs if shard_reports[k]['status'] == 'ok']
+            if plotted:
+                process_sharded_simulation_data(
+                    prn_paths=[tb_path + '.prn' for tb_path, _ in plotted],
+                    num_mcs=[count for _, count in plotted],
+                    output=f"{sim_path}/mc_{operation}_waveform.png",
+                )
+
+        mc_df = merge_mc_measurements(shard_dfs, [start for start, _ in ranges])
+        statuses = [r['status'] for r in shard_reports]
+        report = {
+            'tb_path': self.get_tb_path(operation, sim_path),
+            'status': next((st for st in ('error', 'timeout') if st in statuses), 'ok'),
+            'elapsed': max(r['elapsed'] for r in shard_reports),
+            'finished': [start + i for (start, _), r in zip(ranges, shard_reports) for i in r['finished']],
+            'unfinished': [start + i for (start, _), r in zip(ranges, shard_reports) for i in r['unfinished']],
+            'shards': shard_reports,
+        }
+        print(f"[DEBUG] {len(report['finished'])}/{mc_runs} samples finished")
+
+        if requeue and report['unfinished']:
+            mc_df, report = self.requeue_unfinished_samples(
+                mc_df, report, operation, target_row, target_col, temperature,
+                vars=vars, timeout=timeout, seed=seed, requeue=requeue, sim_path=sim_path)
+        self.last_run_report = report
+
+        return self.summarize_mc_results(mc_df, self.get_tb_path(operation, sim_path), operation)
+
+    def simulate_batch(self, operation, target_row, target_col, mc_runs, temperature=27, vars=None,
+                       sim_path=None, seed=None, timeout=None, use_cache=True, return_report=False):
+        """
+        Simulate one batch of samples in its own directory and return its mc_df
+        单批次仿真 (自适应 MC、重要性采样共用)
+        Rows are indexed by the local sample number; unfinished samples have no row.
+        With `return_report`, (mc_df, report) is returned, see run_supervised_mc().
+        """
+        os.makedirs(sim_path, exist_ok=True)
+        file_suffix = 'ms' if 'snm' in operation else 'mt'
+        tb_path = self.write_mc_netlist(
+            operation, target_row, target_col, mc_runs, temperature, vars,
+            sim_path=sim_path, seed=seed)
+
+        cache_key, cached = self.lookup_cached_results(tb_path, use_cache, seed)
+        if cached is not None:
+            report = {'tb_path': tb_path, 'status': 'cached', 'elapsed': 0.0,
+                      'finished': list(range(mc_runs)), 'unfinished': []}
+            return (cached[0], report) if return_report else cached[0]
+        print(f"[DEBUG] Xyce running batch {sim_path} ({mc_runs} samples) ...")
+        batch_df, report = run_supervised_mc(tb_path, mc_runs, file_suffix, timeout, self.xyce_cmd)
+        if cache_key is not None and report['status'] == 'ok' and not report['unfinished']:
+            self.result_cache.put(cache_key, batch_df, meta={'operation': operation, 'mc_runs': mc_runs})
+        self.record_surrogate_samples(operation, vars, batch_df)
+        return (batch_df, report) if return_report else batch_df
+
+    def record_surrogate_samples(self, operation, vars, mc_df):
+        """
+        Store the (vars row, measurement) pairs of finished samples in `self.surrogate_data`
+        Only custom_mc runs with an explicit data table have known inputs; every measured
+        column is stored, NaN marking a measurement that did not trigger.
+        """
+        if self.surrogate_data is None or not self.custom_mc or vars is None or mc_df.empty:
+            return
+        runs = mc_df.index.to_numpy(dtype=int)
+        for metric in mc_df.columns:
+            total = self.surrogate_data.add(operation, metric, vars[runs], mc_df[metric].to_numpy(dtype=float))
+        print(f"[DEBUG] Recorded {len(runs)} {operation} samples for the surrogate ({total} in total)")
@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 from math import ceil, log2
 from PySpice.Spice.Netlist import Circuit
 from PySpice.Unit import u_V, u_ns
@@ -7,20 +8,30 @@ from sram_compiler.subcircuits.sram_9t_st_core_for_yield import (
     Sram9TCore,
     Sram9TCoreForYield,
     Sram9TCell,
-    Sram9TCellForYield
+    Sram9TCellForYield,
+    Sram9TCellParamForYield,
+    Sram9TCoreParamForYield
 )
 from sram_compiler.subcircuits.wordline_driver import WordlineDriver
 from sram_compiler.subcircuits.decoder import DECODER_CASCADE
 from sram_compiler.subcircuits.precharge_and_write_driver import Precharge, WriteDriver
 from sram_compiler.subcircuits.mux_and_sa import ColumnMux, SenseAmp
-from utils import parse_spice_models
+from sram_compiler.subcircuits.netlist_ir import ir_variant
+from model_library import get_models  # type: ignore
 
 
 class Sram9TCoreTestbench(BaseTestbench):
-    def __init__(self, sram_config, corner="TT", w_rc=False, custom_mc=False, param_sweep=False, q_init_val=0):
+    def __init__(self, sram_config, corner="TT", w_rc=False, custom_mc=False, param_sweep=False, q_init_val=0,
+                 param_cell_model=False, reduced_array=False, compact_ir=False):
         self.sram_config = sram_config
         self.corner = corner         # 工艺角 (如 TT, SS, FF)
         self.custom_mc = custom_mc   # 是否启用自定义蒙特卡洛模拟（用于良率分析）
+        # 自定义 MC 时使用参数化单元阵列 (Sram9TCoreParamForYield)：一个单元定义，失配作为实例参数
+        self.param_cell_model = param_cell_model
+        # 降阶阵列：只有 target_row/target_col 保留晶体管级，其余单元为集总 BL/WL 负载
+        self.reduced_array = reduced_array
+        # 阵列/译码器/字线驱动/预充电用 __slots__ 轻量网表 IR 构建 (输出网表不变，构建更快、内存更小)
+        self.compact_ir = compact_ir
         self.param_sweep = param_sweep # 是否启用参数扫描
         self.q_init_val = q_init_val   # 存储节点的初始值
 
@@ -37,12 +48,78 @@ class Sram9TCoreTestbench(BaseTestbench):
         self.num_cols = cfg.num_cols
         self.w_rc = w_rc  # 是否包含寄生电阻电容 (RC)
 
-        # 如果是自定义蒙特卡洛，解析 SPICE 模型以便手动注入偏差
+        # 如果是自定义蒙特卡洛，解析 SPICE 模型以便手动注入偏差 (只读视图，每个文件在进程内只解析一次)
         if self.custom_mc:
-            self.model_dict = parse_spice_models(getattr(cfg, f"pdk_path_{corner}"))
+            self.model_dict = get_models(getattr(cfg, f"pdk_path_{corner}"))
+
+        # 已构建的子电路，按 (类, 参数) 复用，见 shared_subcircuit()
+        self._subckt_cache = {}
+
+        # Xyce 层次节点分隔符与目标单元 (测量/初值用)，由 set_target_cell() 更新
+        self.heir_delimiter = ':'
+        self.target_row = 0
+        self.target_col = 0
+        self.cell_inst_prefix = 'X9T'
+
+    def set_corner(self, corner):
+        """切换工艺角 / Switch the model lib (pdk_path_<corner>) used by later testbenches"""
+        cfg = self.sram_config.global_config
+        self.corner = corner
+        self.pdk_path = getattr(cfg, f"pdk_path_{corner}")
+        if self.custom_mc:
+            self.model_dict = get_models(self.pdk_path)
 
+    def subckt_class(self, factory):
+        """Subcircuit class to build with, its IR variant when compact_ir is set"""
+        return ir_variant(factory) if self.compact_ir else factory
 
+    def shared_subcircuit(self, factory, *args, **kwargs):
+        """
+        Build a subcircuit once per (class, arguments) and reuse it in later testbenches
+        同一组参数的子电路只构建一次 (阵列、译码器、字线驱动在多个操作间共享)
+        """
+        def arg_key(arg):
+            # model dicts are large and not hashable, they are shared by identity
+            return id(arg) if isinstance(arg, Mapping) else repr(arg)
+
+        key = (factory.__name__,
+               tuple(arg_key(arg) for arg in args),
+               tuple((name, arg_key(arg)) for name, arg in sorted(kwargs.items())))
+        if key not in self._subckt_cache:
+            self._subckt_cache[key] = self.subckt_class(factory)(*args, **kwargs)
+        return self._subckt_cache[key]
+
+    def set_target_cell(self, operation, target_row=0, target_col=0):
+        """
+        Select the measured cell 设置目标单元
+        Array decks name it `XXARRAY:X<cell>_<row>_<col>`, the SNM deck holds it alone as `X9T`.
+        """
+        self.target_row = target_row
+        self.target_col = target_col
+        if 'snm' in operation:
+            self.cell_inst_prefix = 'X9T'
+        else:
+            cell_name = Sram9TCellParamForYield.NAME if self.custom_mc and self.param_cell_model \
+                else Sram9TCell.NAME
+            self.cell_inst_prefix = f'XXARRAY{self.heir_delimiter}X{cell_name}'
 
+    def data_init(self):
+        """
+        .ic of the storage nodes of the array cells 阵列存储节点初值
+        Q starts at VDD when q_init_val is set, else at 0, QB at the complement. With
+        reduced_array only the cells of the target row and column are transistor-level.
+        """
+        vdd = self.vdd @ u_V
+        q_val, qb_val = (vdd, 0 @ u_V) if self.q_init_val else (0 @ u_V, vdd)
+        init_cond = {}
+        for row in range(self.num_rows):
+            for col in range(self.num_cols):
+                if self.reduced_array and row != self.target_row and col != self.target_col:
+                    continue
+                node = f'{self.cell_inst_prefix}_{row}_{col}{self.heir_delimiter}'
+                init_cond[node + 'Q'] = q_val
+                init_cond[node + 'QB'] = qb_val
+        return init_cond
 
     # =========================================================
     #  Single Cell SNM Testbench
@@ -139,8 +216,7 @@ class Sram9TCoreTestbench(BaseTestbench):
         # -----------------------------
         # Rotated SNM VCVS
         # -----------------------------
-        self.cell_inst_prefix = "X9T"
-        h = ":"
+        h = self.heir_delimiter
 
         circuit.VCVS(
             "V1", "V1", "", self.gnd_node, "",
@@ -174,6 +250,7 @@ class Sram9TCoreTestbench(BaseTestbench):
         circuit.V(self.power_node, self.power_node, self.gnd_node, self.vdd)
         circuit.V(self.gnd_node, self.gnd_node, circuit.gnd, 0 @ u_V)
 
+        self.set_target_cell(operation, target_row, target_col)
         if "snm" in operation:
             return self.create_single_cell_for_snm(circuit, operation)
         # 1. 实例化 SRAM Core (存储阵列)
@@ -196,9 +273,29 @@ class Sram9TCoreTestbench(BaseTestbench):
         w_pg = cell_cfg.nmos_width.value[1]
         
         length = cell_cfg.length.value
+        # Reduced-order array keeps only the target row/column in full detail
+        reduced_target = (target_row, target_col) if self.reduced_array else None
 
-        if self.custom_mc:
-            core = Sram9TCoreForYield(
+        if self.custom_mc and self.param_cell_model:
+            core = self.shared_subcircuit(
+                Sram9TCoreParamForYield,
+                self.num_rows,
+                self.num_cols,
+                n_model_pd,
+                p_model_pu,
+                n_model_pg,
+                self.model_dict,
+                w_pd,
+                w_pu,
+                w_pg,
+                length,
+                w_rc=self.w_rc,
+                param_sweep=self.param_sweep,
+                reduced_target=reduced_target
+            )
+        elif self.custom_mc:
+            core = self.shared_subcircuit(
+                Sram9TCoreForYield,
                 self.num_rows,
                 self.num_cols,
                 n_model_pd,  # 使用修复后的变量
@@ -210,10 +307,12 @@ class Sram9TCoreTestbench(BaseTestbench):
                 w_pg,
                 length,
                 w_rc=self.w_rc,
-                param_sweep=self.param_sweep
+                param_sweep=self.param_sweep,
+                reduced_target=reduced_target
             )
         else:
-            core = Sram9TCore(
+            core = self.shared_subcircuit(
+                Sram9TCore,
                 self.num_rows,
                 self.num_cols,
                 n_model_pd,  # 使用修复后的变量
@@ -224,9 +323,11 @@ class Sram9TCoreTestbench(BaseTestbench):
                 w_pg,
                 length,
                 w_rc=self.w_rc,
-                param_sweep=self.param_sweep
+                param_sweep=self.param_sweep,
+                reduced_target=reduced_target
             )
         circuit.subcircuit(core)
+        self.core = core
 
         circuit.X(
             "XARRAY",
@@ -244,7 +345,8 @@ class Sram9TCoreTestbench(BaseTestbench):
         dec_cfg = self.sram_config.decoder
         n_bits = ceil(log2(self.num_rows))
 
-        decoder = DECODER_CASCADE(
+        decoder = self.shared_subcircuit(
+            DECODER_CASCADE,
             dec_cfg.nmos_model.value[0],
             dec_cfg.pmos_model.value[0],
             self.num_rows,
@@ -279,15 +381,15 @@ class Sram9TCoreTestbench(BaseTestbench):
         # 负责接收译码器信号并受 WL_EN 使能信号控制
         # ---------- Wordline Driver ----------
         wl_cfg = self.sram_config.wordline_driver
-        wld = WordlineDriver(
+        wld = self.shared_subcircuit(
+            WordlineDriver,
             wl_cfg.nmos_model.value[0],
             wl_cfg.pmos_model.value[0],
             wl_cfg.pmos_width.value[0],
             wl_cfg.nmos_width.value[0],
             wl_cfg.pmos_width.value[1],
             wl_cfg.nmos_width.value[1],
-            wl_cfg.length.value,
-            self.num_rows
+            wl_cfg.length.value
         )
         circuit.subcircuit(wld)
 
@@ -338,7 +440,7 @@ class Sram9TCoreTestbench(BaseTestbench):
         if isinstance(p_width, list):
             p_width = p_width[0]
 
-        precharge = Precharge(
+        precharge = self.subckt_class(Precharge)(
             pmos_model_name=prch_cfg.pmos_model.value[0], 
             base_pmos_width=p_width, # 使用处理后的变量
             length=prch_cfg.length.value if not isinstance(prch_cfg.length.value, list) else prch_cfg.length.value[0],
@@ -0,0 +1,325 @@
+"""
+代理模型辅助良率估计 / Surrogate-assisted yield estimation with active learning.
+
+Every Xyce sample of an array costs a full transient. Here a Gaussian process
+(NumPy only: linear mean + RBF kernel, length scale by marginal likelihood) is
+fitted on `vars -> metric` pairs and classifies a large pool of samples
+against the spec without simulating them. Active learning (AK-MCS) simulates
+only the pool samples whose classification is uncertain, i.e. with a small
+
+    U = |mean - fail_threshold| / std
+
+and stops once no pool sample has U < `u_threshold` (probability of a wrong
+classification Phi(-U), 2.3 % at U = 2) or the simulation budget is spent. The
+result reports how many pool samples are still uncertain and bounds the
+failure probability by counting them as passes or as failures; when
+`result['fallback']` is set, the surrogate is not trusted and the remaining
+uncertain samples should be simulated.
+
+Pairs from earlier runs are kept in a `SurrogateDataset` (one `.npz` per
+operation, metric and column count); the MC testbench records them when it is
+given one, and mc_orchestration.run_surrogate_yield() reuses them as the initial design:
+
+    tb = Sram9TCoreMcTestbench(..., custom_mc=True, surrogate_data=SurrogateDataset('sim/surrogate'))
+    result = run_surrogate_yield(tb, 'read_snm', fail_threshold=0.12, fail_above=False)
+"""
+import os
+import tempfile
+from statistics import NormalDist
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from importance_sampling import failure_indicator  # type: ignore
+from qmc_sampling import normal_cdf  # type: ignore
+from xyce_runner import shard_seeds  # type: ignore
+
+
+class GaussianProcessSurrogate:
+    """
+    GP regression with a linear mean 高斯过程代理模型
+    The linear part (ridge) captures the near-linear sensitivity of SRAM metrics to
+    vth0/u0/voff, the isotropic RBF kernel the curvature around it. Inputs should be
+    standardized (z-space); the length scale is picked from `length_scales * sqrt(dim)`
+    by the log marginal likelihood.
+    """
+
+    def __init__(self, length_scales: Sequence[float] = (0.25, 0.5, 1.0, 2.0, 4.0),
+                 noise: float = 1e-8, ridge: float = 1e-6):
+        self.length_scales = tuple(length_scales)
+        self.noise = noise
+        self.ridge = ridge
+        self.length_scale = None
+        self.log_likelihood = None
+
+    def _kernel(self, a, b):
+        sq = (np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :]
+              - 2 * a @ b.T)
+        return np.exp(-0.5 * np.maximum(sq, 0) / self.length_scale ** 2)
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> 'GaussianProcessSurrogate':
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = float(y.mean()), float(y.std()) or 1.0
+        t = (y - self.y_mean) / self.y_std
+
+        # Linear mean by ridge regression, the GP models the residual
+        design = np.hstack([np.ones((len(x), 1)), x])
+        self.coef = np.linalg.solve(design.T @ design + self.ridge * len(x) * np.eye(design.shape[1]),
+                                    design.T @ t)
+        resid = t - design @ self.coef
+        self.signal = max(float(resid.var()), 1e-12)
+        self.x = x
+
+        best = None
+        for scale in self.length_scales:
+            self.length_scale = scale * np.sqrt(x.shape[1])
+            k = self.signal * self._kernel(x, x) + (self.noise + 1e-10) * np.eye(len(x))
+            try:
+                chol = np.linalg.cholesky(k)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(k, resid)
+            log_lik = -0.5 * resid @ alpha - np.log(np.diag(chol)).sum()
+            if best is None or log_lik > best[0]:
+                best = (log_lik, self.length_scale, chol, alpha)
+        if best is None:
+            raise np.linalg.LinAlgError("GP kernel matrix is not positive definite for any length scale")
+        self.log_likelihood, self.length_scale, chol, self.alpha = best
+        # Explicit inverse factor, predict() then runs on matrix products only
+        self.chol_inv = np.linalg.inv(chol)
+        return self
+
+    def predict(self, x: np.ndarray, chunk: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+        """Posterior mean and standard deviation in metric units"""
+        x = np.asarray(x, dtype=float)
+        means, stds = [], []
+        for start in range(0, len(x), chunk):
+            block = x[start:start + chunk]
+            ks = self.signal * self._kernel(block, self.x)
+            mean = np.hstack([np.ones((len(block), 1)), block]) @ self.coef + ks @ self.alpha
+            v = self.chol_inv @ ks.T
+            var = np.maximum(self.signal - np.einsum('ij,ij->j', v, v), 0) + self.noise
+            means.append(mean)
+            stds.append(np.sqrt(var))
+        return (self.y_mean + self.y_std * np.concatenate(means),
+                self.y_std * np.concatenate(stds))
+
+
+class SurrogateDataset:
+    """
+    Simulated (vars, metric) pairs kept across runs 代理模型训练数据
+    One `<operation>_<metric>_<columns>.npz` per data table layout under `path`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, operation, metric, num_cols):
+        return os.path.join(self.path, f'{operation}_{metric}_{num_cols}.npz')
+
+    def load(self, operation: str, metric: str, num_cols: int) -> Tuple[np.ndarray, np.ndarray]:
+        """All stored pairs, (vars (n, num_cols), values (n,)); empty arrays if none"""
+        path = self._file(operation, metric, num_cols)
+        if not os.path.exists(path):
+            return np.empty((0, num_cols)), np.empty(0)
+        with np.load(path) as data:
+            return data['vars'], data['values']
+
+    def add(self, operation: str, metric: str, vars: np.ndarray, values: np.ndarray) -> int:
+        """Append pairs (NaN values included, they are failed measurements); returns the total"""
+        vars = np.asarray(vars, dtype=float)
+        values = np.asarray(values, dtype=float)
+        old_vars, old_values = self.load(operation, metric, vars.shape[1])
+        vars, values = np.vstack([old_vars, vars]), np.concatenate([old_values, values])
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.npz', dir=self.path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vars=vars, values=values)
+            os.replace(tmp_path, self._file(operation, metric, vars.shape[1]))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(values)
+
+
+class SurrogateYieldEstimator:
+    """
+    Active-learning yield estimation on a sample pool 主动学习良率估计
+
+    Args:
+        evaluate: callable (vars, phase, batch) -> (metric values, finished mask),
+                  as for importance_sampling.ImportanceSamplingYield
+        means, stds: nominal Gaussian of every parameter
+        fail_threshold / fail_above / missing_as_fail: failure criterion, see failure_indicator()
+        pool_size: samples classified by the surrogate
+        shift: optional mean shift (standardized) of the pool, e.g. the one found by
+               ImportanceSamplingYield, for rare failures; pool samples are then weighted
+        u_threshold: samples with U below it are uncertain
+        max_uncertain: stop once the uncertain samples hold at most this fraction of the
+                       failure weight (strict AK-MCS criterion)
+        max_error: ... or once the expected misclassified weight is at most this fraction
+                   of pfail ('rel_error')
+        seed: base seed of the pool and initial design
+    """
+
+    def __init__(self, evaluate: Callable[[np.ndarray, str, int], Tuple[np.ndarray, np.ndarray]],
+                 means: Sequence[float], stds: Sequence[float], fail_threshold: float,
+                 fail_above: bool = True, missing_as_fail: bool = True, pool_size: int = 100000,
+                 shift: Sequence[float] = None, u_threshold: float = 2.0, max_uncertain: float = 0.01,
+                 max_error: float = 0.02, confidence: float = 0.95, seed: Optional[int] = None):
+        self.evaluate = evaluate
+        self.means = np.asarray(means, dtype=float)
+        self.stds = np.asarray(stds, dtype=float)
+        self.dim = len(self.means)
+        self.fail_threshold = fail_threshold
+        self.fail_above = fail_above
+        self.missing_as_fail = missing_as_fail
+        self.u_threshold = u_threshold
+        self.max_uncertain = max_uncertain
+        self.max_error = max_error
+        self.confidence = confidence
+        self.seed = seed
+
+        pool_seed, self._design_seed = shard_seeds(seed, 2, stream=6)
+        self.shift = np.zeros(self.dim) if shift is None else np.asarray(shift, dtype=float)
+        self.pool = self.shift + np.random.default_rng(pool_seed).standard_normal((pool_size, self.dim))
+        # f / g of the pool samples, all 1 without shift
+        self.pool_weights = np.exp(-self.pool @ self.shift + 0.5 * float(self.shift @ self.shift))
+        self.simulated = np.zeros(pool_size, dtype=bool)
+        self.pool_fails = np.zeros(pool_size, dtype=bool)  # truth for simulated samples
+
+        self.train_z = np.empty((0, self.dim))
+        self.train_y = np.empty(0)
+        self.model = GaussianProcessSurrogate()
+        self.sim_runs = 0
+        self.history = []
+
+    def to_params(self, z: np.ndarray) -> np.ndarray:
+        return self.means + z * self.stds
+
+    def to_z(self, vars: np.ndarray) -> np.ndarray:
+        return (np.asarray(vars, dtype=float) - self.means) / self.stds
+
+    def add_training_data(self, vars: np.ndarray, values: np.ndarray) -> None:
+        """Pairs simulated elsewhere, e.g. SurrogateDataset.load(); NaN values are skipped"""
+        values = np.asarray(values, dtype=float)
+        keep = ~np.isnan(values)
+        self.train_z = np.vstack([self.train_z, self.to_z(vars)[keep]])
+        self.train_y = np.concatenate([self.train_y, values[keep]])
+
+    def _simulate_pool(self, index, phase, batch):
+        values, finished = self.evaluate(self.to_params(self.pool[index]), phase, batch)
+        values = np.asarray(values, dtype=float)
+        finished = np.asarray(finished, dtype=bool)
+        self.sim_runs += len(index)
+        index, values = index[finished], values[finished]
+        self.simulated[index] = True
+        self.pool_fails[index] = failure_indicator(values, self.fail_threshold, self.fail_above,
+                                                   self.missing_as_fail)
+        keep = ~np.isnan(values)
+        self.train_z = np.vstack([self.train_z, self.pool[index[keep]]])
+        self.train_y = np.concatenate([self.train_y, values[keep]])
+        return self.pool[index], values
+
+    def classify(self, z: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Surrogate verdict for standardized samples `z`
+        Returns 'mean', 'std', 'fail' (predicted), 'p_wrong' (Phi(-U)) and 'uncertain' (U < u_threshold).
+        """
+        mean, std = self.model.predict(z)
+        u = np.abs(mean - self.fail_threshold) / std
+        fail = mean > self.fail_threshold if self.fail_above else mean < self.fail_threshold
+        return {'mean': mean, 'std': std, 'fail': fail,
+                'p_wrong': normal_cdf(-u),
+                'uncertain': u < self.u_threshold}
+
+    def estimate(self, verdict: Dict[str, np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Failure probability of the pool: simulated samples by their result, the rest
+        by the surrogate (`verdict` = classify(pool), computed if not given).
+        'pfail_bounds' count the uncertain samples as passes / failures, 'rel_error' is
+        the expected misclassified weight relative to pfail and 'std_error' the
+        sampling error of the pool itself.
+        """
+        if verdict is None:
+            verdict = self.classify(self.pool)
+        fails = np.where(self.simulated, self.pool_fails, verdict['fail'])
+        uncertain = verdict['uncertain'] & ~self.simulated
+        w = self.pool_weights
+        n = len(w)
+        terms = np.where(fails, w, 0.0)
+        pfail = float(terms.mean())
+        std_error = float(terms.std(ddof=1) / np.sqrt(n))
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        low = float(np.where(fails & ~uncertain, w, 0.0).mean())
+        high = float(np.where(fails | uncertain, w, 0.0).mean())
+        uncertain_fraction = float(w[uncertain].sum() / max(w[fails | uncertain].sum(), 1e-300)) \
+            if (fails | uncertain).any() else 0.0
+        misclassified = float((verdict['p_wrong'] * w)[~self.simulated].sum() / n)
+        return {'pfail': pfail, 'std_error': std_error,
+                'pfail_ci': (max(0.0, pfail - z * std_error), min(1.0, pfail + z * std_error)),
+                'pfail_bounds': (low, high),
+                'sigma': -NormalDist().inv_cdf(pfail) if 0 < pfail < 1 else np.nan,
+                'num_uncertain': int(uncertain.sum()), 'uncertain_fraction': uncertain_fraction,
+                'expected_misclassified': misclassified,
+                'rel_error': misclassified / pfail if pfail > 0 else np.inf,
+                'sim_runs': self.sim_runs, 'pool_size': n, 'length_scale': float(self.model.length_scale)}
+
+    def run(self, initial_samples: int = 50, batch_size: int = 20, max_sim: int = 500,
+            min_spacing: float = 0.5) -> Dict[str, Any]:
+        """
+        Initial design, then batches of the most uncertain pool samples until the
+        max_uncertain / max_error criterion holds or `max_sim` runs are spent
+        Samples closer than `min_spacing` (standardized) to one already picked in the
+        batch are skipped, so that a batch does not spend runs on one spot.
+        Returns the last estimate plus 'converged', 'fallback', 'stop_reason' and 'history'.
+        """
+        rng = np.random.default_rng(self._design_seed)
+        if len(self.train_y) < initial_samples:
+            first = rng.choice(len(self.pool), initial_samples - len(self.train_y), replace=False)
+            self._simulate_pool(first, 'initial', 0)
+        if len(self.train_y) < 2:
+            raise RuntimeError("Surrogate needs at least 2 finished samples to fit")
+
+        batch = 0
+        while True:
+            self.model.fit(self.train_z, self.train_y)
+            verdict = self.classify(self.pool)
+            progress = self.estimate(verdict)
+            converged = (progress['uncertain_fraction'] <= self.max_uncertain
+                         or progress['rel_error'] <= self.max_error)
+            stop_reason = 'converged' if converged else ('budget' if self.sim_runs >= max_sim else None)
+            progress.update(batch=batch, converged=converged, stop_reason=stop_reason,
+                            train_size=len(self.train_y))
+            self.history.append(progress)
+            print(f"[DEBUG] Surrogate batch {batch}: sims={self.sim_runs} pfail={progress['pfail']:.3e} "
+                  f"bounds=({progress['pfail_bounds'][0]:.3e}, {progress['pfail_bounds'][1]:.3e}) "
+                  f"uncertain={progress['num_uncertain']} rel_error={progress['rel_error']:.3g}")
+            if stop_reason is not None:
+                break
+
+            # Most uncertain first, spread within the batch
+            u = np.abs(verdict['mean'] - self.fail_threshold) / verdict['std']
+            candidates = np.flatnonzero(verdict['uncertain'] & ~self.simulated)
+            candidates = candidates[np.argsort(u[candidates])]
+            picked = []
+            for index in candidates:
+                if len(picked) >= min(batch_size, max_sim - self.sim_runs):
+                    break
+                if picked and np.min(np.linalg.norm(self.pool[picked] - self.pool[index], axis=1)) < min_spacing:
+                    continue
+                picked.append(index)
+            batch += 1
+            self._simulate_pool(np.array(picked, dtype=int), 'active', batch)
+
+        result = dict(progress)
+        result['fallback'] = not result['converged']
+        result['history'] = list(self.history)
+        if result['fallback']:
+            print(f"[WARNING] Surrogate still uncertain on {result['num_uncertain']} samples "
+                  f"({result['uncertain_fraction']:.1%} of the failure weight), simulate them "
+                  f"or raise max_sim")
+        return result
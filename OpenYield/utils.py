@@ -6,6 +6,7 @@ import pandas as pd
 from pathlib import Path
 from matplotlib.lines import Line2D 
 from typing import Dict, Any, Union
+from statistics import NormalDist
 
 ####################################################################
 #9管的面积估算
@@ -103,9 +104,58 @@ def parse_mc_measurements(netlist_prefix: str = "simulation",
         full_entry = {var: entry.get(var, missing_value) for var in all_vars}
         full_entry["Run"] = entry["Run"]
         clean_data.append(full_entry)
-    
+
+    if not clean_data:
+        # No run finished, e.g. the simulation was killed before the first sample
+        return pd.DataFrame(index=pd.Index([], name='Run', dtype=int))
+
     return pd.DataFrame(clean_data).set_index('Run')
 
+def merge_mc_measurements(shard_dfs: List[pd.DataFrame],
+                          offsets: List[int]) -> pd.DataFrame:
+    """
+    Merge per-shard MC results into one DataFrame with global run numbers
+
+    Args:
+        shard_dfs: DataFrames from parse_mc_measurements(), one per shard
+        offsets: Global index of the first sample of each shard
+
+    Returns:
+        DataFrame indexed by global 'Run', same layout as parse_mc_measurements()
+    """
+    if len(shard_dfs) != len(offsets):
+        raise ValueError(f"Got {len(shard_dfs)} shard results but {len(offsets)} offsets")
+
+    renumbered = []
+    for df, offset in zip(shard_dfs, offsets):
+        if df.empty:
+            continue
+        df = df.copy()
+        df.index = df.index + offset
+        renumbered.append(df)
+
+    if not renumbered:
+        return pd.DataFrame()
+
+    merged = pd.concat(renumbered, sort=True)
+    merged.index.name = 'Run'
+    return merged.sort_index()
+
+def renumber_mc_runs(df: pd.DataFrame, run_ids: List[int]) -> pd.DataFrame:
+    """
+    Map the local run numbers of a sub-run to global sample indices
+
+    Args:
+        df: DataFrame from parse_mc_measurements() of the sub-run
+        run_ids: Global index of every local run, i.e. run i -> run_ids[i]
+
+    Returns:
+        Copy of df indexed by the global 'Run'
+    """
+    df = df.copy()
+    df.index = pd.Index([run_ids[int(run)] for run in df.index], name='Run')
+    return df
+
 def generate_mc_statistics(df: pd.DataFrame) -> pd.DataFrame:
     """
     Generate comprehensive statistics from MC results
@@ -129,6 +179,99 @@ def generate_mc_statistics(df: pd.DataFrame) -> pd.DataFrame:
     
     return stats.T
 
+def mc_convergence_stats(values,
+                         confidence: float = 0.95,
+                         fail_threshold: float = None,
+                         fail_above: bool = True,
+                         missing_as_fail: bool = True) -> Dict[str, Any]:
+    """
+    Running estimate of a MC metric and of its confidence intervals
+    用于序贯蒙特卡洛的收敛判断
+
+    Args:
+        values: samples of the metric; NaN samples (measurement never triggered, e.g. the
+                operation did not complete) are left out of the mean
+        confidence: two-sided confidence level of the intervals
+        fail_threshold: a sample fails if it is above (`fail_above`) or below this value
+        fail_above: direction of the failure criterion
+        missing_as_fail: count NaN samples as failures in pfail (as
+                         importance_sampling.failure_indicator); otherwise they are dropped
+
+    Returns:
+        Dict with 'n' (non-NaN samples), 'num_missing' (NaN samples), 'mean', 'std',
+        'mean_ci' (low, high), 'rel_ci_width' of the mean and, when `fail_threshold` is
+        given, 'num_fail', 'pfail', 'pfail_ci' (Wilson score interval) and 'pfail_rel_ci_width'
+    """
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    num_missing = int(missing.sum())
+    values = values[~missing]
+    n = len(values)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    result = {'n': n, 'num_missing': num_missing, 'mean': np.nan, 'std': np.nan,
+              'mean_ci': (np.nan, np.nan), 'rel_ci_width': np.inf}
+    if n > 0:
+        result['mean'] = float(values.mean())
+    if n > 1:
+        std = float(values.std(ddof=1))
+        half = float(z * std / np.sqrt(n))
+        result['std'] = std
+        result['mean_ci'] = (result['mean'] - half, result['mean'] + half)
+        if result['mean'] != 0:
+            result['rel_ci_width'] = 2 * half / abs(result['mean'])
+
+    if fail_threshold is not None:
+        fails = values > fail_threshold if fail_above else values < fail_threshold
+        num_fail = int(fails.sum())
+        total = n
+        if missing_as_fail:
+            num_fail += num_missing
+            total += num_missing
+        pfail, low, high = np.nan, np.nan, np.nan
+        if total > 0:
+            pfail = num_fail / total
+            # Wilson score interval, well behaved for small failure counts
+            denom = 1 + z ** 2 / total
+            center = (pfail + z ** 2 / (2 * total)) / denom
+            half = float(z * np.sqrt(pfail * (1 - pfail) / total + z ** 2 / (4 * total ** 2)) / denom)
+            low, high = max(0.0, center - half), min(1.0, center + half)
+        result.update(
+            num_fail=num_fail, pfail=pfail, pfail_ci=(low, high),
+            pfail_rel_ci_width=(high - low) / pfail if num_fail > 0 else np.inf)
+    return result
+
+def worst_case_table(pvt_df: pd.DataFrame,
+                     worst: Dict[str, str] = None,
+                     column: str = 'mean') -> pd.DataFrame:
+    """
+    Worst PVT point of every (operation, metric) 各指标的最差工艺角
+
+    Args:
+        pvt_df: tidy table with columns 'operation', 'metric', `column` and the PVT
+                coordinates ('corner', 'temperature', 'vdd'), one row per point and metric
+        worst: {'metric': 'max' | 'min'}; by default SNM metrics are worst at their minimum,
+               delays and power at their maximum
+        column: statistic compared across the points
+
+    Returns:
+        DataFrame indexed by (operation, metric) with the worst row of each group
+    """
+    worst = worst or {}
+    rows = []
+    for (operation, metric), group in pvt_df.groupby(['operation', 'metric'], sort=False):
+        direction = worst.get(metric, 'min' if 'SNM' in metric.upper() else 'max')
+        values = group[column]
+        if values.isna().all():
+            continue
+        idx = values.idxmin() if direction == 'min' else values.idxmax()
+        row = group.loc[idx].copy()
+        row['worst'] = direction
+        rows.append(row)
+    if not rows:
+        return pd.DataFrame(columns=pvt_df.columns).set_index(['operation', 'metric'])
+    return pd.DataFrame(rows).set_index(['operation', 'metric'])
+
 def save_mc_results(df: pd.DataFrame,
                    stats_df: pd.DataFrame,
                    data_file: str = "mc_results.csv",
@@ -252,7 +395,8 @@ def split_blocks(df, analysis_type, num_mc):
         reset_indices = np.where(np.diff(time_series) < -1e-12)[0] + 1
         
         # Automatically split blocks count
-        auto_blocks = np.split(df, reset_indices) if reset_indices.size else [df]
+        bounds = [0, *reset_indices, len(df)]
+        auto_blocks = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
         auto_block_count = len(auto_blocks)
         
         # Block count consistency verification
@@ -278,7 +422,8 @@ def split_blocks(df, analysis_type, num_mc):
                 f"Suggestions: 1. Check simulation settings 2. Verify output options"
             )
         
-        dc_blocks = np.array_split(df, num_mc)
+        block_size = total_points // num_mc
+        dc_blocks = [df.iloc[i * block_size:(i + 1) * block_size] for i in range(num_mc)]
         
         # Final block count verification
         if (actual_mc := len(dc_blocks)) != num_mc:
@@ -476,6 +621,39 @@ def process_simulation_data(prn_path, num_mc=None, output="results"):
         print(f"Failed data processed: {str(e)}")
         raise
 
+def process_sharded_simulation_data(prn_paths, num_mcs, output="results"):
+    """
+    Plot the waveforms of several MC shards in a single figure
+
+    Parameters:
+    -----------
+    prn_paths : list of str or Path
+        The .prn output file of every shard
+    num_mcs : list of int
+        Number of Monte Carlo iterations in each shard
+    output : str, default="results"
+        Path to save output visualization files
+
+    Returns:
+    --------
+    bool
+        True if processing completed successfully
+    """
+    try:
+        data_blocks = []
+        analysis_type = None
+        for prn_path, num_mc in zip(prn_paths, num_mcs):
+            df, analysis_type = read_prn_with_preprocess(prn_path)
+            data_blocks.extend(split_blocks(df, analysis_type, num_mc))
+
+        visualize_results(data_blocks, analysis_type, output)
+        print(f"[DEBUG] Successfully data processed for {len(prn_paths)} shards!")
+        return True
+
+    except Exception as e:
+        print(f"Failed data processed: {str(e)}")
+        raise
+
 def estimate_bitcell_area(
     # Transistor dimensions (m)
     w_access: float,       # Access NMOS (M1/M2) width
@@ -0,0 +1,182 @@
+"""
+工艺偏差模型 / Global + spatial + local process variation for custom_mc data tables.
+
+Columns follow gen_process_params(): for every cell (row-major), the six
+transistors (PGL, PGR, PDL, PUL, PDR, PUR) x (vth0, u0, voff). Each parameter
+is the sum of three independent Gaussian layers whose variances split the
+total sigma (`rel_sigma * |nominal|` by default):
+
+- global (die-to-die), `global_fraction` of the variance: one draw per sample
+  shared by every cell. It is driven by six factors, (nmos, pmos) x
+  (vth0, u0, voff), correlated through `device_corr` and `param_corr`, so all
+  NMOS vth0 of a die move together;
+- spatial (within-die, smooth), `spatial_fraction`: the same six factors as
+  random fields over the array with correlation
+  exp(-|dr| / corr_length) * exp(-|dc| / corr_length) between cells, which
+  factorizes into a row and a column Cholesky factor;
+- local mismatch, the rest: independent per transistor and parameter.
+
+Cholesky factors are cached per geometry / correlation, and samples are
+drawn in chunks of about `CHUNK_VALUES` numbers, so large tables stream:
+
+    model = VariationModel(16, 16, global_fraction=0.4, spatial_fraction=0.2)
+    vars = model.sample(1000, seed=0)                  # (1000, 16*16*18)
+    for block in model.iter_samples(1_000_000, seed=0):
+        ...
+"""
+from functools import lru_cache
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_table import MOS_NAMES, PARAM_NAMES, CHUNK_VALUES  # type: ignore
+from qmc_sampling import CELL_NOMINALS  # type: ignore
+from xyce_runner import shard_seeds  # type: ignore
+
+DEVICE_TYPES = ('nmos', 'pmos')
+PMOS_NAMES = ('PUL', 'PUR')
+
+# Factor (device type, param) of every column within a cell
+SLOT_FACTORS = np.array([
+    DEVICE_TYPES.index('pmos' if mos in PMOS_NAMES else 'nmos') * len(PARAM_NAMES) + k
+    for mos in MOS_NAMES for k in range(len(PARAM_NAMES))
+])
+NUM_FACTORS = len(DEVICE_TYPES) * len(PARAM_NAMES)
+
+
+def _as_key(matrix) -> Optional[Tuple[Tuple[float, ...], ...]]:
+    return None if matrix is None else tuple(map(tuple, np.asarray(matrix, dtype=float)))
+
+
+@lru_cache(maxsize=32)
+def factor_cholesky(device_corr: float = 0.0,
+                    param_corr: Tuple[Tuple[float, ...], ...] = None) -> np.ndarray:
+    """Cholesky factor of the 6x6 correlation of the (device type, param) factors"""
+    params = np.eye(len(PARAM_NAMES)) if param_corr is None else np.asarray(param_corr, dtype=float)
+    devices = np.array([[1.0, device_corr], [device_corr, 1.0]])
+    chol = np.linalg.cholesky(np.kron(devices, params))
+    chol.setflags(write=False)
+    return chol
+
+
+@lru_cache(maxsize=32)
+def exponential_cholesky(size: int, corr_length: float) -> np.ndarray:
+    """Cholesky factor of exp(-|i - j| / corr_length) on `size` equally spaced points"""
+    index = np.arange(size)
+    corr = np.exp(-np.abs(index[:, None] - index[None, :]) / corr_length)
+    chol = np.linalg.cholesky(corr + 1e-12 * np.eye(size))
+    chol.setflags(write=False)
+    return chol
+
+
+class VariationModel:
+    """
+    Three-layer Gaussian process variation of a num_rows x num_cols array 三层工艺偏差模型
+
+    Args:
+        means: per-transistor nominal values (18, same for every cell), defaults to CELL_NOMINALS
+        sigmas: total sigma of the 18 parameters, defaults to `rel_sigma * |means|`
+        global_fraction / spatial_fraction: shares of the variance of the global and
+            spatial layers, the local mismatch gets the rest
+        corr_length: spatial correlation length in cell pitches
+        device_corr: correlation of the nmos and pmos factors
+        param_corr: 3x3 correlation of vth0/u0/voff within the global and spatial factors
+        dtype: dtype of the samples (float32 halves the memory of large tables)
+    """
+
+    def __init__(self, num_rows: int, num_cols: int, means: Sequence[float] = None,
+                 sigmas: Sequence[float] = None, rel_sigma: float = 0.05,
+                 global_fraction: float = 0.5, spatial_fraction: float = 0.0,
+                 corr_length: float = 4.0, device_corr: float = 0.0, param_corr=None,
+                 dtype=np.float64):
+        if not (0 <= global_fraction and 0 <= spatial_fraction
+                and global_fraction + spatial_fraction <= 1):
+            raise ValueError(f"Variance fractions must be >= 0 with a sum <= 1, got "
+                             f"global={global_fraction}, spatial={spatial_fraction}")
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_cells = num_rows * num_cols
+        self.means = CELL_NOMINALS.copy() if means is None else np.asarray(means, dtype=float)
+        sigmas = rel_sigma * np.abs(self.means) if sigmas is None else np.asarray(sigmas, dtype=float)
+        if self.means.shape != (len(SLOT_FACTORS),) or sigmas.shape != self.means.shape:
+            raise ValueError(f"means and sigmas need {len(SLOT_FACTORS)} per-transistor entries")
+        self.sigmas = sigmas
+        self.global_fraction = global_fraction
+        # A single cell has no within-die spread, its spatial share is mismatch
+        self.spatial_fraction = spatial_fraction if self.num_cells > 1 else 0.0
+        self.corr_length = corr_length
+        self.dtype = dtype
+
+        self.global_sigmas = np.sqrt(global_fraction) * sigmas
+        self.spatial_sigmas = np.sqrt(self.spatial_fraction) * sigmas
+        self.local_sigmas = np.sqrt(1 - global_fraction - self.spatial_fraction) * sigmas
+        self.factor_chol = factor_cholesky(device_corr, _as_key(param_corr))
+        if self.spatial_fraction:
+            self.row_chol = exponential_cholesky(num_rows, corr_length)
+            self.col_chol = exponential_cholesky(num_cols, corr_length)
+
+    @property
+    def num_params(self) -> int:
+        """Columns of the data table"""
+        return self.num_cells * len(SLOT_FACTORS)
+
+    def _correlated_factors(self, z: np.ndarray) -> np.ndarray:
+        """(..., 6) independent normals -> (..., 18) per-slot factor values"""
+        return (z @ self.factor_chol.T)[..., SLOT_FACTORS]
+
+    def sample_block(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """`n` samples (n, num_params) drawn with `rng`"""
+        # Local mismatch drawn in place, the correlated layers are added on top
+        out = rng.standard_normal((n, self.num_cells, len(SLOT_FACTORS)), dtype=self.dtype)
+        out *= self.local_sigmas
+        out += self.means
+        if self.global_fraction:
+            shared = self._correlated_factors(rng.standard_normal((n, NUM_FACTORS)))
+            out += (shared * self.global_sigmas)[:, None, :]
+        if self.spatial_fraction:
+            # One field per factor, L_row @ Z @ L_col^T as two flat GEMMs
+            rows, cols = self.num_rows, self.num_cols
+            z = rng.standard_normal((n * rows, cols, NUM_FACTORS)) @ self.factor_chol.T
+            field = (self.col_chol @ z).reshape(n, rows, cols * NUM_FACTORS)
+            field = (self.row_chol @ field).reshape(n, self.num_cells, NUM_FACTORS)
+            out += field[..., SLOT_FACTORS] * self.spatial_sigmas
+        return out.reshape(n, self.num_params)
+
+    def chunk_rows(self, chunk_values: int = CHUNK_VALUES) -> int:
+        """Samples per chunk, about `chunk_values` numbers"""
+        return max(1, chunk_values // self.num_params)
+
+    def iter_samples(self, num_samples: int, seed: Optional[int] = None,
+                     chunk_values: int = CHUNK_VALUES) -> Iterator[np.ndarray]:
+        """
+        Samples in consecutive (chunk, num_params) blocks, memory bounded by `chunk_values`
+        Every chunk has its own seed derived from `seed`, so the stream is reproducible
+        for the same seed and chunk size.
+        """
+        step = self.chunk_rows(chunk_values)
+        num_chunks = -(-num_samples // step)
+        for k, chunk_seed in enumerate(shard_seeds(seed, num_chunks, stream=7)):
+            count = min(step, num_samples - k * step)
+            yield self.sample_block(count, np.random.default_rng(chunk_seed))
+
+    def sample(self, num_samples: int, seed: Optional[int] = None,
+               chunk_values: int = CHUNK_VALUES) -> np.ndarray:
+        """All samples at once, `vars` for gen_process_params()"""
+        out = np.empty((num_samples, self.num_params), dtype=self.dtype)
+        start = 0
+        for block in self.iter_samples(num_samples, seed, chunk_values):
+            out[start:start + len(block)] = block
+            start += len(block)
+        return out
+
+    def covariance(self) -> np.ndarray:
+        """Exact (num_params, num_params) covariance, for checks on small arrays"""
+        factor_corr = self.factor_chol @ self.factor_chol.T
+        slot_corr = factor_corr[np.ix_(SLOT_FACTORS, SLOT_FACTORS)]
+        cov = np.kron(np.ones((self.num_cells, self.num_cells)),
+                      slot_corr * np.outer(self.global_sigmas, self.global_sigmas))
+        if self.spatial_fraction:
+            cell_corr = np.kron(self.row_chol @ self.row_chol.T, self.col_chol @ self.col_chol.T)
+            cov += np.kron(cell_corr, slot_corr * np.outer(self.spatial_sigmas, self.spatial_sigmas))
+        cov += np.diag(np.tile(self.local_sigmas ** 2, self.num_cells))
+        return cov
@@ -0,0 +1,627 @@
+"""
+Xyce 执行层 / Execution helpers for Xyce Monte Carlo runs.
+
+The testbenches only generate netlists; everything that launches Xyce and
+collects its `.mtX` / `.msX` outputs lives here so that it can be reused by
+the single-run and the sharded code paths.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import parse_mc_measurements  # type: ignore
+
+
+def split_mc_runs(mc_runs: int, num_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split `mc_runs` samples into contiguous shards
+    将蒙特卡洛样本划分为连续的分片
+
+    Args:
+        mc_runs: Total number of Monte Carlo samples
+        num_shards: Requested number of shards (clipped to [1, mc_runs])
+
+    Returns:
+        List of (start, count) sample ranges, one per shard
+    """
+    if mc_runs <= 0:
+        raise ValueError("mc_runs must be a positive integer")
+    num_shards = max(1, min(int(num_shards), mc_runs))
+    base, extra = divmod(mc_runs, num_shards)
+
+    ranges = []
+    start = 0
+    for k in range(num_shards):
+        count = base + (1 if k < extra else 0)
+        ranges.append((start, count))
+        start += count
+    return ranges
+
+
+def shard_seeds(seed: Optional[int], num_shards: int, stream: int = 0) -> List[int]:
+    """
+    Derive independent, reproducible per-shard seeds from one base seed.
+    A different `stream` gives seeds that do not collide with those of stream 0
+    (used for re-queued samples).
+    """
+    spawn_key = (stream,) if stream else ()
+    children = np.random.SeedSequence(seed, spawn_key=spawn_key).spawn(num_shards)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+class XyceTimeoutError(RuntimeError):
+    """Raised when a Xyce run exceeds its wall-clock timeout"""
+
+
+def _kill_process_group(proc: subprocess.Popen, grace: float = 5.0) -> None:
+    """Terminate Xyce and every child it spawned (e.g. MPI ranks)"""
+    if not hasattr(os, 'killpg'):
+        proc.kill()
+        proc.wait()
+        return
+
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=grace)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+    # The group leader may be gone while its children are still alive
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+def run_xyce(tb_path: str, xyce_cmd: str = 'Xyce',
+             timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Run Xyce on a netlist, writing all outputs next to it (`<tb_path>.prn`, `.mtX`, ...)
+
+    Xyce is started in its own process group, so that the whole group can be
+    killed once `timeout` seconds of wall-clock time have elapsed.
+
+    Raises:
+        XyceTimeoutError: If the run exceeds `timeout`
+        RuntimeError: If Xyce exits with a non-zero return code
+    """
+    # command: Xyce <netlist> -o <netlist>
+    proc = subprocess.Popen(
+        [xyce_cmd, tb_path, '-o', tb_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(proc)
+        proc.communicate()
+        raise XyceTimeoutError(f"Xyce killed after the {timeout}s timeout on {tb_path}")
+    except BaseException:
+        # e.g. KeyboardInterrupt, never leave an orphaned simulator behind
+        _kill_process_group(proc)
+        raise
+
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"Xyce error:\n{stderr}, please check the log file {tb_path.replace('.sp', '.lis')}.")
+    return subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
+
+
+def run_supervised_mc(tb_path: str, num_runs: int, file_suffix: str = 'mt',
+                      timeout: Optional[float] = None,
+                      xyce_cmd: str = 'Xyce') -> Tuple[pd.DataFrame, dict]:
+    """
+    Run one MC netlist under a watchdog and salvage whatever samples finished
+    带超时保护的仿真，超时或出错时保留已完成样本的结果
+
+    Returns:
+        (mc_df, report) where `mc_df` holds the parsed `.mtX`/`.msX` files that exist
+        and `report` is a dict with keys
+            'tb_path', 'status' ('ok', 'timeout' or 'error'), 'elapsed' (s),
+            'finished' / 'unfinished' (local sample indices)
+    """
+    _remove_stale_outputs(tb_path, num_runs, file_suffix)
+
+    start = time.time()
+    status = 'ok'
+    try:
+        run_xyce(tb_path, xyce_cmd, timeout)
+    except XyceTimeoutError as e:
+        status = 'timeout'
+        print(f"[WARNING] {e}")
+    except RuntimeError as e:
+        status = 'error'
+        print(f"[ERROR] {e}")
+
+    mc_df = parse_mc_measurements(
+        netlist_prefix=tb_path,
+        file_suffix=file_suffix,
+        num_runs=num_runs,
+    )
+    return mc_df, _mc_report(tb_path, mc_df, num_runs, status, start)
+
+
+def _remove_stale_outputs(tb_path: str, num_runs: int, file_suffix: str) -> None:
+    """Stale measurement files from an earlier run would look like finished samples"""
+    for run_id in range(num_runs):
+        stale = f"{tb_path}.{file_suffix}{run_id}"
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def _mc_report(tb_path: str, mc_df: pd.DataFrame, num_runs: int,
+               status: str, start: float) -> dict:
+    """Report of finished/unfinished samples, see run_supervised_mc()"""
+    finished = sorted(int(run) for run in mc_df.index)
+    finished_set = set(finished)
+    report = {
+        'tb_path': tb_path,
+        'status': status,
+        'elapsed': time.time() - start,
+        'finished': finished,
+        'unfinished': [run for run in range(num_runs) if run not in finished_set],
+    }
+    if report['unfinished']:
+        print(f"[WARNING] {tb_path}: {len(finished)}/{num_runs} samples finished, "
+              f"unfinished samples: {report['unfinished']}")
+    return report
+
+
+def run_mc_shard(tb_path: str, num_runs: int, file_suffix: str = 'mt',
+                 timeout: Optional[float] = None,
+                 xyce_cmd: str = 'Xyce') -> Tuple[pd.DataFrame, dict]:
+    """Process-pool worker: run one shard under the watchdog and parse its measurement files"""
+    return run_supervised_mc(tb_path, num_runs, file_suffix, timeout, xyce_cmd)
+
+
+def run_mc_shards(shard_jobs: List[tuple], file_suffix: str = 'mt',
+                  max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                  xyce_cmd: str = 'Xyce',
+                  on_done: Optional[Callable[[int, pd.DataFrame, dict], None]] = None
+                  ) -> List[Tuple[pd.DataFrame, dict]]:
+    """
+    Run several independent Xyce netlists on a local process pool
+    在本地进程池中并行运行多个分片
+
+    Args:
+        shard_jobs: List of (tb_path, num_runs) for each shard, or (tb_path, num_runs, file_suffix)
+                    to override `file_suffix` for that job
+        file_suffix: `mt` for transient measurements, `ms` for DC
+        max_workers: Pool size, defaults to the number of CPUs
+        timeout: Wall-clock limit of every shard in seconds
+        xyce_cmd: Simulator executable
+        on_done: Called in the parent process as on_done(job_index, mc_df, report)
+                 as soon as a shard finishes, e.g. to update a campaign manifest
+
+    Returns:
+        Per-shard (mc_df, report) from run_supervised_mc(), in the same order as `shard_jobs`
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(run_mc_shard, job[0], job[1], job[2] if len(job) > 2 else file_suffix,
+                        timeout, xyce_cmd): i
+            for i, job in enumerate(shard_jobs)
+        }
+        results = [None] * len(shard_jobs)
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if on_done is not None:
+                on_done(i, *results[i])
+        return results
+
+
+# ---------------------------------------------------------------------------
+# asyncio 接口: 多个 Xyce 任务并发, 解析与仿真重叠
+# ---------------------------------------------------------------------------
+async def _kill_process_group_async(proc: asyncio.subprocess.Process, grace: float = 5.0) -> None:
+    """asyncio counterpart of _kill_process_group()"""
+    if not hasattr(os, 'killpg'):
+        proc.kill()
+        await proc.wait()
+        return
+
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        await asyncio.wait_for(proc.wait(), grace)
+    except (ProcessLookupError, asyncio.TimeoutError):
+        pass
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+async def run_xyce_async(tb_path: str, xyce_cmd: str = 'Xyce',
+                         timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Run Xyce without blocking the event loop, see run_xyce()
+
+    Cancelling the awaiting task kills the simulator process group.
+
+    Raises:
+        XyceTimeoutError: If the run exceeds `timeout`
+        RuntimeError: If Xyce exits with a non-zero return code
+    """
+    proc = await asyncio.create_subprocess_exec(
+        xyce_cmd, tb_path, '-o', tb_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill_process_group_async(proc)
+        raise XyceTimeoutError(f"Xyce killed after the {timeout}s timeout on {tb_path}")
+    except BaseException:
+        # e.g. asyncio.CancelledError, never leave an orphaned simulator behind
+        await _kill_process_group_async(proc)
+        raise
+
+    stdout, stderr = stdout.decode(errors='replace'), stderr.decode(errors='replace')
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"Xyce error:\n{stderr}, please check the log file {tb_path.replace('.sp', '.lis')}.")
+    return subprocess.CompletedProcess([xyce_cmd, tb_path, '-o', tb_path], proc.returncode, stdout, stderr)
+
+
+async def run_supervised_mc_async(tb_path: str, num_runs: int, file_suffix: str = 'mt',
+                                  timeout: Optional[float] = None, xyce_cmd: str = 'Xyce',
+                                  semaphore: Optional[asyncio.Semaphore] = None
+                                  ) -> Tuple[pd.DataFrame, dict]:
+    """
+    asyncio counterpart of run_supervised_mc()
+
+    `semaphore` only guards the Xyce process, so that the next queued netlist
+    starts simulating while the measurement files of this one are parsed in a
+    worker thread.
+    """
+    _remove_stale_outputs(tb_path, num_runs, file_suffix)
+
+    async with semaphore if semaphore is not None else _NullSemaphore():
+        start = time.time()
+        status = 'ok'
+        try:
+            await run_xyce_async(tb_path, xyce_cmd, timeout)
+        except XyceTimeoutError as e:
+            status = 'timeout'
+            print(f"[WARNING] {e}")
+        except RuntimeError as e:
+            status = 'error'
+            print(f"[ERROR] {e}")
+
+    mc_df = await asyncio.to_thread(
+        parse_mc_measurements,
+        netlist_prefix=tb_path,
+        file_suffix=file_suffix,
+        num_runs=num_runs,
+    )
+    return mc_df, _mc_report(tb_path, mc_df, num_runs, status, start)
+
+
+class _NullSemaphore:
+    """Stand-in for an unbounded asyncio.Semaphore"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Campaign manifest 仿真任务清单 (断点续跑)
+# ---------------------------------------------------------------------------
+def config_fingerprint(settings: dict) -> str:
+    """SHA-256 of a JSON-serializable settings dict, independent of key order"""
+    text = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def atomic_write_json(path: str, data: dict) -> None:
+    """Write JSON so that readers never see a half-written file, even if the process dies"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CampaignManifest:
+    """
+    On-disk record of a MC campaign, rewritten atomically after every change
+
+    It stores the configuration fingerprint, the sample range and seed of every
+    shard, the shard status (`pending`, `running`, `done` or `incomplete`) and
+    the output files of finished samples. Paths are relative to `sim_path`, so
+    a campaign directory can be moved before it is resumed. The file is named
+    after the fingerprint (`campaign_<fingerprint>.json`), so campaigns of other
+    operations or settings in the same directory keep their own manifests.
+    """
+    FILENAME_PREFIX = 'campaign_'
+
+    def __init__(self, sim_path: str, data: dict):
+        self.sim_path = sim_path
+        self.data = data
+
+    @classmethod
+    def filename(cls, fingerprint: str) -> str:
+        return f'{cls.FILENAME_PREFIX}{fingerprint[:16]}.json'
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.sim_path, self.filename(self.fingerprint))
+
+    @property
+    def fingerprint(self) -> str:
+        return self.data['fingerprint']
+
+    @property
+    def shards(self) -> List[dict]:
+        return self.data['shards']
+
+    @classmethod
+    def create(cls, sim_path: str, fingerprint: str, ranges: List[Tuple[int, int]],
+               seeds: List[Optional[int]], **meta) -> 'CampaignManifest':
+        data = {
+            'version': 1,
+            'fingerprint': fingerprint,
+            'created': time.time(),
+            'meta': meta,
+            'shards': [
+                {'index': k, 'start': start, 'count': count, 'seed': seed,
+                 'status': 'pending', 'tb_path': None, 'outputs': [],
+                 'finished': [], 'unfinished': list(range(count))}
+                for k, ((start, count), seed) in enumerate(zip(ranges, seeds))
+            ],
+        }
+        manifest = cls(sim_path, data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, sim_path: str, fingerprint: str) -> 'CampaignManifest':
+        """Manifest of the campaign with `fingerprint` in `sim_path`"""
+        path = os.path.join(sim_path, cls.filename(fingerprint))
+        if not os.path.isfile(path):
+            found = sorted(name for name in os.listdir(sim_path)
+                           if name.startswith(cls.FILENAME_PREFIX)) if os.path.isdir(sim_path) else []
+            raise FileNotFoundError(
+                f"No campaign with these settings in {sim_path} (manifests found: {found or 'none'}); "
+                f"resume needs the configuration of the interrupted run")
+        with open(path, 'r') as f:
+            manifest = cls(sim_path, json.load(f))
+        if manifest.fingerprint != fingerprint:
+            raise ValueError(f"Campaign manifest {path} does not match fingerprint {fingerprint}")
+        return manifest
+
+    def save(self) -> None:
+        self.data['updated'] = time.time()
+        atomic_write_json(self.path, self.data)
+
+    def abs_path(self, rel_path: str) -> str:
+        return os.path.join(self.sim_path, rel_path)
+
+    def set_running(self, index: int, tb_path: str) -> None:
+        self.shards[index].update(
+            status='running', tb_path=os.path.relpath(tb_path, self.sim_path),
+            tb_sha256=self._netlist_digest(tb_path))
+        self.save()
+
+    @staticmethod
+    def _netlist_digest(tb_path: str) -> Optional[str]:
+        if not os.path.isfile(tb_path):
+            return None
+        with open(tb_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def record_result(self, index: int, report: dict, file_suffix: str) -> None:
+        """Store the outcome of a shard from its run_supervised_mc() report"""
+        tb_rel = os.path.relpath(report['tb_path'], self.sim_path)
+        self.shards[index].update(
+            status='incomplete' if report['unfinished'] else 'done',
+            xyce_status=report['status'],
+            tb_path=tb_rel,
+            tb_sha256=self._netlist_digest(report['tb_path']),
+            outputs=[f"{tb_rel}.{file_suffix}{run}" for run in report['finished']],
+            finished=report['finished'],
+            unfinished=report['unfinished'],
+            elapsed=report.get('elapsed'),
+        )
+        self.save()
+
+    def has_netlist(self, index: int) -> bool:
+        """The shard's netlist still exists and was not overwritten since it ran"""
+        shard = self.shards[index]
+        if not shard['tb_path'] or shard.get('tb_sha256') is None:
+            return False
+        return shard['tb_sha256'] == self._netlist_digest(self.abs_path(shard['tb_path']))
+
+    def is_done(self, index: int) -> bool:
+        """
+        A shard is done when it finished completely, all its outputs still exist and its
+        netlist was not overwritten since (e.g. by another campaign in the same directory)
+        """
+        shard = self.shards[index]
+        if shard['status'] != 'done' or not self.has_netlist(index):
+            return False
+        return all(os.path.exists(self.abs_path(out)) for out in shard['outputs'])
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed result cache 基于内容寻址的仿真结果缓存
+# ---------------------------------------------------------------------------
+_INCLUDE_RE = re.compile(r'^\s*\.(include|inc|lib)\s+["\']?([^"\'\s]+)["\']?', re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def xyce_version(xyce_cmd: str = 'Xyce') -> str:
+    """Version string reported by `Xyce -v`, 'unknown' if it cannot be queried"""
+    try:
+        result = subprocess.run([xyce_cmd, '-v'], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return 'unknown'
+    return (result.stdout or result.stderr).strip()
+
+
+def _resolve_include(inc_path: str, base_dir: str) -> Optional[str]:
+    """Resolve an include path like Xyce does: as given first, then next to the including file"""
+    for candidate in (inc_path, os.path.join(base_dir, inc_path)):
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    return None
+
+
+def hash_spice_file(path: str, _seen: Optional[set] = None) -> str:
+    """
+    SHA-256 of a SPICE file in which every `.include`/`.lib` path is replaced
+    by the hash of the included file, so the digest only depends on content
+    and not on the (timestamped) directory the files were written to.
+    """
+    seen = _seen if _seen is not None else set()
+    seen.add(os.path.abspath(path))
+    base_dir = os.path.dirname(path)
+
+    digest = hashlib.sha256()
+    with open(path, 'r') as f:
+        for line in f:
+            match = _INCLUDE_RE.match(line)
+            if match:
+                inc_path = _resolve_include(match.group(2), base_dir)
+                if inc_path is not None and inc_path not in seen:
+                    inc_hash = hash_spice_file(inc_path, seen)
+                    line = line[:match.start(2)] + inc_hash + line[match.end(2):]
+            digest.update(line.encode())
+    return digest.hexdigest()
+
+
+def netlist_fingerprint(tb_path: str, xyce_cmd: str = 'Xyce') -> str:
+    """Cache key of a netlist: its text, every included file and the Xyce version"""
+    digest = hashlib.sha256()
+    digest.update(xyce_version(xyce_cmd).encode())
+    digest.update(hash_spice_file(tb_path).encode())
+    return digest.hexdigest()
+
+
+class XyceResultCache:
+    """
+    Content-addressed store of parsed MC results 仿真结果缓存
+
+    Every entry is a directory `<cache_dir>/<key[:2]>/<key>` holding the measurement
+    DataFrame (and optionally its statistics). Entries are evicted in
+    least-recently-used order once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join('sim', 'xyce_cache'),
+                 max_bytes: int = 2 * 1024 ** 3, xyce_cmd: str = 'Xyce'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.xyce_cmd = xyce_cmd
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, tb_path: str, xyce_cmd: Optional[str] = None) -> str:
+        """
+        Cache key of `tb_path` simulated by `xyce_cmd` (defaults to `self.xyce_cmd`);
+        pass the command that actually runs, so that results of another simulator
+        (e.g. xyce_stub.py) are never served for Xyce
+        """
+        return netlist_fingerprint(tb_path, xyce_cmd or self.xyce_cmd)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Optional[pd.DataFrame]]]:
+        """Return (mc_df, stats) for `key`, or None on a cache miss"""
+        entry = self._entry_path(key)
+        df_file = os.path.join(entry, 'measurements.pkl')
+        if not os.path.isfile(df_file):
+            return None
+
+        mc_df = pd.read_pickle(df_file)
+        stats_file = os.path.join(entry, 'stats.pkl')
+        stats = pd.read_pickle(stats_file) if os.path.isfile(stats_file) else None
+        # Mark as recently used
+        os.utime(entry)
+        return mc_df, stats
+
+    def put(self, key: str, mc_df: pd.DataFrame, stats: Optional[pd.DataFrame] = None,
+            meta: Optional[dict] = None) -> None:
+        """Store results atomically, then evict old entries if the cache is too large"""
+        entry = self._entry_path(key)
+        if os.path.isdir(entry):
+            os.utime(entry)
+            return
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_entry = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.dirname(entry))
+        try:
+            mc_df.to_pickle(os.path.join(tmp_entry, 'measurements.pkl'))
+            if stats is not None:
+                stats.to_pickle(os.path.join(tmp_entry, 'stats.pkl'))
+            with open(os.path.join(tmp_entry, 'meta.json'), 'w') as f:
+                json.dump(dict(meta or {}, created=time.time()), f)
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # Another process stored the same key first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(last_used, size_in_bytes, path) of every complete entry"""
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, name)
+                if name.startswith('.tmp_') or not os.path.isdir(entry):
+                    continue
+                size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                entries.append((os.stat(entry).st_mtime, size, entry))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """Drop least-recently-used entries until the cache fits in `max_bytes`"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            print(f"[DEBUG] Evicted cache entry {entry}")
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Xyce 替身仿真器 / Local stand-in for the Xyce binary.
+
+Called exactly like Xyce (`xyce_stub.py <netlist> -o <prefix>`), it reads the
+analysis directives of a generated netlist and writes outputs in the formats
+the Python pipeline parses, without simulating anything:
+
+    <prefix>.prn          waveforms of all `.PRINT` signals, one block per sample
+    <prefix>.mtX / .msX   `.MEASURE TRAN` / `.MEASURE DC` results of sample X
+
+The number of samples comes from `numsamples=N`, or from the rows of the
+`.data` tables swept by `.STEP data=<name>`. Values are random but plausible
+(delays ~100 ps, power ~10 uW, SNM ~200 mV) and reproducible through the
+netlist `seed=` option.
+
+Behaviour is configured through environment variables, because the runners
+invoke the simulator with the Xyce command line only:
+
+    XYCE_STUB_POINTS     time/sweep points per sample in the `.prn` (default 200,
+                         0 keeps the netlist's `.DC` sweep resolution)
+    XYCE_STUB_LATENCY    seconds spent per sample (default 0)
+    XYCE_STUB_STARTUP    seconds spent before the first sample (default 0)
+    XYCE_STUB_FAIL_RATE  fraction of measurements reported as FAILED (default 0)
+    XYCE_STUB_SEED       seed used when the netlist has none (default 0)
+
+Usage:
+    python xyce_stub.py tb.sp -o tb.sp
+    tb.run_mc_simulation(...)  with  Sram9TCoreMcTestbench(..., xyce_cmd='/path/to/xyce_stub.py')
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+VERSION = 'Xyce stand-in (xyce_stub.py) 1.0'
+
+_STEP_RE = re.compile(r'^\s*\.STEP\s+data\s*=\s*(\S+)', re.IGNORECASE)
+_SAMPLES_RE = re.compile(r'numsamples\s*=\s*(\d+)', re.IGNORECASE)
+_SEED_RE = re.compile(r'\bseed\s*=\s*(\d+)', re.IGNORECASE)
+_MEAS_RE = re.compile(r'^\s*\.MEAS(?:URE)?\s+(TRAN|DC)\s+(\S+)', re.IGNORECASE)
+_PRINT_RE = re.compile(r'^\s*\.PRINT\s+(TRAN|DC)\s+(.*)$', re.IGNORECASE)
+_TRAN_RE = re.compile(r'^\s*\.TRAN\s+(\S+)\s+(\S+)', re.IGNORECASE)
+_DC_RE = re.compile(r'^\s*\.DC\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)', re.IGNORECASE)
+_INCLUDE_RE = re.compile(r'^\s*\.(?:include|inc)\s+["\']?([^"\'\s]+)', re.IGNORECASE)
+_DATA_RE = re.compile(r'^\s*\.data\s+(\S+)', re.IGNORECASE)
+
+
+def _env(name, default, cast=float):
+    value = os.environ.get(name)
+    return cast(value) if value not in (None, '') else default
+
+
+def _spice_float(text):
+    """Parse a SPICE number with an optional scale suffix, e.g. `1e-11`, `60n`"""
+    scales = {'t': 1e12, 'g': 1e9, 'meg': 1e6, 'k': 1e3, 'm': 1e-3,
+              'u': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15}
+    match = re.match(r'^([-+]?[\d.]+(?:e[-+]?\d+)?)([a-z]*)', text.strip().lower())
+    if not match:
+        raise ValueError(f"Not a number: {text}")
+    value, suffix = float(match.group(1)), match.group(2)
+    for unit in ('meg', 't', 'g', 'k', 'm', 'u', 'n', 'p', 'f'):
+        if suffix.startswith(unit):
+            return value * scales[unit]
+    return value
+
+
+def count_data_rows(path):
+    """Rows of every `.data <name>` table in a file (the first `+` line is the header)"""
+    rows, name = {}, None
+    with open(path, 'r') as f:
+        for line in f:
+            match = _DATA_RE.match(line)
+            if match:
+                name = match.group(1).lower()
+                rows[name] = -1
+            elif name is not None and line.lstrip().startswith('+'):
+                rows[name] += 1
+            elif line.strip().lower().startswith('.enddata'):
+                name = None
+    return {name: max(count, 0) for name, count in rows.items()}
+
+
+def parse_netlist(tb_path):
+    """Collect the directives that shape the outputs of a run"""
+    info = {'analysis': None, 'tstop': 60e-9, 'dc': None, 'numsamples': None, 'seed': None,
+            'steps': [], 'measures': [], 'prints': [], 'tables': {}}
+    base_dir = os.path.dirname(tb_path)
+    with open(tb_path, 'r') as f:
+        lines = f.readlines()
+
+    for line in lines:
+        if match := _TRAN_RE.match(line):
+            info['analysis'] = 'tran'
+            info['tstop'] = _spice_float(match.group(2))
+        elif match := _DC_RE.match(line):
+            info['analysis'] = 'dc'
+            info['dc'] = tuple(_spice_float(x) for x in match.group(2, 3, 4))
+        elif match := _STEP_RE.match(line):
+            info['steps'].append(match.group(1).lower())
+        elif match := _MEAS_RE.match(line):
+            info['measures'].append((match.group(1).lower(), match.group(2)))
+        elif match := _PRINT_RE.match(line):
+            signals = [tok for tok in match.group(2).split() if '=' not in tok]
+            info['prints'].extend(sig for sig in signals if sig not in info['prints'])
+        elif match := _INCLUDE_RE.match(line):
+            for candidate in (match.group(1), os.path.join(base_dir, match.group(1))):
+                if candidate.endswith('.data') and os.path.isfile(candidate):
+                    info['tables'].update(count_data_rows(candidate))
+                    break
+        if match := _SAMPLES_RE.search(line):
+            info['numsamples'] = int(match.group(1))
+        if line.lstrip().lower().startswith('.options samples') and (match := _SEED_RE.search(line)):
+            info['seed'] = int(match.group(1))
+
+    if info['analysis'] is None:
+        info['analysis'] = 'dc' if any(kind == 'dc' for kind, _ in info['measures']) else 'tran'
+    return info
+
+
+def num_samples(info):
+    """Samples of the run: `.STEP` tables multiply, `numsamples` applies otherwise"""
+    if info['steps']:
+        count = 1
+        for name in info['steps']:
+            count *= info['tables'].get(name, 1)
+        return count
+    return info['numsamples'] or 1
+
+
+def measure_value(name, rng):
+    """A plausible value for a measurement, picked from its name"""
+    upper = name.upper()
+    if 'SNM' in upper:
+        return rng.normal(0.2, 0.01)
+    if upper.startswith('MAXVD') or upper.startswith('VD'):
+        return rng.normal(0.28, 0.014)
+    if upper.startswith('P'):
+        return abs(rng.normal(1e-5, 1e-6))
+    if upper.startswith('T'):
+        return rng.lognormal(np.log(1e-10), 0.1)
+    return rng.normal(1.0, 0.05)
+
+
+def write_measurements(prefix, suffix, sample, measures, rng, fail_rate):
+    lines = []
+    for _, name in measures:
+        if fail_rate and rng.random() < fail_rate:
+            lines.append(f"{name} = FAILED")
+        else:
+            lines.append(f"{name} = {measure_value(name, rng):.6e}")
+    with open(f"{prefix}.{suffix}{sample}", 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def waveform_block(info, points, rng, start_index):
+    """One sample of the `.prn`: an x-axis column plus a smooth transition per signal"""
+    if info['analysis'] == 'tran':
+        x = np.linspace(0.0, info['tstop'], points)
+        shape = (x / info['tstop'])[:, None]
+    else:
+        start, stop, step = info['dc']
+        if not points:
+            points = int(round((stop - start) / step)) + 1
+        x = np.linspace(start, stop, points)
+        shape = ((x - start) / (stop - start))[:, None]
+    num_signals = len(info['prints'])
+    centers = rng.uniform(0.2, 0.8, num_signals)
+    falling = rng.random(num_signals) < 0.5
+    data = 1.0 / (1.0 + np.exp(-(shape - centers) * 40.0))
+    data[:, falling] = 1.0 - data[:, falling]
+    index = np.arange(start_index, start_index + len(x))
+    return np.column_stack([index, x, data])
+
+
+def main(argv):
+    if len(argv) > 1 and argv[1] in ('-v', '--version', '-capabilities'):
+        print(VERSION)
+        return 0
+    if len(argv) < 2:
+        print("Usage: xyce_stub.py <netlist> [-o <output prefix>]", file=sys.stderr)
+        return 1
+
+    tb_path = argv[1]
+    prefix = argv[argv.index('-o') + 1] if '-o' in argv else tb_path
+    if not os.path.isfile(tb_path):
+        print(f"Netlist not found: {tb_path}", file=sys.stderr)
+        return 1
+
+    info = parse_netlist(tb_path)
+    points = _env('XYCE_STUB_POINTS', 200, int)
+    latency = _env('XYCE_STUB_LATENCY', 0.0)
+    fail_rate = _env('XYCE_STUB_FAIL_RATE', 0.0)
+    seed = info['seed'] if info['seed'] is not None else _env('XYCE_STUB_SEED', 0, int)
+    rng = np.random.default_rng(seed)
+    samples = num_samples(info)
+    suffix = 'ms' if info['analysis'] == 'dc' else 'mt'
+    x_name = 'TIME' if info['analysis'] == 'tran' else '{U}'
+    # The sweep variable / time is always the first column
+    info['prints'] = [sig for sig in info['prints'] if sig.upper() not in (x_name, 'TIME')]
+
+    time.sleep(_env('XYCE_STUB_STARTUP', 0.0))
+    prn = open(f"{prefix}.prn", 'w') if info['prints'] else None
+    try:
+        if prn is not None:
+            prn.write(" ".join(['Index', x_name] + info['prints']) + "\n")
+        next_index = 0
+        for sample in range(samples):
+            if info['measures']:
+                write_measurements(prefix, suffix, sample, info['measures'], rng, fail_rate)
+            if prn is not None:
+                block = waveform_block(info, points, rng, next_index)
+                next_index += len(block)
+                np.savetxt(prn, block, fmt=['%d'] + ['%.8e'] * (block.shape[1] - 1))
+            if latency:
+                time.sleep(latency)
+        if prn is not None:
+            prn.write("End of Xyce(TM) Simulation\n")
+    finally:
+        if prn is not None:
+            prn.close()
+
+    print(f"***** Solution Summary *****\n{VERSION}: {samples} samples written to {prefix}.*")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))